@@ -21,12 +21,15 @@ class ClientSerializer(serializers.ModelSerializer):
 class ClientListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listado de clientes"""
     is_vip = serializers.ReadOnlyField()
+    churn_risk = serializers.FloatField(source='churn_score.churn_risk', read_only=True, default=None)
+    churn_risk_level = serializers.CharField(source='churn_score.risk_level', read_only=True, default=None)
     
     class Meta:
         model = Client
         fields = [
             'id', 'name', 'email', 'phone', 'city', 'client_type', 'segment',
-            'is_active', 'is_vip', 'total_purchases', 'last_purchase_date'
+            'is_active', 'is_vip', 'total_purchases', 'last_purchase_date',
+            'churn_risk', 'churn_risk_level'
         ]
 
 
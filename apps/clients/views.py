@@ -13,12 +13,18 @@ from .serializers import (
 
 class ClientListCreateView(generics.ListCreateAPIView):
     """Listar y crear clientes"""
-    queryset = Client.objects.all()
+    queryset = Client.objects.select_related('churn_score')
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['is_active', 'client_type', 'segment']
+    filterset_fields = {
+        'is_active': ['exact'],
+        'client_type': ['exact'],
+        'segment': ['exact'],
+        'churn_score__risk_level': ['exact'],
+        'churn_score__churn_risk': ['gte', 'lte'],
+    }
     search_fields = ['name', 'email', 'phone', 'city']
-    ordering_fields = ['name', 'created_at', 'total_purchases', 'last_purchase_date']
+    ordering_fields = ['name', 'created_at', 'total_purchases', 'last_purchase_date', 'churn_score__churn_risk']
     ordering = ['name']
     
     def get_serializer_class(self):
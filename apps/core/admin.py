@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Company
+from .models import User, Company, OutboxEvent
 
 
 @admin.register(User)
@@ -31,3 +31,10 @@ class CompanyAdmin(admin.ModelAdmin):
     list_filter = ['created_at', 'is_active']
     search_fields = ['name', 'legal_name', 'rfc', 'email']
     readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'status', 'attempts', 'available_at', 'processed_at']
+    list_filter = ['event_type', 'status', 'created_at']
+    readonly_fields = ['created_at', 'updated_at', 'processed_at', 'last_error']
@@ -340,6 +340,14 @@ Responde al usuario de manera natural y útil, sin mostrar código técnico.
                 'error': str(e)
             }
     
+    @staticmethod
+    def get_cart_recommendations(cart: Cart, limit: int = 3) -> List[Dict[str, Any]]:
+        """Productos que otros clientes compraron junto con los del carrito"""
+        from apps.ml_predictions.services import RecommendationService
+        
+        product_ids = list(cart.items.values_list('product_id', flat=True))
+        return RecommendationService.frequently_bought_together(product_ids, limit=limit)
+    
     def get_cart_summary(self, cart_id: str) -> Dict[str, Any]:
         """Obtiene resumen del carrito"""
         try:
@@ -54,7 +54,8 @@ def chat_with_agent(request):
                                 'price': float(item.price)
                             }
                             for item in cart.items.all()
-                        ]
+                        ],
+                        'frequently_bought_together': AIAgentService.get_cart_recommendations(cart)
                     }
                 }
             except Cart.DoesNotExist:
@@ -218,6 +219,7 @@ def get_agent_suggestions(request):
         
         # Obtener contexto del carrito
         cart_context = {}
+        recommendations = []
         if cart_id:
             try:
                 # Intentar buscar por ID primero, luego por session_key
@@ -233,6 +235,8 @@ def get_agent_suggestions(request):
                         'total_amount': float(cart.total_amount)
                     }
                 }
+                if cart.total_items:
+                    recommendations = AIAgentService.get_cart_recommendations(cart)
             except Cart.DoesNotExist:
                 cart_context = {'cart': {}}
         
@@ -246,7 +250,12 @@ def get_agent_suggestions(request):
                 "¿Te gustaría ver nuestras categorías?"
             ]
         else:
+            # Comprados juntos frecuentemente con lo que ya hay en el carrito
             suggestions = [
+                f"Otros clientes también compraron {product['name']}"
+                for product in recommendations
+            ]
+            suggestions += [
                 "¿Quieres agregar más productos?",
                 "¿Te gustaría proceder al pago?",
                 "¿Necesitas ver el resumen de tu carrito?"
@@ -254,7 +263,8 @@ def get_agent_suggestions(request):
         
         return Response({
             'success': True,
-            'suggestions': suggestions
+            'suggestions': suggestions,
+            'recommendations': recommendations
         })
         
     except Exception as e:
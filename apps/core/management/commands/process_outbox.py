@@ -0,0 +1,82 @@
+"""
+Worker que procesa los eventos del outbox transaccional
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.core.outbox import OutboxService
+
+
+class Command(BaseCommand):
+    help = 'Procesa eventos del outbox (notificaciones, PDFs de comprobantes, alertas de stock)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar los eventos disponibles y terminar',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Cantidad de eventos a reservar por lote',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando no hay eventos pendientes',
+        )
+        parser.add_argument(
+            '--event-type',
+            action='append',
+            dest='event_types',
+            help='Procesar solo este tipo de evento (se puede repetir)',
+        )
+        parser.add_argument(
+            '--exclude-event-type',
+            action='append',
+            dest='exclude_event_types',
+            help='No procesar este tipo de evento (se puede repetir)',
+        )
+
+    def handle(self, *args, **options):
+        once = options['once']
+        batch_size = options['batch_size']
+        sleep_seconds = options['sleep']
+        event_types = options['event_types']
+        exclude_event_types = options['exclude_event_types']
+
+        self.stdout.write('Iniciando worker del outbox...')
+
+        try:
+            while True:
+                close_old_connections()
+
+                requeued = OutboxService.requeue_stale(
+                    event_types=event_types,
+                    exclude_event_types=exclude_event_types
+                )
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'{requeued} evento(s) reencolado(s) por timeout'))
+
+                result = OutboxService.process_batch(
+                    batch_size=batch_size,
+                    event_types=event_types,
+                    exclude_event_types=exclude_event_types
+                )
+                if result['processed']:
+                    self.stdout.write(
+                        f"Procesados {result['processed']} evento(s): "
+                        f"{result['completed']} completado(s), {result['failed']} fallido(s)"
+                    )
+
+                if once and not result['processed']:
+                    break
+                if not result['processed']:
+                    time.sleep(sleep_seconds)
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido')
+
+        self.stdout.write(self.style.SUCCESS('Worker del outbox finalizado'))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('event_type', models.CharField(max_length=50, verbose_name='Tipo de Evento')),
+                ('payload', models.JSONField(default=dict, verbose_name='Datos del Evento')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Máximo de Intentos')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible Desde')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Procesado en')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último Error')),
+            ],
+            options={
+                'verbose_name': 'Evento Outbox',
+                'verbose_name_plural': 'Eventos Outbox',
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='core_outbox_status_68cde3_idx')],
+            },
+        ),
+    ]
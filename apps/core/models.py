@@ -72,4 +72,32 @@ class Company(BaseModel):
         verbose_name_plural = 'Empresas'
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class OutboxEvent(BaseModel):
+    """Outbox transaccional de efectos secundarios (procesado por `manage.py process_outbox`)"""
+    # Los tipos válidos son las claves de apps.core.outbox.OUTBOX_HANDLERS
+    event_type = models.CharField(max_length=50, verbose_name='Tipo de Evento')
+    payload = models.JSONField(default=dict, verbose_name='Datos del Evento')
+    status = models.CharField(max_length=20, choices=[
+        ('pending', 'Pendiente'),
+        ('processing', 'Procesando'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido')
+    ], default='pending', verbose_name='Estado')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Intentos')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Máximo de Intentos')
+    available_at = models.DateTimeField(default=timezone.now, verbose_name='Disponible Desde')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='Procesado en')
+    last_error = models.TextField(blank=True, verbose_name='Último Error')
+    
+    class Meta:
+        verbose_name = 'Evento Outbox'
+        verbose_name_plural = 'Eventos Outbox'
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} - {self.get_status_display()}"
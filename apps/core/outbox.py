@@ -0,0 +1,209 @@
+"""
+Outbox transaccional para efectos secundarios de SmartSales365
+
+Los eventos se escriben en la misma transacción que el cambio de negocio
+(p. ej. la venta) y un worker (`python manage.py process_outbox`) los procesa
+fuera del request, con reintentos y backoff exponencial.
+"""
+import logging
+import traceback
+from datetime import timedelta
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Tipo de evento -> ruta del handler. Cada handler recibe el payload del evento
+# y debe lanzar una excepción si el procesamiento falla y se debe reintentar.
+OUTBOX_HANDLERS = {
+    'sale_notification': 'apps.core.outbox.handle_sale_notification',
+    'sale_receipt_pdf': 'apps.core.outbox.handle_sale_receipt_pdf',
+    'low_stock_alert': 'apps.core.outbox.handle_low_stock_alert',
+    'sales_rollup_refresh': 'apps.sales.services.handle_sales_rollup_refresh',
+    'ml_model_training': 'apps.ml_predictions.services.handle_ml_model_training',
+    'recommender_update': 'apps.ml_predictions.services.handle_recommender_update',
+    'sales_anomaly_observe': 'apps.ml_predictions.anomalies.handle_sales_anomaly_observe',
+    'report_generation': 'apps.reports.services.handle_report_generation',
+}
+
+
+class OutboxService:
+    """Servicio para encolar y procesar eventos del outbox"""
+
+    @staticmethod
+    def validate_event_type(event_type: str):
+        """Lanza ValueError si no hay un handler registrado para el tipo de evento"""
+        if event_type not in OUTBOX_HANDLERS:
+            raise ValueError(f"Tipo de evento sin handler en el outbox: {event_type}")
+
+    @staticmethod
+    def enqueue(event_type: str, payload: Optional[Dict[str, Any]] = None, delay_seconds: int = 0) -> OutboxEvent:
+        """Encola un evento. Debe llamarse dentro de la transacción del cambio de negocio"""
+        OutboxService.validate_event_type(event_type)
+        return OutboxEvent.objects.create(
+            event_type=event_type,
+            payload=payload or {},
+            available_at=timezone.now() + timedelta(seconds=delay_seconds)
+        )
+
+    @staticmethod
+    def enqueue_many(events: Iterable[Tuple[str, Dict[str, Any]]]) -> List[OutboxEvent]:
+        """Encola varios eventos en un solo INSERT"""
+        events = list(events)
+        for event_type, _ in events:
+            OutboxService.validate_event_type(event_type)
+        now = timezone.now()
+        return OutboxEvent.objects.bulk_create([
+            OutboxEvent(event_type=event_type, payload=payload, available_at=now)
+            for event_type, payload in events
+        ])
+
+    @staticmethod
+    def claim_batch(
+        batch_size: int,
+        event_types: Optional[List[str]] = None,
+        exclude_event_types: Optional[List[str]] = None
+    ) -> List[OutboxEvent]:
+        """Reserva un lote de eventos pendientes (SKIP LOCKED permite varios workers)"""
+        with transaction.atomic():
+            queryset = OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                available_at__lte=timezone.now()
+            )
+            if event_types:
+                queryset = queryset.filter(event_type__in=event_types)
+            if exclude_event_types:
+                queryset = queryset.exclude(event_type__in=exclude_event_types)
+
+            events = list(queryset.order_by('available_at', 'id')[:batch_size])
+            if events:
+                # El intento se cuenta al reservar: si el handler tumba al worker,
+                # requeue_stale igual ve el intento y no lo reintenta para siempre
+                OutboxEvent.objects.filter(id__in=[e.id for e in events]).update(
+                    status='processing',
+                    attempts=F('attempts') + 1,
+                    updated_at=timezone.now()
+                )
+                for event in events:
+                    event.status = 'processing'
+                    event.attempts += 1
+        return events
+
+    @staticmethod
+    def process_event(event: OutboxEvent) -> bool:
+        """Ejecuta el handler de un evento reservado (con el intento ya contado) y registra el resultado"""
+        handler_path = OUTBOX_HANDLERS.get(event.event_type)
+
+        try:
+            if not handler_path:
+                raise ValueError(f"No hay handler registrado para '{event.event_type}'")
+            import_string(handler_path)(event.payload)
+        except Exception as e:
+            event.last_error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+            if event.attempts >= event.max_attempts:
+                event.status = 'failed'
+                logger.error(f"Evento outbox {event.id} ({event.event_type}) falló definitivamente: {e}")
+            else:
+                event.status = 'pending'
+                event.available_at = timezone.now() + timedelta(
+                    seconds=OutboxService._backoff_seconds(event.attempts)
+                )
+                logger.warning(
+                    f"Evento outbox {event.id} ({event.event_type}) falló "
+                    f"(intento {event.attempts}/{event.max_attempts}): {e}"
+                )
+            event.save(update_fields=['attempts', 'status', 'available_at', 'last_error', 'updated_at'])
+            return False
+
+        event.status = 'completed'
+        event.processed_at = timezone.now()
+        event.last_error = ''
+        event.save(update_fields=['attempts', 'status', 'processed_at', 'last_error', 'updated_at'])
+        return True
+
+    @staticmethod
+    def process_batch(
+        batch_size: Optional[int] = None,
+        event_types: Optional[List[str]] = None,
+        exclude_event_types: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """Procesa un lote de eventos y retorna el conteo de resultados"""
+        batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+        events = OutboxService.claim_batch(batch_size, event_types, exclude_event_types)
+
+        result = {'processed': len(events), 'completed': 0, 'failed': 0}
+        for event in events:
+            if OutboxService.process_event(event):
+                result['completed'] += 1
+            else:
+                result['failed'] += 1
+        return result
+
+    @staticmethod
+    def requeue_stale(
+        timeout_seconds: Optional[int] = None,
+        event_types: Optional[List[str]] = None,
+        exclude_event_types: Optional[List[str]] = None
+    ) -> int:
+        """
+        Devuelve a pendiente los eventos reservados por un worker que murió
+
+        Los que ya agotaron sus intentos quedan fallidos: un evento que tumba al
+        worker no se reintenta indefinidamente. Retorna cuántos se reencolaron.
+        """
+        timeout_seconds = timeout_seconds or getattr(settings, 'OUTBOX_PROCESSING_TIMEOUT_SECONDS', 600)
+        cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+        queryset = OutboxEvent.objects.filter(status='processing', updated_at__lt=cutoff)
+        if event_types:
+            queryset = queryset.filter(event_type__in=event_types)
+        if exclude_event_types:
+            queryset = queryset.exclude(event_type__in=exclude_event_types)
+
+        exhausted = queryset.filter(attempts__gte=F('max_attempts')).update(
+            status='failed',
+            last_error='El worker no terminó el evento en ninguno de sus intentos',
+            updated_at=timezone.now()
+        )
+        if exhausted:
+            logger.error(f"{exhausted} evento(s) outbox fallaron definitivamente tras quedar sin terminar")
+        return queryset.update(
+            status='pending',
+            updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def _backoff_seconds(attempts: int) -> int:
+        """Backoff exponencial: base * 2^(intentos-1), acotado"""
+        base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+        maximum = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+        return min(base * (2 ** (attempts - 1)), maximum)
+
+
+def handle_sale_notification(payload: Dict[str, Any]):
+    """Notifica a los administradores una nueva venta (BD + push Expo)"""
+    from .services import NotificationService
+
+    # False solo ante fallas transitorias; el reintento no duplica lo ya notificado
+    if not NotificationService.send_sale_notification(payload['sale_id']):
+        raise RuntimeError(f"No se pudo notificar la venta {payload['sale_id']}")
+
+
+def handle_sale_receipt_pdf(payload: Dict[str, Any]):
+    """Genera el PDF del comprobante de una venta si aún no existe"""
+    from apps.sales.models import SaleReceipt
+
+    receipt = SaleReceipt.objects.select_related('sale').get(sale_id=payload['sale_id'])
+    if not receipt.pdf_file:
+        receipt.generate_pdf()
+
+
+def handle_low_stock_alert(payload: Dict[str, Any]):
+    """Envía alerta de stock bajo a los administradores"""
+    from .services import NotificationService
+
+    NotificationService.send_low_stock_alert(payload['product_id'])
@@ -402,10 +402,62 @@ class NotificationService:
         except Exception as e:
             print(f"Error enviando alerta de stock: {e}")
             return False
-    
+
+    @staticmethod
+    def send_sales_anomaly_alert(title: str, message: str, notification_type: str = 'warning',
+                                 data: dict = None) -> bool:
+        """Envía alerta de anomalía en las ventas (caída o pico) a los administradores"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        try:
+            from apps.notifications.models import Notification
+            from apps.mobile.services import ExpoPushNotificationService
+            from django.contrib.auth import get_user_model
+
+            User = get_user_model()
+            admins = User.objects.filter(is_staff=True)
+
+            for admin in admins:
+                # Notificación en base de datos
+                Notification.objects.create(
+                    user=admin,
+                    title=title,
+                    message=message,
+                    notification_type=notification_type
+                )
+
+                # Notificación push móvil
+                try:
+                    ExpoPushNotificationService.send_to_user_devices(
+                        user_id=admin.id,
+                        title=title,
+                        message=message,
+                        data=data or {'type': 'sales_anomaly'},
+                        notification_type=notification_type
+                    )
+                except Exception as push_error:
+                    logger.error(f"Error enviando push notification: {push_error}")
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Error enviando alerta de anomalía de ventas: {e}")
+            return False
+
     @staticmethod
     def send_sale_notification(sale_id: str) -> bool:
-        """Envía notificación de nueva venta"""
+        """
+        Envía notificación de nueva venta
+        
+        Es idempotente por venta: la notificación en BD de cada administrador se
+        crea una sola vez (referencia "sale:<id>") y el push solo se envía junto
+        con esa creación, así que un reintento no duplica nada.
+        
+        Returns:
+            False solo ante fallas transitorias (conviene reintentar); sin
+            administradores o sin la venta no hay nada que reintentar
+        """
         import logging
         logger = logging.getLogger(__name__)
         
@@ -416,39 +468,52 @@ class NotificationService:
             from django.contrib.auth import get_user_model
             
             User = get_user_model()
-            sale = Sale.objects.get(id=sale_id)
+            sale = Sale.objects.select_related('client').filter(id=sale_id).first()
+            if sale is None:
+                logger.warning(f"La venta {sale_id} ya no existe. No se enviarán notificaciones.")
+                return True
             logger.info(f"Iniciando envío de notificación para venta {sale_id}")
             
             # Notificar a administradores
-            admins = User.objects.filter(is_staff=True)
-            logger.info(f"Encontrados {admins.count()} administradores")
+            admins = list(User.objects.filter(is_staff=True))
+            logger.info(f"Encontrados {len(admins)} administradores")
             
-            if admins.count() == 0:
+            if not admins:
                 logger.warning("No hay administradores. No se enviarán notificaciones.")
-                return False
+                return True
             
             title = "Nueva Venta"
             message = f"Se realizó una nueva venta por ${sale.total} al cliente {sale.client.name}"
+            reference = f"sale:{sale.id}"
             
             total_push_sent = 0
             total_push_failed = 0
+            db_failed = 0
             
             for admin in admins:
                 logger.info(f"Procesando notificación para admin: {admin.username} (ID: {admin.id})")
                 
-                # Notificación en base de datos
+                # Notificación en base de datos (una por venta y administrador)
                 try:
-                    notification = Notification.objects.create(
+                    notification, created = Notification.objects.get_or_create(
                         user=admin,
-                        title=title,
-                        message=message,
-                        notification_type='success'
+                        reference=reference,
+                        defaults={
+                            'title': title,
+                            'message': message,
+                            'notification_type': 'success'
+                        }
                     )
-                    logger.info(f"Notificación en BD creada: {notification.id}")
                 except Exception as db_error:
                     logger.error(f"Error creando notificación en BD para {admin.username}: {db_error}")
+                    db_failed += 1
                     continue
                 
+                if not created:
+                    logger.info(f"{admin.username} ya fue notificado de la venta {sale_id}")
+                    continue
+                logger.info(f"Notificación en BD creada: {notification.id}")
+                
                 # Notificación push móvil
                 try:
                     from apps.mobile.models import PushNotificationDevice
@@ -481,7 +546,8 @@ class NotificationService:
                     total_push_failed += 1
             
             logger.info(f"Notificaciones completadas: {total_push_sent} push enviado(s), {total_push_failed} fallido(s)")
-            return True
+            # Solo las notificaciones en BD que fallaron justifican un reintento
+            return db_failed == 0
             
         except Exception as e:
             logger.error(f"Error enviando notificación de venta: {e}", exc_info=True)
@@ -0,0 +1,125 @@
+"""
+Pruebas del outbox transaccional: reintentos con backoff y eventos atascados
+"""
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import OutboxEvent
+from .outbox import OUTBOX_HANDLERS, OutboxService
+
+
+def failing_handler(payload):
+    raise RuntimeError('falla de prueba')
+
+
+def succeeding_handler(payload):
+    return None
+
+
+@override_settings(OUTBOX_RETRY_BASE_SECONDS=30, OUTBOX_RETRY_MAX_SECONDS=3600)
+class OutboxServiceTests(TestCase):
+    """Procesamiento de eventos del outbox"""
+
+    def process(self, event):
+        # Simula al worker: el evento vuelve a estar disponible y se reserva
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+        return OutboxService.process_batch(event_types=[event.event_type])
+
+    def test_completed_event(self):
+        event = OutboxService.enqueue('low_stock_alert', {'product_id': 1})
+
+        with mock.patch.dict(OUTBOX_HANDLERS, {'low_stock_alert': 'apps.core.tests.succeeding_handler'}):
+            result = self.process(event)
+
+        event.refresh_from_db()
+        self.assertEqual(result, {'processed': 1, 'completed': 1, 'failed': 0})
+        self.assertEqual(event.status, 'completed')
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNotNone(event.processed_at)
+
+    def test_failed_event_is_retried_with_backoff(self):
+        event = OutboxService.enqueue('low_stock_alert', {'product_id': 1})
+
+        with mock.patch.dict(OUTBOX_HANDLERS, {'low_stock_alert': 'apps.core.tests.failing_handler'}):
+            before = timezone.now()
+            self.process(event)
+            event.refresh_from_db()
+            self.assertEqual(event.status, 'pending')
+            self.assertEqual(event.attempts, 1)
+            self.assertIn('falla de prueba', event.last_error)
+            self.assertGreaterEqual(event.available_at, before + timedelta(seconds=30))
+
+            # El segundo intento espera el doble
+            before = timezone.now()
+            self.process(event)
+            event.refresh_from_db()
+            self.assertEqual(event.attempts, 2)
+            self.assertGreaterEqual(event.available_at, before + timedelta(seconds=60))
+
+    def test_event_fails_after_max_attempts(self):
+        event = OutboxService.enqueue('low_stock_alert', {'product_id': 1})
+
+        with mock.patch.dict(OUTBOX_HANDLERS, {'low_stock_alert': 'apps.core.tests.failing_handler'}):
+            for _ in range(event.max_attempts):
+                self.process(event)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+        self.assertEqual(event.attempts, event.max_attempts)
+        # Un evento fallido ya no se reserva
+        self.assertEqual(self.process(event)['processed'], 0)
+
+    def test_pending_event_is_not_claimed_before_backoff(self):
+        event = OutboxService.enqueue('low_stock_alert', {'product_id': 1}, delay_seconds=60)
+
+        self.assertEqual(OutboxService.process_batch(event_types=['low_stock_alert'])['processed'], 0)
+
+    def test_unknown_event_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            OutboxService.enqueue('evento_inexistente', {})
+        with self.assertRaises(ValueError):
+            OutboxService.enqueue_many([('low_stock_alert', {}), ('evento_inexistente', {})])
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_requeue_stale(self):
+        stale = OutboxService.enqueue('low_stock_alert', {'product_id': 1})
+        recent = OutboxService.enqueue('low_stock_alert', {'product_id': 2})
+        OutboxEvent.objects.filter(pk=stale.pk).update(
+            status='processing', updated_at=timezone.now() - timedelta(seconds=900)
+        )
+        OutboxEvent.objects.filter(pk=recent.pk).update(status='processing', updated_at=timezone.now())
+
+        requeued = OutboxService.requeue_stale(timeout_seconds=600)
+
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(requeued, 1)
+        self.assertEqual(stale.status, 'pending')
+        self.assertEqual(recent.status, 'processing')
+
+    def test_attempt_is_counted_when_claimed(self):
+        event = OutboxService.enqueue('low_stock_alert', {'product_id': 1})
+
+        claimed = OutboxService.claim_batch(10, event_types=['low_stock_alert'])
+
+        event.refresh_from_db()
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(event.status, 'processing')
+
+    def test_event_that_kills_the_worker_fails_after_max_attempts(self):
+        event = OutboxService.enqueue('low_stock_alert', {'product_id': 1})
+
+        # Cada vez el worker reserva el evento y muere sin registrar el resultado
+        for attempt in range(1, event.max_attempts + 1):
+            OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+            self.assertEqual(len(OutboxService.claim_batch(10, event_types=['low_stock_alert'])), 1)
+            OutboxEvent.objects.filter(pk=event.pk).update(updated_at=timezone.now() - timedelta(seconds=900))
+            requeued = OutboxService.requeue_stale(timeout_seconds=600)
+            self.assertEqual(requeued, 0 if attempt == event.max_attempts else 1)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+        self.assertEqual(event.attempts, event.max_attempts)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MLModel, Prediction
+from .models import MLModel, Prediction, ClientChurnScore, DailyFeatures, SalesAnomalyState
 
 @admin.register(MLModel)
 class MLModelAdmin(admin.ModelAdmin):
@@ -9,5 +9,22 @@ class MLModelAdmin(admin.ModelAdmin):
 
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'model', 'confidence', 'created_at']
+    list_display = ['id', 'model', 'target_date', 'horizon', 'confidence', 'created_at']
     list_filter = ['model', 'created_at']
+
+@admin.register(ClientChurnScore)
+class ClientChurnScoreAdmin(admin.ModelAdmin):
+    list_display = ['client', 'churn_risk', 'risk_level', 'days_since_last_purchase', 'avg_interval_days', 'scored_at']
+    list_filter = ['risk_level']
+    search_fields = ['client__name', 'client__email']
+    raw_id_fields = ['client']
+
+@admin.register(DailyFeatures)
+class DailyFeaturesAdmin(admin.ModelAdmin):
+    list_display = ['date', 'total_sales', 'week_sales', 'week_transactions', 'is_holiday', 'updated_at']
+    date_hierarchy = 'date'
+
+@admin.register(SalesAnomalyState)
+class SalesAnomalyStateAdmin(admin.ModelAdmin):
+    list_display = ['granularity', 'bucket_start', 'bucket_revenue', 'bucket_transactions', 'bucket_alerted', 'updated_at']
+    readonly_fields = ['slots']
@@ -0,0 +1,278 @@
+"""
+Detector incremental de anomalías en las ventas por hora y por día
+
+Cada venta completada llega por el outbox y se suma al período abierto (la
+hora o el día en curso). Al cerrarse un período su total se compara con la
+media y varianza móviles de su franja estacional (hora del día o día de la
+semana), que se actualizan con la recurrencia de Welford: el estado es O(1)
+por serie y nunca se vuelve a leer el historial de ventas. Cada venta se
+registra en SalesAnomalyObservation para que un evento repetido por el outbox
+no la sume dos veces. Los períodos sin
+ventas se cierran con total cero, ya sea al llegar la siguiente venta o con
+`python manage.py check_sales_anomalies` (cron), que es lo que permite
+detectar caídas como fallas en los pagos.
+"""
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import SalesAnomalyState, SalesAnomalyObservation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SalesAnomaly:
+    """Período con ventas fuera de lo esperado para su franja"""
+    granularity: str
+    kind: str
+    bucket_start: datetime
+    value: float
+    expected: float
+    z_score: float
+
+
+class SalesAnomalyDetector:
+    """Medias y varianzas móviles por franja, actualizadas venta a venta"""
+
+    GRANULARITIES = ('hour', 'day')
+
+    # Observaciones a partir de las cuales la media deja de ser acumulada y
+    # pasa a ser móvil (los períodos viejos pierden peso)
+    WINDOW = 60
+    # Piso de la desviación estándar relativo a la media, para franjas muy estables
+    RELATIVE_STD_FLOOR = 0.25
+    # Períodos vacíos que se cierran como máximo de una vez (tras una caída larga)
+    MAX_GAP_BUCKETS = {'hour': 24 * 7, 'day': 28}
+    # Ciclo estacional: lapso tras el cual la franja de un período vuelve a observarse
+    SEASON_CYCLE = {'hour': timedelta(days=1), 'day': timedelta(days=7)}
+    # Días que se conservan las ventas observadas (para descartar eventos repetidos)
+    OBSERVATION_RETENTION_DAYS = 35
+
+    def __init__(self, z_threshold: Optional[float] = None, min_observations: Optional[int] = None):
+        self.z_threshold = z_threshold or getattr(settings, 'SALES_ANOMALY_Z_THRESHOLD', 3.0)
+        self.min_observations = min_observations or getattr(settings, 'SALES_ANOMALY_MIN_OBSERVATIONS', 5)
+
+    @staticmethod
+    def bucket_start(moment: datetime, granularity: str) -> datetime:
+        """Inicio local de la hora o del día que contiene el momento"""
+        local = timezone.localtime(moment)
+        if granularity == 'hour':
+            return local.replace(minute=0, second=0, microsecond=0)
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def next_bucket(start: datetime, granularity: str) -> datetime:
+        """Inicio del período siguiente"""
+        step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+        return timezone.make_aware(timezone.make_naive(start) + step)
+
+    @staticmethod
+    def slot(start: datetime, granularity: str) -> str:
+        """Franja estacional del período: hora del día o día de la semana"""
+        local = timezone.localtime(start)
+        return str(local.hour if granularity == 'hour' else local.weekday())
+
+    def check(self, stats: Dict[str, float], value: float) -> Optional[float]:
+        """z-score del valor si la franja tiene historia suficiente para juzgarlo"""
+        if stats['n'] < self.min_observations or stats['mean'] <= 0:
+            return None
+        std = max(math.sqrt(stats['var']), self.RELATIVE_STD_FLOOR * stats['mean'])
+        return (value - stats['mean']) / std
+
+    def update(self, stats: Dict[str, float], value: float) -> Dict[str, float]:
+        """
+        Recurrencia de Welford (varianza poblacional) con ventana acotada
+
+        Los valores anómalos se recortan al umbral antes de incorporarlos para
+        que una caída o un pico no desplacen la línea base.
+        """
+        if stats['n'] >= self.min_observations and stats['mean'] > 0:
+            std = max(math.sqrt(stats['var']), self.RELATIVE_STD_FLOOR * stats['mean'])
+            limit = self.z_threshold * std
+            value = min(max(value, stats['mean'] - limit), stats['mean'] + limit)
+
+        alpha = 1 / min(stats['n'] + 1, self.WINDOW)
+        delta = value - stats['mean']
+        return {
+            'n': stats['n'] + 1,
+            'mean': stats['mean'] + alpha * delta,
+            'var': (1 - alpha) * (stats['var'] + alpha * delta * delta)
+        }
+
+    def observe(self, created_at: datetime, amount: float, sale_id: Optional[str] = None) -> List[SalesAnomaly]:
+        """
+        Incorpora una venta completada y retorna las anomalías detectadas
+
+        Con `sale_id` la venta se registra y, si ya se había observado (evento
+        repetido por el outbox), no se vuelve a sumar.
+        """
+        anomalies = []
+        with transaction.atomic():
+            if sale_id is not None:
+                _, created = SalesAnomalyObservation.objects.get_or_create(
+                    sale_id=sale_id,
+                    defaults={'amount': amount, 'observed_at': created_at}
+                )
+                if not created:
+                    logger.info(f"Venta {sale_id} ya observada por el detector de anomalías")
+                    return []
+
+            for granularity in self.GRANULARITIES:
+                state = self._lock(granularity)
+                bucket = self.bucket_start(created_at, granularity)
+                if state.bucket_start is None:
+                    state.bucket_start = bucket
+                elif bucket < state.bucket_start:
+                    # Venta de un período ya cerrado (evento atrasado): no se reabre
+                    if self._apply_late(state, bucket, amount):
+                        outcome = "sumada a la estadística de su franja"
+                    else:
+                        outcome = "su franja ya no se puede corregir, descartada"
+                    logger.warning(f"Venta de {created_at} fuera del período abierto ({granularity}); {outcome}")
+                    state.save()
+                    continue
+
+                anomalies.extend(self._close_until(state, bucket))
+                state.bucket_revenue += amount
+                state.bucket_transactions += 1
+
+                # Los picos se avisan sin esperar a que cierre el período
+                stats = self._stats(state, state.bucket_start)
+                z_score = self.check(stats, state.bucket_revenue)
+                if not state.bucket_alerted and z_score is not None and z_score >= self.z_threshold:
+                    anomalies.append(self._anomaly(state, 'spike', stats, z_score))
+                    state.bucket_alerted = True
+                state.save()
+
+        self.notify(anomalies)
+        return anomalies
+
+    def _apply_late(self, state: SalesAnomalyState, bucket: datetime, amount: float) -> bool:
+        """
+        Suma una venta atrasada a la media de la franja de su período ya cerrado
+
+        Solo si ese período sigue siendo la última observación de su franja
+        (menos de un ciclo estacional atrás): la media se corrige con el mismo
+        peso con que entró el período. La varianza no se corrige.
+        """
+        if bucket < state.bucket_start - self.SEASON_CYCLE[state.granularity]:
+            return False
+        slot = self.slot(bucket, state.granularity)
+        stats = state.slots.get(slot)
+        if not stats or not stats['n']:
+            return False
+        alpha = 1 / min(stats['n'], self.WINDOW)
+        state.slots[slot] = {**stats, 'mean': stats['mean'] + alpha * amount}
+        return True
+
+    def tick(self, now: Optional[datetime] = None) -> List[SalesAnomaly]:
+        """Cierra los períodos ya terminados (aunque no haya habido ventas)"""
+        now = now or timezone.now()
+        anomalies = []
+        for granularity in self.GRANULARITIES:
+            with transaction.atomic():
+                state = self._lock(granularity)
+                if state.bucket_start is None:
+                    continue
+                anomalies.extend(self._close_until(state, self.bucket_start(now, granularity)))
+                state.save()
+
+        SalesAnomalyObservation.objects.filter(
+            observed_at__lt=now - timedelta(days=self.OBSERVATION_RETENTION_DAYS)
+        ).delete()
+
+        self.notify(anomalies)
+        return anomalies
+
+    def _close_until(self, state: SalesAnomalyState, until: datetime) -> List[SalesAnomaly]:
+        """Cierra el período abierto y los vacíos siguientes hasta `until` (exclusivo)"""
+        anomalies = []
+        closed = 0
+        while state.bucket_start < until:
+            if closed >= self.MAX_GAP_BUCKETS[state.granularity]:
+                # Hueco demasiado largo: se salta sin incorporarlo a las estadísticas
+                state.bucket_start = until
+                break
+
+            stats = self._stats(state, state.bucket_start)
+            value = state.bucket_revenue
+            z_score = self.check(stats, value)
+            if z_score is not None and z_score <= -self.z_threshold:
+                anomalies.append(self._anomaly(state, 'drop', stats, z_score))
+            elif z_score is not None and z_score >= self.z_threshold and not state.bucket_alerted:
+                anomalies.append(self._anomaly(state, 'spike', stats, z_score))
+
+            state.slots[self.slot(state.bucket_start, state.granularity)] = self.update(stats, value)
+            state.bucket_start = self.next_bucket(state.bucket_start, state.granularity)
+            state.bucket_revenue = 0
+            state.bucket_transactions = 0
+            state.bucket_alerted = False
+            closed += 1
+        return anomalies
+
+    def _stats(self, state: SalesAnomalyState, bucket: datetime) -> Dict[str, float]:
+        return state.slots.get(self.slot(bucket, state.granularity), {'n': 0, 'mean': 0.0, 'var': 0.0})
+
+    def _anomaly(self, state: SalesAnomalyState, kind: str, stats: Dict[str, float], z_score: float) -> SalesAnomaly:
+        return SalesAnomaly(
+            granularity=state.granularity,
+            kind=kind,
+            bucket_start=state.bucket_start,
+            value=state.bucket_revenue,
+            expected=stats['mean'],
+            z_score=z_score
+        )
+
+    @staticmethod
+    def _lock(granularity: str) -> SalesAnomalyState:
+        SalesAnomalyState.objects.get_or_create(granularity=granularity)
+        return SalesAnomalyState.objects.select_for_update().get(granularity=granularity)
+
+    @staticmethod
+    def notify(anomalies: List[SalesAnomaly]):
+        """Avisa al staff: una notificación por tipo y granularidad"""
+        from apps.core.services import NotificationService
+
+        groups: Dict[tuple, List[SalesAnomaly]] = {}
+        for anomaly in anomalies:
+            groups.setdefault((anomaly.granularity, anomaly.kind), []).append(anomaly)
+
+        for (granularity, kind), items in groups.items():
+            period = 'hora' if granularity == 'hour' else 'día'
+            fmt = '%d/%m/%Y %H:%M' if granularity == 'hour' else '%d/%m/%Y'
+            first = timezone.localtime(items[0].bucket_start).strftime(fmt)
+            last = items[-1]
+            if kind == 'drop':
+                title = f"Caída de ventas por {period}"
+                message = (
+                    f"Ventas por debajo de lo esperado en {len(items)} período(s) desde {first}: "
+                    f"${last.value:,.2f} frente a ${last.expected:,.2f} habituales. "
+                    f"Revisa pagos y disponibilidad de la tienda."
+                )
+            else:
+                title = f"Pico de ventas por {period}"
+                message = (
+                    f"Ventas por encima de lo esperado desde {first}: "
+                    f"${last.value:,.2f} frente a ${last.expected:,.2f} habituales."
+                )
+            NotificationService.send_sales_anomaly_alert(
+                title,
+                message,
+                notification_type='error' if kind == 'drop' else 'warning',
+                data={'type': 'sales_anomaly', 'kind': kind, 'granularity': granularity}
+            )
+
+
+def handle_sales_anomaly_observe(payload: Dict[str, Any]):
+    """Handler del outbox: incorpora una venta completada al detector (idempotente por sale_id)"""
+    SalesAnomalyDetector().observe(
+        parse_datetime(payload.get('completed_at') or payload['created_at']),
+        float(payload['total']),
+        sale_id=payload.get('sale_id')
+    )
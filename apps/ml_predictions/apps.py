@@ -4,3 +4,6 @@ class MlPredictionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ml_predictions'
     verbose_name = 'Predicciones ML'
+    
+    def ready(self):
+        from . import signals
@@ -0,0 +1,126 @@
+"""
+Estimadores intercambiables para el pronóstico de ventas
+
+La familia de modelo se elige con la clave `estimator` de
+MLModel.hyperparameters; el resto de las claves se pasan como parámetros al
+estimador (las que no reconoce se ignoran). Sin `estimator` se usa el bosque
+aleatorio original, así que los modelos ya registrados no cambian.
+"""
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from django.utils.module_loading import import_string
+
+DEFAULT_ESTIMATOR = 'random_forest'
+
+# Nombre -> clase y parámetros por defecto
+ESTIMATORS = {
+    'random_forest': {
+        'class': 'sklearn.ensemble.RandomForestRegressor',
+        'params': {
+            'n_estimators': 100,
+            'max_depth': 10,
+            'min_samples_split': 5,
+            'min_samples_leaf': 2,
+            'random_state': 42,
+        },
+    },
+    'hist_gradient_boosting': {
+        'class': 'sklearn.ensemble.HistGradientBoostingRegressor',
+        'params': {
+            'max_iter': 200,
+            'learning_rate': 0.05,
+            'max_leaf_nodes': 15,
+            'min_samples_leaf': 10,
+            'l2_regularization': 1.0,
+            'random_state': 42,
+        },
+    },
+    'ridge': {
+        'class': 'sklearn.linear_model.Ridge',
+        'params': {
+            'alpha': 1.0,
+        },
+    },
+}
+
+# Grilla pequeña de búsqueda por estimador (se combina con los hiperparámetros actuales)
+PARAM_GRIDS = {
+    'random_forest': {
+        'n_estimators': [100, 200],
+        'max_depth': [6, 10, None],
+        'min_samples_leaf': [1, 2, 5],
+    },
+    'hist_gradient_boosting': {
+        'learning_rate': [0.03, 0.1],
+        'max_leaf_nodes': [7, 15, 31],
+        'min_samples_leaf': [5, 20],
+    },
+    'ridge': {
+        'alpha': [0.1, 1.0, 10.0, 100.0],
+    },
+}
+
+
+def resolve_hyperparameters(hyperparameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Completa los hiperparámetros con los valores por defecto del estimador elegido"""
+    hyperparameters = dict(hyperparameters or {})
+    name = hyperparameters.pop('estimator', DEFAULT_ESTIMATOR)
+    if name not in ESTIMATORS:
+        raise ValueError(
+            f"Estimador desconocido: {name} (disponibles: {', '.join(ESTIMATORS)})"
+        )
+    return {'estimator': name, **ESTIMATORS[name]['params'], **hyperparameters}
+
+
+def build_estimator(hyperparameters: Optional[Dict[str, Any]] = None, n_jobs: Optional[int] = None):
+    """Instancia el estimador descrito por los hiperparámetros"""
+    params = resolve_hyperparameters(hyperparameters)
+    estimator = import_string(ESTIMATORS[params.pop('estimator')]['class'])()
+
+    valid = estimator.get_params()
+    if n_jobs is not None and 'n_jobs' in valid:
+        params.setdefault('n_jobs', n_jobs)
+    return estimator.set_params(**{key: value for key, value in params.items() if key in valid})
+
+
+def candidate_grid(hyperparameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Candidatos de la búsqueda: primero los hiperparámetros actuales y luego la grilla"""
+    from sklearn.model_selection import ParameterGrid
+
+    base = resolve_hyperparameters(hyperparameters)
+    candidates = [base]
+    for params in ParameterGrid(PARAM_GRIDS.get(base['estimator'], {})):
+        candidate = {**base, **params}
+        if candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+
+def evaluate_candidate(X: np.ndarray, y: np.ndarray, hyperparameters: Dict[str, Any], n_splits: int) -> Dict[str, Any]:
+    """
+    MAE/RMSE promedio de un candidato en particiones temporales
+
+    Función de módulo para poder ejecutarse en un pool de procesos; cada
+    proceso usa un solo núcleo y el paralelismo lo da el pool.
+    """
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+    from sklearn.model_selection import TimeSeriesSplit
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    started = time.perf_counter()
+    mae, rmse = [], []
+    for train_index, test_index in TimeSeriesSplit(n_splits=n_splits).split(X):
+        pipeline = make_pipeline(StandardScaler(), build_estimator(hyperparameters, n_jobs=1))
+        pipeline.fit(X[train_index], y[train_index])
+        y_pred = pipeline.predict(X[test_index])
+        mae.append(mean_absolute_error(y[test_index], y_pred))
+        rmse.append(np.sqrt(mean_squared_error(y[test_index], y_pred)))
+
+    return {
+        'hyperparameters': hyperparameters,
+        'mae': float(np.mean(mae)),
+        'rmse': float(np.mean(rmse)),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
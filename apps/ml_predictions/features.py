@@ -0,0 +1,217 @@
+"""
+Feature store diario del pronóstico de ventas
+
+Las features de cada día se materializan en DailyFeatures a partir del resumen
+de ventas (SalesDailyRollup) desde el worker de entrenamiento o el comando
+`materialize_features`; el entrenamiento las lee de ahí. La predicción no
+escribe: arma las mismas columnas día a día del horizonte con
+calendar_features e history_features. Solo se usan datos conocidos antes del
+día (calendario e historial de los 7 días previos), nunca totales del mismo día.
+"""
+from datetime import timedelta
+from typing import Dict
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from apps.sales.models import SalesDailyRollup
+from .models import DailyFeatures
+
+
+class DailyFeatureStore:
+    """Materialización incremental y lectura de DailyFeatures"""
+
+    # (mes, día) de los días festivos considerados (simplificado)
+    HOLIDAYS = [
+        (1, 1),   # Año Nuevo
+        (2, 5),   # Día de la Constitución
+        (3, 21),  # Natalicio de Benito Juárez
+        (5, 1),   # Día del Trabajo
+        (9, 16),  # Día de la Independencia
+        (11, 20), # Día de la Revolución
+        (12, 25), # Navidad
+    ]
+
+    # Mes -> estación del año (0 invierno, 1 primavera, 2 verano, 3 otoño)
+    SEASONS = {
+        12: 0, 1: 0, 2: 0,
+        3: 1, 4: 1, 5: 1,
+        6: 2, 7: 2, 8: 2,
+        9: 3, 10: 3, 11: 3,
+    }
+
+    CALENDAR_COLUMNS = [
+        'day_of_week', 'day_of_month', 'month', 'quarter', 'is_weekend',
+        'is_month_start', 'is_month_end', 'is_holiday', 'season'
+    ]
+    HISTORY_COLUMNS = ['week_sales', 'week_transactions', 'week_unique_clients', 'week_avg_transaction']
+    FEATURE_COLUMNS = CALENDAR_COLUMNS + HISTORY_COLUMNS
+
+    # Días de historial que usan las features de cada día
+    HISTORY_DAYS = 7
+
+    @classmethod
+    def calendar_features(cls, dates: pd.DatetimeIndex) -> pd.DataFrame:
+        """Features de calendario (conocidas de antemano para cualquier fecha)"""
+        holiday_keys = {month * 100 + day for month, day in cls.HOLIDAYS}
+        return pd.DataFrame({
+            'day_of_week': dates.dayofweek,
+            'day_of_month': dates.day,
+            'month': dates.month,
+            'quarter': dates.quarter,
+            'is_weekend': (dates.dayofweek >= 5).astype(int),
+            'is_month_start': (dates.day <= 7).astype(int),
+            'is_month_end': (dates.day >= 25).astype(int),
+            'is_holiday': (dates.month * 100 + dates.day).isin(holiday_keys).astype(int),
+            'season': dates.month.map(cls.SEASONS),
+        }, index=dates)
+
+    @classmethod
+    def build(cls, daily: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+        """
+        Calcula las features de un rango de días de forma vectorizada
+
+        Args:
+            daily: Totales por día con columnas date, revenue, transaction_count y
+                unique_clients desde HISTORY_DAYS antes de start_date (los días sin
+                ventas pueden faltar)
+            start_date: Primer día del resultado
+            end_date: Último día del resultado
+
+        Returns:
+            DataFrame con columna date, total_sales y FEATURE_COLUMNS, un día por fila
+        """
+        index = pd.date_range(start_date - timedelta(days=cls.HISTORY_DAYS), end_date, freq='D')
+        daily = daily.assign(date=pd.to_datetime(daily['date'])).set_index('date')
+        daily = daily.reindex(index).fillna(0)
+
+        def previous_week(column: str) -> pd.Series:
+            # Suma de los HISTORY_DAYS días anteriores (sin incluir el propio día)
+            return daily[column].astype(float).shift(1, fill_value=0).rolling(cls.HISTORY_DAYS, min_periods=1).sum()
+
+        week_sales = previous_week('revenue')
+        week_transactions = previous_week('transaction_count')
+        history = pd.DataFrame({
+            'total_sales': daily['revenue'].astype(float),
+            'week_sales': week_sales,
+            'week_transactions': week_transactions.astype(int),
+            'week_unique_clients': previous_week('unique_clients').astype(int),
+            'week_avg_transaction': (week_sales / week_transactions.where(week_transactions > 0)).fillna(0),
+        }, index=index).loc[pd.Timestamp(start_date):]
+
+        features = cls.calendar_features(history.index).join(history)
+        return features.rename_axis('date').reset_index().assign(
+            date=lambda df: df['date'].dt.date
+        )[['date', 'total_sales'] + cls.FEATURE_COLUMNS]
+
+    @classmethod
+    def materialize(cls, through=None, rebuild: bool = False) -> int:
+        """
+        Materializa las features hasta `through` (hoy por defecto)
+
+        Solo recalcula desde el último día guardado o desde el primer día cuyo
+        resumen cambió después de la última materialización (los cambios afectan
+        el historial de los días siguientes). El día en curso se guarda sin
+        total_sales, que se completa cuando el día cierra.
+
+        Returns:
+            Cantidad de días recalculados
+        """
+        today = timezone.localdate()
+        through = through or today
+        rollups = SalesDailyRollup.objects.all()
+        source = rollups.aggregate(first=Min('date'), watermark=Max('updated_at'))
+        if source['first'] is None:
+            return 0
+
+        state = DailyFeatures.objects.aggregate(last_date=Max('date'), watermark=Max('rollup_watermark'))
+        if rebuild or state['last_date'] is None:
+            start = source['first']
+        else:
+            start = state['last_date']
+            if state['watermark'] is not None:
+                changed = rollups.filter(updated_at__gt=state['watermark']).aggregate(first=Min('date'))['first']
+                if changed is None and state['last_date'] >= through:
+                    return 0
+                if changed is not None:
+                    start = min(start, changed)
+        if start > through:
+            return 0
+
+        rows = rollups.filter(
+            date__gte=start - timedelta(days=cls.HISTORY_DAYS),
+            date__lte=through
+        ).values('date', 'revenue', 'transaction_count', 'unique_clients')
+        daily = pd.DataFrame.from_records(rows, columns=['date', 'revenue', 'transaction_count', 'unique_clients'])
+        frame = cls.build(daily, start, through)
+
+        # Los días abiertos todavía no tienen objetivo
+        total_sales = frame['total_sales'].where(frame['date'] < today)
+        columns = frame[cls.FEATURE_COLUMNS].to_dict('list')
+        features = [
+            DailyFeatures(
+                date=day,
+                total_sales=None if np.isnan(total_sales.iat[i]) else float(total_sales.iat[i]),
+                rollup_watermark=source['watermark'],
+                **{column: values[i] for column, values in columns.items()}
+            )
+            for i, day in enumerate(frame['date'])
+        ]
+
+        with transaction.atomic():
+            if rebuild:
+                DailyFeatures.objects.all().delete()
+            DailyFeatures.objects.bulk_create(
+                features,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['date'],
+                update_fields=['total_sales', 'rollup_watermark', 'updated_at'] + cls.FEATURE_COLUMNS
+            )
+        return len(features)
+
+    @classmethod
+    def training_frame(cls, start_date, end_date) -> pd.DataFrame:
+        """
+        Días cerrados del rango con su objetivo, leídos de la tabla
+
+        Solo lectura: la tabla la materializan el worker de entrenamiento y
+        `materialize_features`, nunca un request.
+        """
+        rows = DailyFeatures.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date,
+            total_sales__isnull=False
+        ).order_by('date').values('date', 'total_sales', *cls.FEATURE_COLUMNS)
+        return pd.DataFrame.from_records(rows, columns=['date', 'total_sales'] + cls.FEATURE_COLUMNS)
+
+    @classmethod
+    def serving_history(cls, origin) -> np.ndarray:
+        """
+        Totales de los HISTORY_DAYS días previos a `origin` leídos del resumen
+
+        Returns:
+            Matriz (HISTORY_DAYS, 3) con revenue, transaction_count y
+            unique_clients por día, del más antiguo al más reciente (ceros en los
+            días sin ventas)
+        """
+        index = pd.date_range(origin - timedelta(days=cls.HISTORY_DAYS), origin - timedelta(days=1), freq='D')
+        rows = SalesDailyRollup.objects.filter(
+            date__gte=index[0].date(),
+            date__lt=origin
+        ).values('date', 'revenue', 'transaction_count', 'unique_clients')
+        daily = pd.DataFrame.from_records(rows, columns=['date', 'revenue', 'transaction_count', 'unique_clients'])
+        daily = daily.assign(date=pd.to_datetime(daily['date'])).set_index('date').reindex(index).fillna(0)
+        return daily[['revenue', 'transaction_count', 'unique_clients']].to_numpy(dtype=float)
+
+    @classmethod
+    def history_features(cls, window: np.ndarray) -> Dict[str, float]:
+        """Features de historial de un día a partir de sus HISTORY_DAYS días previos (igual que build)"""
+        week_sales, week_transactions, week_unique_clients = window.sum(axis=0)
+        return {
+            'week_sales': float(week_sales),
+            'week_transactions': int(week_transactions),
+            'week_unique_clients': int(week_unique_clients),
+            'week_avg_transaction': float(week_sales / week_transactions) if week_transactions > 0 else 0.0,
+        }
@@ -0,0 +1,56 @@
+"""
+Comando para comparar estimadores del pronóstico de ventas
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.ml_predictions.estimators import ESTIMATORS
+from apps.ml_predictions.features import DailyFeatureStore
+from apps.ml_predictions.services import SalesForecastService
+
+
+class Command(BaseCommand):
+    help = 'Compara costo y precisión de los estimadores del pronóstico en particiones temporales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estimators',
+            nargs='+',
+            choices=list(ESTIMATORS),
+            default=None,
+            help='Estimadores a comparar (por defecto todos)',
+        )
+        parser.add_argument(
+            '--splits',
+            type=int,
+            default=5,
+            help='Particiones de TimeSeriesSplit',
+        )
+        parser.add_argument(
+            '--use-synthetic',
+            action='store_true',
+            help='Usar datos sintéticos en lugar del feature store',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Ejecutando benchmark de estimadores...')
+
+        if not options['use_synthetic']:
+            DailyFeatureStore.materialize()
+
+        try:
+            results = SalesForecastService().benchmark(
+                estimators=options['estimators'],
+                n_splits=options['splits'],
+                use_synthetic=options['use_synthetic']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"\nDías de entrenamiento: {results[0]['training_data_size']}\n")
+        self.stdout.write(
+            f"{'Estimador':<24}{'Ajuste (s)':>12}{'Predicción (ms)':>17}{'Artefacto (KB)':>16}{'MAE':>12}{'RMSE':>12}"
+        )
+        for row in sorted(results, key=lambda row: row['mae']):
+            self.stdout.write(
+                f"{row['estimator']:<24}{row['fit_seconds']:>12.3f}{row['predict_ms']:>17.2f}"
+                f"{row['artifact_kb']:>16.1f}{row['mae']:>12.2f}{row['rmse']:>12.2f}"
+            )
@@ -0,0 +1,42 @@
+"""
+Comando para cerrar los períodos de ventas terminados y detectar caídas
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.ml_predictions.anomalies import SalesAnomalyDetector
+
+
+class Command(BaseCommand):
+    help = 'Cierra las horas/días ya terminados en el detector de anomalías (detecta caídas aunque no haya ventas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every',
+            type=float,
+            default=None,
+            help='Repetir la revisión cada N segundos en lugar de ejecutarla una vez',
+        )
+
+    def handle(self, *args, **options):
+        every = options['every']
+
+        try:
+            while True:
+                close_old_connections()
+                self.check()
+                if not every:
+                    break
+                time.sleep(every)
+        except KeyboardInterrupt:
+            self.stdout.write('Revisión de anomalías detenida')
+
+    def check(self):
+        anomalies = SalesAnomalyDetector().tick()
+
+        for anomaly in anomalies:
+            self.stdout.write(
+                f'  {anomaly.granularity} {anomaly.bucket_start:%Y-%m-%d %H:%M} {anomaly.kind}: '
+                f'${anomaly.value:,.2f} (esperado ${anomaly.expected:,.2f}, z={anomaly.z_score:.1f})'
+            )
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(anomalies)} anomalía(s) detectada(s)'))
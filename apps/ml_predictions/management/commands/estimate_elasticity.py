@@ -0,0 +1,29 @@
+"""
+Comando para estimar la elasticidad precio-demanda por producto
+"""
+from django.core.management.base import BaseCommand
+from apps.ml_predictions.services import PriceElasticityService
+
+
+class Command(BaseCommand):
+    help = 'Estima la elasticidad y la banda de precio sugerida de los productos con cambios de precio'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-back',
+            type=int,
+            default=730,
+            help='Días de historial de precios y ventas a considerar',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Estimando elasticidad de precios...')
+
+        result = PriceElasticityService(days_back=options['days_back']).run()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Elasticidad estimada para {result['products']} producto(s) "
+                f"({result['reliable']} confiable(s), {result['windows']} ventana(s) de precio)"
+            )
+        )
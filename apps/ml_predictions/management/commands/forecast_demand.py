@@ -0,0 +1,50 @@
+"""
+Comando para generar el pronóstico de demanda por producto
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.ml_predictions.services import DemandForecastService
+
+
+class Command(BaseCommand):
+    help = 'Pronostica la demanda de todos los productos activos y calcula puntos de reorden'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-back',
+            type=int,
+            default=180,
+            help='Días de historial de ventas a considerar',
+        )
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=30,
+            help='Días a pronosticar',
+        )
+        parser.add_argument(
+            '--lead-time',
+            type=int,
+            default=None,
+            help='Días de entrega del proveedor (por defecto DEMAND_LEAD_TIME_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        for option in ('days_back', 'horizon'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} debe ser mayor o igual a 1")
+
+        self.stdout.write('Generando pronóstico de demanda...')
+
+        service = DemandForecastService(
+            days_back=options['days_back'],
+            horizon=options['horizon'],
+            lead_time_days=options['lead_time']
+        )
+        result = service.run()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Pronóstico generado para {result['products']} producto(s); "
+                f"{result['needs_reorder']} requieren reorden"
+            )
+        )
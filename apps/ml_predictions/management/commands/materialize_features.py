@@ -0,0 +1,23 @@
+"""
+Comando para materializar el feature store diario del pronóstico de ventas
+"""
+from django.core.management.base import BaseCommand
+from apps.ml_predictions.features import DailyFeatureStore
+
+
+class Command(BaseCommand):
+    help = 'Materializa DailyFeatures hasta hoy (solo los días nuevos o con ventas modificadas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recalcula todo el histórico en lugar de solo los cambios',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Materializando features diarias...')
+
+        days = DailyFeatureStore.materialize(rebuild=options['rebuild'])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {days} día(s) materializado(s)'))
@@ -0,0 +1,30 @@
+"""
+Comando para calcular el riesgo de abandono de los clientes
+"""
+from django.core.management.base import BaseCommand
+from apps.ml_predictions.services import ChurnPredictionService
+
+
+class Command(BaseCommand):
+    help = 'Entrena el modelo de abandono y guarda el riesgo de cada cliente con compras'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days',
+            type=int,
+            default=None,
+            help=f'Días sin comprar para considerar abandono (por defecto {ChurnPredictionService.HORIZON_DAYS})',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Calculando riesgo de abandono...')
+
+        result = ChurnPredictionService(horizon_days=options['horizon_days']).run()
+
+        levels = ', '.join(f'{name}: {count}' for name, count in result['levels'].items())
+        auc = f", ROC AUC {result['roc_auc']:.3f}" if result.get('roc_auc') is not None else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {result['clients']} cliente(s) puntuado(s) con {result['method']}{auc} ({levels})"
+            )
+        )
@@ -0,0 +1,29 @@
+"""
+Comando para segmentar clientes por RFM (recencia, frecuencia, monto)
+"""
+from django.core.management.base import BaseCommand
+from apps.ml_predictions.services import CustomerSegmentationService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el segmento (vip/regular/new) de todos los clientes activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--method',
+            choices=['quantile', 'kmeans'],
+            default='quantile',
+            help='Puntaje por quintiles RFM o clústeres KMeans',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Segmentando clientes...')
+
+        result = CustomerSegmentationService(method=options['method']).run()
+
+        segments = ', '.join(f'{name}: {count}' for name, count in result['segments'].items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {result['clients']} cliente(s) segmentado(s), {result['changed']} cambio(s) ({segments})"
+            )
+        )
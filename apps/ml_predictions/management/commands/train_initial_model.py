@@ -2,8 +2,10 @@
 Comando para entrenar el modelo inicial de pronóstico de ventas
 """
 from django.core.management.base import BaseCommand
+from apps.ml_predictions.features import DailyFeatureStore
 from apps.ml_predictions.services import SalesForecastService
 from apps.ml_predictions.models import MLModel
+from apps.ml_predictions.estimators import ESTIMATORS
 import os
 
 
@@ -21,6 +23,23 @@ class Command(BaseCommand):
             action='store_true',
             help='Forzar reentrenamiento aunque ya exista un modelo',
         )
+        parser.add_argument(
+            '--estimator',
+            choices=list(ESTIMATORS),
+            default=None,
+            help='Estimador a usar (por defecto el configurado en el modelo o random_forest)',
+        )
+        parser.add_argument(
+            '--search',
+            action='store_true',
+            help='Buscar hiperparámetros con TimeSeriesSplit antes de entrenar',
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=int,
+            default=None,
+            help='Segundos máximos de la búsqueda (por defecto ML_SEARCH_TIME_BUDGET_SECONDS)',
+        )
 
     def handle(self, *args, **options):
         use_synthetic = options['use_synthetic']
@@ -47,14 +66,30 @@ class Command(BaseCommand):
             # Crear directorio de modelos si no existe
             os.makedirs('ml_models', exist_ok=True)
             
+            if not use_synthetic:
+                DailyFeatureStore.materialize()
+            
             # Entrenar modelo
-            service = SalesForecastService()
-            result = service.train_model(use_synthetic=use_synthetic)
+            hyperparameters = {'estimator': options['estimator']} if options['estimator'] else None
+            service = SalesForecastService(hyperparameters=hyperparameters)
+            result = service.train_model(
+                use_synthetic=use_synthetic,
+                search=options['search'],
+                time_budget_seconds=options['time_budget']
+            )
             
             if result['success']:
                 self.stdout.write(
                     self.style.SUCCESS('✅ Modelo entrenado exitosamente!')
                 )
+                self.stdout.write(f'Estimador: {result["estimator"]}')
+                if result['search']:
+                    search = result['search']
+                    self.stdout.write(
+                        f'Búsqueda: {search["evaluated"]}/{search["candidates"]} candidatos '
+                        f'en {search["elapsed_seconds"]:.1f}s'
+                        + (' (presupuesto agotado)' if search['timed_out'] else '')
+                    )
                 self.stdout.write(f'R² Score: {result["r2_score"]:.4f}')
                 self.stdout.write(f'MAE: {result["mae"]:.2f}')
                 self.stdout.write(f'RMSE: {result["rmse"]:.2f}')
@@ -0,0 +1,28 @@
+"""
+Comando para construir o actualizar el recomendador de productos
+"""
+from django.core.management.base import BaseCommand
+from apps.ml_predictions.services import RecommendationService
+
+
+class Command(BaseCommand):
+    help = 'Incorpora las ventas nuevas al recomendador "comprados juntos" (o lo reconstruye con --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Reconstruir el índice desde cero con todo el histórico',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Actualizando recomendador...')
+
+        result = RecommendationService().update(full=options['full'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {result['baskets']} venta(s) incorporada(s), {result['removed']} retirada(s); "
+                f"{result['products_updated']} producto(s) recalculado(s)"
+            )
+        )
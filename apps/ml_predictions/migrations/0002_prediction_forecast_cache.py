@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='data_watermark',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Marca de Agua de Datos'),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='horizon',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Horizonte (días)'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['model', 'category', 'horizon', 'target_date'], name='ml_predicti_model_i_a1feef_idx'),
+        ),
+    ]
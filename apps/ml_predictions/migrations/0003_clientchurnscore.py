@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_initial'),
+        ('ml_predictions', '0002_prediction_forecast_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientChurnScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('churn_risk', models.FloatField(db_index=True, verbose_name='Riesgo de Abandono')),
+                ('risk_level', models.CharField(choices=[('low', 'Bajo'), ('medium', 'Medio'), ('high', 'Alto')], db_index=True, max_length=10, verbose_name='Nivel de Riesgo')),
+                ('purchase_count', models.PositiveIntegerField(default=0, verbose_name='Compras')),
+                ('days_since_last_purchase', models.PositiveIntegerField(default=0, verbose_name='Días desde la Última Compra')),
+                ('avg_interval_days', models.FloatField(blank=True, null=True, verbose_name='Intervalo Promedio entre Compras (días)')),
+                ('scored_at', models.DateTimeField(verbose_name='Fecha de Cálculo')),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='churn_score', to='clients.client', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Riesgo de Abandono',
+                'verbose_name_plural': 'Riesgos de Abandono',
+                'ordering': ['-churn_risk'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0003_clientchurnscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('date', models.DateField(unique=True, verbose_name='Fecha')),
+                ('total_sales', models.FloatField(blank=True, null=True, verbose_name='Ventas Totales (objetivo)')),
+                ('day_of_week', models.PositiveSmallIntegerField(verbose_name='Día de la Semana')),
+                ('day_of_month', models.PositiveSmallIntegerField(verbose_name='Día del Mes')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Mes')),
+                ('quarter', models.PositiveSmallIntegerField(verbose_name='Trimestre')),
+                ('is_weekend', models.PositiveSmallIntegerField(verbose_name='Fin de Semana')),
+                ('is_month_start', models.PositiveSmallIntegerField(verbose_name='Inicio de Mes')),
+                ('is_month_end', models.PositiveSmallIntegerField(verbose_name='Fin de Mes')),
+                ('is_holiday', models.PositiveSmallIntegerField(verbose_name='Día Festivo')),
+                ('season', models.PositiveSmallIntegerField(verbose_name='Estación')),
+                ('week_sales', models.FloatField(default=0, verbose_name='Ventas de la Semana Previa')),
+                ('week_transactions', models.PositiveIntegerField(default=0, verbose_name='Transacciones de la Semana Previa')),
+                ('week_unique_clients', models.PositiveIntegerField(default=0, verbose_name='Clientes de la Semana Previa')),
+                ('week_avg_transaction', models.FloatField(default=0, verbose_name='Ticket Promedio de la Semana Previa')),
+                ('rollup_watermark', models.DateTimeField(blank=True, null=True, verbose_name='Marca de Agua del Resumen')),
+            ],
+            options={
+                'verbose_name': 'Features Diarias',
+                'verbose_name_plural': 'Features Diarias',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0004_dailyfeatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAnomalyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('granularity', models.CharField(choices=[('hour', 'Por Hora'), ('day', 'Por Día')], max_length=10, unique=True, verbose_name='Granularidad')),
+                ('bucket_start', models.DateTimeField(blank=True, null=True, verbose_name='Inicio del Período Abierto')),
+                ('bucket_revenue', models.FloatField(default=0, verbose_name='Ingresos del Período Abierto')),
+                ('bucket_transactions', models.PositiveIntegerField(default=0, verbose_name='Ventas del Período Abierto')),
+                ('bucket_alerted', models.BooleanField(default=False, verbose_name='Período Abierto Alertado')),
+                ('slots', models.JSONField(default=dict, verbose_name='Estadísticas por Franja')),
+            ],
+            options={
+                'verbose_name': 'Estado del Detector de Anomalías',
+                'verbose_name_plural': 'Estados del Detector de Anomalías',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.utils import timezone
+
+# Columnas que solo existían en el constructor de features anterior al feature store
+LEGACY_FEATURES = {'num_transactions', 'avg_transaction', 'unique_clients'}
+
+
+def queue_retrain(apps, schema_editor):
+    """
+    Encola el reentrenamiento de los pronosticadores entrenados con las features anteriores
+
+    Mientras tanto se siguen sirviendo con el constructor anterior
+    (SalesForecastService.uses_legacy_features); el worker materializa el
+    feature store antes de entrenar.
+    """
+    MLModel = apps.get_model('ml_predictions', 'MLModel')
+    ModelTrainingLog = apps.get_model('ml_predictions', 'ModelTrainingLog')
+    OutboxEvent = apps.get_model('core', 'OutboxEvent')
+
+    for model in MLModel.objects.filter(model_type='sales_forecast'):
+        if not LEGACY_FEATURES & set(model.features_used or []):
+            continue
+        training_log = ModelTrainingLog.objects.create(
+            model=model,
+            training_type='retrain',
+            status='started',
+            training_data_size=0,
+            accuracy_before=model.accuracy,
+            parameters_used={'use_synthetic': False, 'search': False, 'time_budget_seconds': None}
+        )
+        OutboxEvent.objects.create(
+            event_type='ml_model_training',
+            payload={'training_log_id': training_log.id},
+            available_at=timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0005_salesanomalystate'),
+        ('core', '0002_outboxevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_retrain, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0006_queue_feature_store_retrain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesAnomalyObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('sale_id', models.UUIDField(unique=True, verbose_name='Venta')),
+                ('amount', models.FloatField(verbose_name='Monto')),
+                ('observed_at', models.DateTimeField(verbose_name='Momento de la Venta')),
+            ],
+            options={
+                'verbose_name': 'Venta Observada por el Detector',
+                'verbose_name_plural': 'Ventas Observadas por el Detector',
+                'ordering': ['-observed_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_predictions', '0007_salesanomalyobservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommenderBasket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('sale_id', models.UUIDField(unique=True, verbose_name='Venta')),
+                ('product_ids', models.JSONField(default=list, verbose_name='Productos')),
+            ],
+            options={
+                'verbose_name': 'Canasta del Recomendador',
+                'verbose_name_plural': 'Canastas del Recomendador',
+            },
+        ),
+    ]
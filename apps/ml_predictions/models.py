@@ -49,11 +49,16 @@ class Prediction(BaseModel):
     target_date = models.DateField(null=True, blank=True, verbose_name='Fecha Objetivo')
     category = models.CharField(max_length=100, blank=True, verbose_name='Categoría')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Usuario')
+    horizon = models.PositiveIntegerField(null=True, blank=True, verbose_name='Horizonte (días)')
+    data_watermark = models.CharField(max_length=64, blank=True, verbose_name='Marca de Agua de Datos')
     
     class Meta:
         verbose_name = 'Predicción'
         verbose_name_plural = 'Predicciones'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['model', 'category', 'horizon', 'target_date']),
+        ]
     
     def __str__(self):
         return f"Predicción {self.id} - {self.model.name}"
@@ -103,3 +108,111 @@ class FeatureImportance(BaseModel):
     
     def __str__(self):
         return f"{self.feature_name} - {self.importance_score:.4f}"
+
+
+class ClientChurnScore(BaseModel):
+    """Riesgo de abandono por cliente (modelo churn_prediction)"""
+    client = models.OneToOneField('clients.Client', on_delete=models.CASCADE, related_name='churn_score', verbose_name='Cliente')
+    churn_risk = models.FloatField(db_index=True, verbose_name='Riesgo de Abandono')
+    risk_level = models.CharField(max_length=10, choices=[
+        ('low', 'Bajo'),
+        ('medium', 'Medio'),
+        ('high', 'Alto')
+    ], db_index=True, verbose_name='Nivel de Riesgo')
+    purchase_count = models.PositiveIntegerField(default=0, verbose_name='Compras')
+    days_since_last_purchase = models.PositiveIntegerField(default=0, verbose_name='Días desde la Última Compra')
+    avg_interval_days = models.FloatField(null=True, blank=True, verbose_name='Intervalo Promedio entre Compras (días)')
+    scored_at = models.DateTimeField(verbose_name='Fecha de Cálculo')
+    
+    class Meta:
+        verbose_name = 'Riesgo de Abandono'
+        verbose_name_plural = 'Riesgos de Abandono'
+        ordering = ['-churn_risk']
+    
+    def __str__(self):
+        return f"{self.client.name} - {self.churn_risk:.2f}"
+
+
+class DailyFeatures(BaseModel):
+    """Features diarias del pronóstico de ventas, compartidas por entrenamiento y predicción"""
+    date = models.DateField(unique=True, verbose_name='Fecha')
+    total_sales = models.FloatField(null=True, blank=True, verbose_name='Ventas Totales (objetivo)')
+    # Calendario
+    day_of_week = models.PositiveSmallIntegerField(verbose_name='Día de la Semana')
+    day_of_month = models.PositiveSmallIntegerField(verbose_name='Día del Mes')
+    month = models.PositiveSmallIntegerField(verbose_name='Mes')
+    quarter = models.PositiveSmallIntegerField(verbose_name='Trimestre')
+    is_weekend = models.PositiveSmallIntegerField(verbose_name='Fin de Semana')
+    is_month_start = models.PositiveSmallIntegerField(verbose_name='Inicio de Mes')
+    is_month_end = models.PositiveSmallIntegerField(verbose_name='Fin de Mes')
+    is_holiday = models.PositiveSmallIntegerField(verbose_name='Día Festivo')
+    season = models.PositiveSmallIntegerField(verbose_name='Estación')
+    # Historial de los 7 días anteriores
+    week_sales = models.FloatField(default=0, verbose_name='Ventas de la Semana Previa')
+    week_transactions = models.PositiveIntegerField(default=0, verbose_name='Transacciones de la Semana Previa')
+    week_unique_clients = models.PositiveIntegerField(default=0, verbose_name='Clientes de la Semana Previa')
+    week_avg_transaction = models.FloatField(default=0, verbose_name='Ticket Promedio de la Semana Previa')
+    rollup_watermark = models.DateTimeField(null=True, blank=True, verbose_name='Marca de Agua del Resumen')
+    
+    class Meta:
+        verbose_name = 'Features Diarias'
+        verbose_name_plural = 'Features Diarias'
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"Features {self.date}"
+
+
+class SalesAnomalyState(BaseModel):
+    """Estado del detector de anomalías de ventas por granularidad (hora o día)"""
+    granularity = models.CharField(max_length=10, unique=True, choices=[
+        ('hour', 'Por Hora'),
+        ('day', 'Por Día')
+    ], verbose_name='Granularidad')
+    bucket_start = models.DateTimeField(null=True, blank=True, verbose_name='Inicio del Período Abierto')
+    bucket_revenue = models.FloatField(default=0, verbose_name='Ingresos del Período Abierto')
+    bucket_transactions = models.PositiveIntegerField(default=0, verbose_name='Ventas del Período Abierto')
+    bucket_alerted = models.BooleanField(default=False, verbose_name='Período Abierto Alertado')
+    # Franja estacional (hora del día o día de la semana) -> {'n', 'mean', 'var'}
+    slots = models.JSONField(default=dict, verbose_name='Estadísticas por Franja')
+    
+    class Meta:
+        verbose_name = 'Estado del Detector de Anomalías'
+        verbose_name_plural = 'Estados del Detector de Anomalías'
+    
+    def __str__(self):
+        return f"Detector de anomalías ({self.get_granularity_display()})"
+
+
+class SalesAnomalyObservation(BaseModel):
+    """Venta ya incorporada al detector de anomalías (evita contarla dos veces)"""
+    sale_id = models.UUIDField(unique=True, verbose_name='Venta')
+    amount = models.FloatField(verbose_name='Monto')
+    observed_at = models.DateTimeField(verbose_name='Momento de la Venta')
+    
+    class Meta:
+        verbose_name = 'Venta Observada por el Detector'
+        verbose_name_plural = 'Ventas Observadas por el Detector'
+        ordering = ['-observed_at']
+    
+    def __str__(self):
+        return f"Venta {self.sale_id} observada"
+
+
+class RecommenderBasket(BaseModel):
+    """
+    Canasta incorporada al recomendador (productos con los que entró)
+
+    Es el estado de entrenamiento del índice incremental: permite restar la
+    canasta si la venta cambia o sale del índice. No forma parte del artefacto
+    que se sirve.
+    """
+    sale_id = models.UUIDField(unique=True, verbose_name='Venta')
+    product_ids = models.JSONField(default=list, verbose_name='Productos')
+    
+    class Meta:
+        verbose_name = 'Canasta del Recomendador'
+        verbose_name_plural = 'Canastas del Recomendador'
+    
+    def __str__(self):
+        return f"Canasta {self.sale_id}"
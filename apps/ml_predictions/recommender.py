@@ -0,0 +1,148 @@
+"""
+Recomendador item-item basado en co-ocurrencia de productos en ventas
+
+La matriz de co-ocurrencia (producto × producto) se mantiene dispersa y se
+actualiza sumando las canastas nuevas y restando las que dejan de contar (ventas
+canceladas, desactivadas o eliminadas). A partir de ella se precalculan los
+k vecinos más similares (coseno) de cada producto en arreglos numpy, de modo que
+servir "comprados juntos frecuentemente" es una búsqueda en arreglos.
+
+El índice solo guarda estructuras del tamaño del catálogo: los productos de cada
+canasta incorporada (necesarios para restarla después) los lleva quien lo
+actualiza (RecommenderBasket), fuera del artefacto que se sirve.
+"""
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from scipy import sparse
+
+
+class ItemRecommender:
+    """Índice de vecinos top-k por producto construido de forma incremental"""
+
+    def __init__(self, top_k: int = 20):
+        self.top_k = top_k
+        # Fila -> ID de producto (en orden de aparición) y su inverso
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.rows: Dict[int, int] = {}
+        # Co-ocurrencias; la diagonal es la cantidad de canastas que contienen cada producto
+        self.cooccurrence = sparse.csr_matrix((0, 0), dtype=np.float64)
+        # Vecinos (índices de fila, -1 si no hay) y su similitud coseno
+        self.neighbors = np.empty((0, top_k), dtype=np.int32)
+        self.scores = np.empty((0, top_k), dtype=np.float32)
+        self.basket_count = 0
+        # Marca de agua: updated_at de ventas hasta la que se revisaron cambios
+        self.last_updated_at = None
+
+    def update(self, added: List[Tuple[int, ...]], removed: List[Tuple[int, ...]] = ()) -> int:
+        """
+        Suma las canastas `added`, resta las `removed` y recalcula los vecinos afectados
+
+        Una canasta que cambió de contenido se pasa en ambas listas: con los
+        productos con que se incorporó en `removed` y los actuales en `added`.
+
+        Returns:
+            Cantidad de productos cuyos vecinos se recalcularon
+        """
+        touched = np.union1d(self._apply(list(removed), -1), self._apply(list(added), 1)).astype(np.int64)
+        if not len(touched):
+            return 0
+
+        # Filas afectadas: productos de las canastas cambiadas y sus co-ocurrentes
+        # (su similitud cambia porque cambió el conteo del vecino)
+        affected = np.union1d(touched, self.cooccurrence[:, touched].tocoo().row)
+        self._recompute_neighbors(affected)
+        return len(affected)
+
+    def _apply(self, baskets: List[Tuple[int, ...]], sign: int) -> np.ndarray:
+        """Suma (sign=1) o resta (sign=-1) canastas a la co-ocurrencia; retorna las filas tocadas"""
+        if not baskets:
+            return np.empty(0, dtype=np.int64)
+
+        product_col = np.fromiter((product_id for products in baskets for product_id in products), dtype=np.int64)
+        basket_col = np.repeat(np.arange(len(baskets)), [len(products) for products in baskets])
+        self._add_products(np.unique(product_col))
+        rows = np.fromiter((self.rows[product_id] for product_id in product_col), dtype=np.int64, count=len(product_col))
+
+        # Matriz canasta × producto binaria (los productos de cada canasta ya son únicos)
+        n_products = len(self.product_ids)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (basket_col, rows)),
+            shape=(len(baskets), n_products)
+        )
+
+        self.cooccurrence = (self.cooccurrence + sign * (matrix.T @ matrix)).tocsr()
+        self.cooccurrence.eliminate_zeros()
+        self.basket_count += sign * len(baskets)
+        return np.unique(rows)
+
+    def recommend(self, product_ids: Iterable[int], limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        Productos comprados frecuentemente junto con los indicados
+
+        Returns:
+            Lista de (ID de producto, score) ordenada por score descendente
+        """
+        rows = [self.rows[product_id] for product_id in product_ids if product_id in self.rows]
+        if not rows:
+            return []
+
+        candidates = self.neighbors[rows].ravel()
+        weights = self.scores[rows].ravel()
+        valid = candidates >= 0
+        candidates, weights = candidates[valid], weights[valid]
+
+        # Sumar la similitud de cada candidato con todos los productos del carrito
+        totals = np.bincount(candidates, weights=weights, minlength=len(self.product_ids))
+        totals[rows] = 0
+        top = np.argsort(-totals)[:limit]
+        return [(int(self.product_ids[row]), float(totals[row])) for row in top if totals[row] > 0]
+
+    def _add_products(self, product_ids: np.ndarray):
+        """Agrega filas/columnas para productos que no estaban en el índice"""
+        new_ids = [int(product_id) for product_id in product_ids if int(product_id) not in self.rows]
+        if not new_ids:
+            return
+
+        start = len(self.product_ids)
+        for offset, product_id in enumerate(new_ids):
+            self.rows[product_id] = start + offset
+        self.product_ids = np.concatenate([self.product_ids, np.array(new_ids, dtype=np.int64)])
+
+        n_products = len(self.product_ids)
+        cooccurrence = self.cooccurrence.tocoo()
+        self.cooccurrence = sparse.csr_matrix(
+            (cooccurrence.data, (cooccurrence.row, cooccurrence.col)),
+            shape=(n_products, n_products)
+        )
+        self.neighbors = np.vstack([self.neighbors, np.full((len(new_ids), self.top_k), -1, dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.zeros((len(new_ids), self.top_k), dtype=np.float32)])
+
+    def _recompute_neighbors(self, rows: np.ndarray):
+        """Recalcula los top-k vecinos (coseno) de las filas indicadas, vectorizado"""
+        if not len(rows):
+            return
+
+        counts = self.cooccurrence.diagonal()
+        block = self.cooccurrence[rows].tocoo()
+        source = rows[block.row]
+
+        # similitud(i, j) = co(i, j) / sqrt(n_i * n_j), excluyendo el propio producto
+        keep = block.col != source
+        local_row, col, data = block.row[keep], block.col[keep], block.data[keep]
+        similarity = data / np.sqrt(counts[source[keep]] * counts[col])
+
+        # Ordenar por fila y similitud descendente, y quedarse con los primeros k de cada fila
+        order = np.lexsort((-similarity, local_row))
+        local_row, col, similarity = local_row[order], col[order], similarity[order]
+        row_start = np.searchsorted(local_row, np.arange(len(rows)))
+        rank = np.arange(len(local_row)) - row_start[local_row]
+        top = rank < self.top_k
+
+        neighbors = np.full((len(rows), self.top_k), -1, dtype=np.int32)
+        scores = np.zeros((len(rows), self.top_k), dtype=np.float32)
+        neighbors[local_row[top], rank[top]] = col[top]
+        scores[local_row[top], rank[top]] = similarity[top]
+
+        self.neighbors[rows] = neighbors
+        self.scores[rows] = scores
+
@@ -0,0 +1,121 @@
+"""
+Registro en memoria de los modelos ML activos
+
+Mantiene cargado por proceso el modelo activo de cada tipo y solo lo vuelve a
+cargar cuando cambia su fila en MLModel o la fecha de modificación de sus
+archivos. El bosque se abre con `mmap_mode` para que los workers de gunicorn
+compartan las páginas del archivo en lugar de tener una copia cada uno.
+"""
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import joblib
+from django.conf import settings
+from .models import MLModel
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadedModel:
+    """Modelo cargado junto con su scaler y la firma con la que se cargó"""
+    ml_model_id: str
+    version: str
+    model_file: str
+    model: Any
+    scaler: Any
+    feature_names: List[str]
+    signature: Tuple
+
+
+class ModelRegistry:
+    """Caché de modelos por tipo, compartida por todos los requests del proceso"""
+
+    def __init__(self, model_path: str = 'ml_models/'):
+        self.model_path = model_path
+        self._entries: Dict[str, LoadedModel] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_type: str = 'sales_forecast') -> Optional[LoadedModel]:
+        """Retorna el modelo activo del tipo indicado, recargándolo solo si cambió"""
+        row = MLModel.objects.filter(
+            model_type=model_type,
+            is_active=True
+        ).order_by('-created_at').values('id', 'version', 'model_file', 'features_used', 'updated_at').first()
+
+        if not row or not row['model_file']:
+            self._entries.pop(model_type, None)
+            return None
+
+        model_file = os.path.join(self.model_path, row['model_file'])
+        # Solo los modelos de pronóstico tienen scaler asociado
+        scaler_name = row['model_file'].replace('sales_forecast_', 'scaler_')
+        scaler_file = os.path.join(self.model_path, scaler_name) if scaler_name != row['model_file'] else None
+        signature = (
+            row['id'], row['model_file'], row['updated_at'],
+            self._mtime(model_file), self._mtime(scaler_file)
+        )
+
+        entry = self._entries.get(model_type)
+        if entry and entry.signature == signature:
+            return entry
+
+        with self._lock:
+            # Otro hilo pudo haberlo cargado mientras esperábamos el lock
+            entry = self._entries.get(model_type)
+            if entry and entry.signature == signature:
+                return entry
+
+            if signature[3] is None:
+                logger.warning(f"Archivo del modelo no encontrado: {model_file}")
+                self._entries.pop(model_type, None)
+                return None
+
+            entry = LoadedModel(
+                ml_model_id=str(row['id']),
+                version=row['version'],
+                model_file=row['model_file'],
+                model=joblib.load(model_file, mmap_mode='r'),
+                scaler=joblib.load(scaler_file) if signature[4] is not None else None,
+                feature_names=row['features_used'],
+                signature=signature
+            )
+            self._entries[model_type] = entry
+            logger.info(f"Modelo {model_type} cargado desde {model_file} (v{entry.version})")
+
+        return entry
+
+    def invalidate(self, model_type: Optional[str] = None):
+        """Descarta el modelo cargado (o todos) para forzar la recarga"""
+        with self._lock:
+            if model_type:
+                self._entries.pop(model_type, None)
+            else:
+                self._entries.clear()
+
+    @staticmethod
+    def _mtime(path: Optional[str]) -> Optional[float]:
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+
+model_registry = ModelRegistry()
+
+
+def warm_up(model_types: Tuple[str, ...] = ('sales_forecast', 'recommendation')):
+    """Carga los modelos activos al iniciar el proceso (p. ej. desde wsgi.py)"""
+    if not getattr(settings, 'ML_MODEL_WARMUP', True):
+        return
+
+    for model_type in model_types:
+        try:
+            if model_registry.get(model_type):
+                logger.info(f"Warmup de modelo {model_type} completado")
+        except Exception as e:
+            logger.warning(f"No se pudo precargar el modelo {model_type}: {e}")
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import MLModel, Prediction
+from .models import MLModel, Prediction, ModelTrainingLog
 
 class MLModelSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,3 +10,10 @@ class PredictionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prediction
         fields = '__all__'
+
+class ModelTrainingLogSerializer(serializers.ModelSerializer):
+    model_name = serializers.CharField(source='model.name', read_only=True)
+    
+    class Meta:
+        model = ModelTrainingLog
+        fields = '__all__'
@@ -1,176 +1,85 @@
 """
 Servicios de Machine Learning para SmartSales365
 """
+import io
 import os
+import time
 import joblib
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split, cross_val_score
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from sklearn.model_selection import cross_val_score, TimeSeriesSplit
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg
-from apps.sales.models import Sale, SaleItem
-from apps.products.models import Product, Category
+from django.db import transaction, InterfaceError, OperationalError
+from django.db.models import Q, Sum, Count, Avg, Max
+from django.db.models.functions import TruncDate
+from apps.sales.models import Sale, SaleItem, SalesDailyRollup
+from apps.sales.services import SalesRollupService
+from apps.core.outbox import OutboxService
+from apps.products.models import Product, Category, PriceHistory
 from apps.clients.models import Client
-from .models import MLModel, Prediction, ModelTrainingLog, FeatureImportance
+from .models import MLModel, Prediction, ModelTrainingLog, FeatureImportance, ClientChurnScore, RecommenderBasket
+from .registry import model_registry
+from .features import DailyFeatureStore
+from .estimators import ESTIMATORS, build_estimator, resolve_hyperparameters, candidate_grid, evaluate_candidate
+from .recommender import ItemRecommender
+
+# Fallas que pueden resolverse solas (base de datos caída, disco, tiempo de
+# espera): el entrenamiento se reintenta con el backoff del outbox
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError)
 
 
 class SalesForecastService:
-    """Servicio de pronóstico de ventas usando Random Forest"""
+    """Servicio de pronóstico de ventas (Random Forest u otro estimador según hiperparámetros)"""
     
-    def __init__(self):
+    MODEL_NAME = 'Sales Forecast Model'
+    
+    def __init__(self, hyperparameters: Optional[Dict[str, Any]] = None):
         self.model = None
         self.scaler = StandardScaler()
         self.feature_names = []
         self.model_path = 'ml_models/'
+        self.ml_model_id = None
+        self.model_version = None
+        self.model_file = None
+        # Presupuesto de CPU para el entrenamiento (núcleos que puede usar el bosque)
+        self.n_jobs = getattr(settings, 'ML_TRAINING_N_JOBS', 2)
+        # Estimador e hiperparámetros; por defecto los del modelo registrado
+        self.hyperparameters = hyperparameters
         
     def prepare_training_data(self, days_back: int = 365) -> pd.DataFrame:
-        """Prepara datos de entrenamiento para el modelo"""
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days_back)
-        
-        # Obtener datos de ventas
-        sales_data = Sale.objects.filter(
-            created_at__gte=start_date,
-            created_at__lte=end_date,
-            is_active=True
-        ).select_related('client').prefetch_related('items__product')
-        
-        # Agregar datos por día
-        daily_sales = []
-        current_date = start_date.date()
-        
-        while current_date <= end_date.date():
-            day_sales = sales_data.filter(created_at__date=current_date)
-            
-            # Calcular features del día
-            features = self._calculate_daily_features(day_sales, current_date)
-            daily_sales.append(features)
-            
-            current_date += timedelta(days=1)
-        
-        return pd.DataFrame(daily_sales)
-    
-    def _calculate_daily_features(self, sales_queryset, date) -> Dict[str, Any]:
-        """Calcula features para un día específico"""
-        # Features básicas
-        total_sales = sum(sale.total for sale in sales_queryset)
-        num_transactions = sales_queryset.count()
-        avg_transaction = total_sales / num_transactions if num_transactions > 0 else 0
-        
-        # Features temporales
-        day_of_week = date.weekday()
-        day_of_month = date.day
-        month = date.month
-        quarter = (month - 1) // 3 + 1
-        is_weekend = day_of_week >= 5
-        is_month_start = day_of_month <= 7
-        is_month_end = day_of_month >= 25
-        
-        # Features de tendencia (últimos 7 días)
-        week_ago = date - timedelta(days=7)
-        week_sales = Sale.objects.filter(
-            created_at__date__gte=week_ago,
-            created_at__date__lt=date,
-            is_active=True
-        ).aggregate(total=Sum('total'))['total'] or 0
+        """
+        Prepara datos de entrenamiento para el modelo (días cerrados del feature store)
         
-        # Features de estacionalidad
-        is_holiday = self._is_holiday(date)
-        season = self._get_season(month)
-        
-        # Features de clientes
-        unique_clients = sales_queryset.values('client').distinct().count()
-        
-        return {
-            'date': date,
-            'total_sales': total_sales,
-            'num_transactions': num_transactions,
-            'avg_transaction': avg_transaction,
-            'day_of_week': day_of_week,
-            'day_of_month': day_of_month,
-            'month': month,
-            'quarter': quarter,
-            'is_weekend': int(is_weekend),
-            'is_month_start': int(is_month_start),
-            'is_month_end': int(is_month_end),
-            'week_sales': week_sales,
-            'is_holiday': int(is_holiday),
-            'season': season,
-            'unique_clients': unique_clients
-        }
-    
-    def _is_holiday(self, date) -> bool:
-        """Verifica si es día festivo (simplificado)"""
-        holidays = [
-            (1, 1),   # Año Nuevo
-            (2, 5),   # Día de la Constitución
-            (3, 21),  # Natalicio de Benito Juárez
-            (5, 1),   # Día del Trabajo
-            (9, 16), # Día de la Independencia
-            (11, 20), # Día de la Revolución
-            (12, 25), # Navidad
-        ]
-        return (date.month, date.day) in holidays
-    
-    def _get_season(self, month: int) -> int:
-        """Obtiene la estación del año"""
-        if month in [12, 1, 2]:
-            return 0  # Invierno
-        elif month in [3, 4, 5]:
-            return 1  # Primavera
-        elif month in [6, 7, 8]:
-            return 2  # Verano
-        else:
-            return 3  # Otoño
+        No materializa: lo hacen el worker (run_training) y los comandos antes de llamar.
+        """
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days_back - 1)
+        return DailyFeatureStore.training_frame(start_date, end_date)
     
     def generate_synthetic_data(self, days: int = 365) -> pd.DataFrame:
-        """Genera datos sintéticos para entrenamiento inicial"""
-        data = []
-        base_date = timezone.now().date() - timedelta(days=days)
-        
-        for i in range(days):
-            current_date = base_date + timedelta(days=i)
-            
-            # Simular patrones realistas
-            day_of_week = current_date.weekday()
-            month = current_date.month
-            
-            # Base sales con estacionalidad
-            base_sales = 1000
-            weekend_multiplier = 1.5 if day_of_week >= 5 else 1.0
-            seasonal_multiplier = self._get_seasonal_multiplier(month)
-            
-            # Agregar ruido aleatorio
-            noise = np.random.normal(0, 0.2)
-            total_sales = base_sales * weekend_multiplier * seasonal_multiplier * (1 + noise)
-            
-            # Features del día
-            features = {
-                'date': current_date,
-                'total_sales': max(0, total_sales),
-                'num_transactions': max(1, int(np.random.poisson(20))),
-                'avg_transaction': total_sales / max(1, int(np.random.poisson(20))),
-                'day_of_week': day_of_week,
-                'day_of_month': current_date.day,
-                'month': month,
-                'quarter': (month - 1) // 3 + 1,
-                'is_weekend': int(day_of_week >= 5),
-                'is_month_start': int(current_date.day <= 7),
-                'is_month_end': int(current_date.day >= 25),
-                'week_sales': max(0, total_sales * np.random.normal(1, 0.3)),
-                'is_holiday': int(self._is_holiday(current_date)),
-                'season': self._get_season(month),
-                'unique_clients': max(1, int(np.random.poisson(15)))
-            }
-            
-            data.append(features)
+        """Genera datos sintéticos para entrenamiento inicial (mismas features que el feature store)"""
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days - 1)
+        dates = pd.date_range(start_date - timedelta(days=DailyFeatureStore.HISTORY_DAYS), end_date, freq='D')
+        
+        # Base sales con estacionalidad, fin de semana y ruido aleatorio
+        base_sales = 1000
+        weekend_multiplier = np.where(dates.dayofweek >= 5, 1.5, 1.0)
+        seasonal_multiplier = np.array([self._get_seasonal_multiplier(month) for month in dates.month])
+        noise = np.random.normal(0, 0.2, len(dates))
         
-        return pd.DataFrame(data)
+        daily = pd.DataFrame({
+            'date': dates.date,
+            'revenue': np.maximum(0, base_sales * weekend_multiplier * seasonal_multiplier * (1 + noise)),
+            'transaction_count': np.maximum(1, np.random.poisson(20, len(dates))),
+            'unique_clients': np.maximum(1, np.random.poisson(15, len(dates)))
+        })
+        return DailyFeatureStore.build(daily, start_date, end_date)
     
     def _get_seasonal_multiplier(self, month: int) -> float:
         """Obtiene multiplicador estacional"""
@@ -190,8 +99,105 @@ class SalesForecastService:
         }
         return seasonal_patterns.get(month, 1.0)
     
-    def train_model(self, use_synthetic: bool = False) -> Dict[str, Any]:
-        """Entrena el modelo Random Forest"""
+    # Features que se calculaban en el entrenamiento antes de existir el feature
+    # store: calendario, ventas de la semana y transacciones, ticket promedio y
+    # clientes del mismo día. Los modelos entrenados con ellas se siguen
+    # sirviendo hasta que se reentrenen.
+    HOLIDAYS = DailyFeatureStore.HOLIDAYS
+    SEASONS = DailyFeatureStore.SEASONS
+    LEGACY_FEATURE_COLUMNS = [
+        'num_transactions', 'avg_transaction', 'day_of_week', 'day_of_month', 'month',
+        'quarter', 'is_weekend', 'is_month_start', 'is_month_end', 'week_sales',
+        'is_holiday', 'season', 'unique_clients'
+    ]
+    
+    def build_daily_features(self, daily: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+        """
+        Calcula las features diarias del constructor anterior de forma vectorizada
+        
+        Args:
+            daily: Totales por día con columnas date, revenue, transaction_count y
+                unique_clients (los días sin ventas pueden faltar)
+            start_date: Primer día del resultado
+            end_date: Último día del resultado
+        
+        Returns:
+            DataFrame con una fila por día del rango y las columnas de features
+        """
+        # Serie continua de días (los días sin ventas quedan en cero)
+        index = pd.date_range(start_date - timedelta(days=7), end_date, freq='D')
+        daily = daily.assign(date=pd.to_datetime(daily['date'])).set_index('date')
+        daily = daily.reindex(index).fillna(0)
+        
+        total_sales = daily['revenue'].astype(float)
+        num_transactions = daily['transaction_count'].astype(int)
+        
+        df = pd.DataFrame({
+            'total_sales': total_sales,
+            'num_transactions': num_transactions,
+            'avg_transaction': (total_sales / num_transactions.where(num_transactions > 0)).fillna(0),
+            # Features de tendencia: ventas de los 7 días anteriores
+            'week_sales': total_sales.shift(1, fill_value=0).rolling(7, min_periods=1).sum(),
+            'unique_clients': daily['unique_clients'].astype(int),
+        }, index=index).loc[pd.Timestamp(start_date):]
+        
+        # Features temporales
+        dates = df.index
+        holiday_keys = {month * 100 + day for month, day in self.HOLIDAYS}
+        
+        return pd.DataFrame({
+            'date': dates.date,
+            'total_sales': df['total_sales'].values,
+            'num_transactions': df['num_transactions'].values,
+            'avg_transaction': df['avg_transaction'].values,
+            'day_of_week': dates.dayofweek,
+            'day_of_month': dates.day,
+            'month': dates.month,
+            'quarter': dates.quarter,
+            'is_weekend': (dates.dayofweek >= 5).astype(int),
+            'is_month_start': (dates.day <= 7).astype(int),
+            'is_month_end': (dates.day >= 25).astype(int),
+            'week_sales': df['week_sales'].values,
+            'is_holiday': (dates.month * 100 + dates.day).isin(holiday_keys).astype(int),
+            'season': dates.month.map(self.SEASONS),
+            'unique_clients': df['unique_clients'].values,
+        })
+    
+    def _is_holiday(self, date) -> bool:
+        """Verifica si es día festivo (simplificado)"""
+        return (date.month, date.day) in self.HOLIDAYS
+    
+    def _get_season(self, month: int) -> int:
+        """Obtiene la estación del año"""
+        return self.SEASONS[month]
+    
+    def get_hyperparameters(self) -> Dict[str, Any]:
+        """Hiperparámetros a usar: los indicados o los del modelo registrado"""
+        if self.hyperparameters is None:
+            registered = MLModel.objects.filter(
+                name=self.MODEL_NAME,
+                model_type='sales_forecast'
+            ).values_list('hyperparameters', flat=True).first()
+            self.hyperparameters = registered or {}
+        return resolve_hyperparameters(self.hyperparameters)
+    
+    # Particiones temporales de la validación y de la búsqueda de hiperparámetros
+    CV_SPLITS = 5
+    # Fracción final de los días reservada para evaluar el modelo
+    TEST_FRACTION = 0.2
+    
+    def train_model(
+        self,
+        use_synthetic: bool = False,
+        search: bool = False,
+        time_budget_seconds: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Entrena el modelo con el estimador configurado
+        
+        Con `search` primero busca los mejores hiperparámetros de la grilla del
+        estimador (ver search_hyperparameters) dentro del presupuesto de tiempo.
+        """
         try:
             # Preparar datos
             if use_synthetic:
@@ -202,30 +208,30 @@ class SalesForecastService:
             if df.empty:
                 raise ValueError("No hay datos suficientes para entrenar")
             
+            hyperparameters = self.get_hyperparameters()
+            
             # Separar features y target
             feature_columns = [col for col in df.columns if col not in ['date', 'total_sales']]
             X = df[feature_columns].values
             y = df['total_sales'].values
             
-            # Dividir datos
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42
-            )
+            # Dividir datos en orden temporal: los días más recientes quedan para prueba
+            split = int(len(X) * (1 - self.TEST_FRACTION))
+            X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
             
-            # Escalar features
+            search_result = None
+            if search:
+                search_result = self.search_hyperparameters(X_train, y_train, hyperparameters, time_budget_seconds)
+                if search_result['best']:
+                    hyperparameters = search_result['best']['hyperparameters']
+            
+            # Escalar features (scaler nuevo: el cargado se comparte entre requests)
+            self.scaler = StandardScaler()
             X_train_scaled = self.scaler.fit_transform(X_train)
             X_test_scaled = self.scaler.transform(X_test)
             
             # Entrenar modelo
-            self.model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                n_jobs=-1
-            )
-            
+            self.model = build_estimator(hyperparameters, n_jobs=self.n_jobs)
             self.model.fit(X_train_scaled, y_train)
             
             # Evaluar modelo
@@ -235,13 +241,17 @@ class SalesForecastService:
             rmse = np.sqrt(mean_squared_error(y_test, y_pred))
             
             # Validación cruzada
-            cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5)
+            cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=TimeSeriesSplit(n_splits=self.CV_SPLITS))
             
             # Guardar modelo
-            self._save_model(feature_columns)
+            self._save_model(feature_columns, hyperparameters)
             
             return {
                 'success': True,
+                'estimator': hyperparameters['estimator'],
+                'hyperparameters': hyperparameters,
+                'search': search_result,
+                'training_data_size': len(df),
                 'r2_score': r2,
                 'mae': mae,
                 'rmse': rmse,
@@ -253,10 +263,98 @@ class SalesForecastService:
         except Exception as e:
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'transient': isinstance(e, TRANSIENT_ERRORS)
             }
     
-    def _save_model(self, feature_names: List[str]):
+    def search_hyperparameters(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        hyperparameters: Dict[str, Any],
+        time_budget_seconds: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Búsqueda en grilla con TimeSeriesSplit en un pool de procesos acotado
+        
+        Evalúa primero los hiperparámetros actuales y después la grilla del
+        estimador, con a lo sumo `n_jobs` candidatos en paralelo (un proceso de
+        un núcleo cada uno). Al agotarse el presupuesto no se lanzan más
+        candidatos, los que seguían corriendo se terminan (para que no compitan
+        con el ajuste final ni con el siguiente trabajo) y se elige el mejor MAE
+        entre los evaluados.
+        """
+        import multiprocessing
+        import queue
+        
+        budget = time_budget_seconds or getattr(settings, 'ML_SEARCH_TIME_BUDGET_SECONDS', 300)
+        candidates = candidate_grid(hyperparameters)
+        workers = max(1, min(self.n_jobs, len(candidates)))
+        started = time.monotonic()
+        deadline = started + budget
+        results = []
+        finished = queue.Queue()
+        
+        # Siempre en procesos (aunque sea uno) para poder cortar un candidato a mitad
+        pool = multiprocessing.Pool(processes=workers)
+        pending = iter(candidates)
+        in_flight = 0
+        try:
+            while True:
+                while in_flight < workers and time.monotonic() < deadline:
+                    candidate = next(pending, None)
+                    if candidate is None:
+                        break
+                    pool.apply_async(
+                        evaluate_candidate,
+                        (X, y, candidate, self.CV_SPLITS),
+                        callback=finished.put,
+                        error_callback=lambda e, candidate=candidate: finished.put(
+                            {'hyperparameters': candidate, 'error': str(e)}
+                        )
+                    )
+                    in_flight += 1
+                
+                remaining = deadline - time.monotonic()
+                if not in_flight or remaining <= 0:
+                    break
+                try:
+                    results.append(finished.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                in_flight -= 1
+        finally:
+            if in_flight:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+        
+        # Candidatos que terminaron justo antes de cortar el pool
+        while True:
+            try:
+                results.append(finished.get_nowait())
+            except queue.Empty:
+                break
+        
+        evaluated = sorted(
+            (result for result in results if 'error' not in result),
+            key=lambda result: result['mae']
+        )
+        return {
+            'estimator': candidates[0]['estimator'],
+            'candidates': len(candidates),
+            'evaluated': len(results),
+            'workers': workers,
+            'n_splits': self.CV_SPLITS,
+            'budget_seconds': budget,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'timed_out': len(results) < len(candidates),
+            'best': evaluated[0] if evaluated else None,
+            'results': evaluated + [result for result in results if 'error' in result]
+        }
+    
+    def _save_model(self, feature_names: List[str], hyperparameters: Dict[str, Any]):
         """Guarda el modelo entrenado"""
         os.makedirs(self.model_path, exist_ok=True)
         
@@ -274,27 +372,28 @@ class SalesForecastService:
         
         # Guardar en base de datos
         ml_model, created = MLModel.objects.get_or_create(
-            name='Sales Forecast Model',
+            name=self.MODEL_NAME,
             model_type='sales_forecast',
-            defaults={
-                'model_file': model_filename,
-                'features_used': feature_names,
-                'hyperparameters': {
-                    'n_estimators': 100,
-                    'max_depth': 10,
-                    'min_samples_split': 5,
-                    'min_samples_leaf': 2
-                }
-            }
+            defaults={'model_file': model_filename}
         )
         
-        if not created:
-            ml_model.model_file = model_filename
-            ml_model.save()
+        ml_model.model_file = model_filename
+        ml_model.features_used = feature_names
+        ml_model.hyperparameters = hyperparameters
+        ml_model.save()
+        
+        # Los pronósticos guardados del modelo anterior ya no son válidos
+        self.invalidate_forecasts(ml_model.id)
     
     def _get_feature_importance(self, feature_names: List[str]) -> List[Dict[str, Any]]:
-        """Obtiene importancia de features"""
-        importance = self.model.feature_importances_
+        """Obtiene importancia de features (árboles) o el peso absoluto normalizado (lineales)"""
+        if hasattr(self.model, 'feature_importances_'):
+            importance = self.model.feature_importances_
+        elif hasattr(self.model, 'coef_'):
+            weights = np.abs(np.ravel(self.model.coef_))
+            importance = weights / weights.sum() if weights.sum() > 0 else weights
+        else:
+            return []
         feature_importance = list(zip(feature_names, importance))
         feature_importance.sort(key=lambda x: x[1], reverse=True)
         
@@ -303,6 +402,79 @@ class SalesForecastService:
             for name, imp in feature_importance
         ]
     
+    def benchmark(
+        self,
+        estimators: Optional[List[str]] = None,
+        n_splits: int = 5,
+        use_synthetic: bool = False,
+        horizon: int = 30,
+        repeats: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Compara estimadores en particiones temporales (TimeSeriesSplit)
+        
+        Para cada estimador reporta el tiempo de ajuste promedio por partición,
+        MAE/RMSE fuera de muestra, la latencia de predecir un horizonte completo
+        (como se sirve, con intervalo de confianza) y el tamaño del artefacto.
+        """
+        df = self.generate_synthetic_data() if use_synthetic else self.prepare_training_data()
+        if len(df) <= n_splits + 1:
+            raise ValueError("No hay datos suficientes para el benchmark")
+        
+        feature_columns = [col for col in df.columns if col not in ['date', 'total_sales']]
+        X = df[feature_columns].values
+        y = df['total_sales'].values
+        
+        results = []
+        for name in estimators or list(ESTIMATORS):
+            hyperparameters = resolve_hyperparameters({'estimator': name})
+            fit_seconds, mae, rmse = [], [], []
+            
+            for train_index, test_index in TimeSeriesSplit(n_splits=n_splits).split(X):
+                scaler = StandardScaler().fit(X[train_index])
+                estimator = build_estimator(hyperparameters, n_jobs=self.n_jobs)
+                
+                started = time.perf_counter()
+                estimator.fit(scaler.transform(X[train_index]), y[train_index])
+                fit_seconds.append(time.perf_counter() - started)
+                
+                y_pred = estimator.predict(scaler.transform(X[test_index]))
+                mae.append(mean_absolute_error(y[test_index], y_pred))
+                rmse.append(np.sqrt(mean_squared_error(y[test_index], y_pred)))
+            
+            # Latencia de servir un horizonte con el modelo ajustado sobre todo el histórico
+            self.scaler = StandardScaler().fit(X)
+            self.model = build_estimator(hyperparameters, n_jobs=self.n_jobs)
+            self.model.fit(self.scaler.transform(X), y)
+            self.feature_names = feature_columns
+            origin = timezone.localdate()
+            latencies = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                self._predict_rolling(origin, origin + timedelta(days=horizon))
+                latencies.append(time.perf_counter() - started)
+            
+            artifact = io.BytesIO()
+            joblib.dump(self.model, artifact)
+            
+            results.append({
+                'estimator': name,
+                'fit_seconds': float(np.mean(fit_seconds)),
+                'predict_ms': float(np.median(latencies) * 1000),
+                'artifact_kb': artifact.tell() / 1024,
+                'mae': float(np.mean(mae)),
+                'rmse': float(np.mean(rmse)),
+                'training_data_size': len(df)
+            })
+        
+        return results
+    
+    # Percentiles de las predicciones de los árboles usados como intervalo de confianza
+    CONFIDENCE_PERCENTILES = (10, 90)
+    
+    # Categoría de las predicciones guardadas por get_forecast
+    FORECAST_CATEGORY = 'sales_forecast'
+    
     def predict_sales(self, days_ahead: int = 30) -> List[Dict[str, Any]]:
         """Predice ventas futuras"""
         if not self.model:
@@ -311,108 +483,1529 @@ class SalesForecastService:
         if not self.model:
             raise ValueError("No hay modelo entrenado disponible")
         
-        predictions = []
-        current_date = timezone.now().date()
+        days_ahead = int(days_ahead)
+        if days_ahead < 1:
+            return []
         
-        for i in range(1, days_ahead + 1):
-            target_date = current_date + timedelta(days=i)
-            
-            # Preparar features para la fecha objetivo
-            features = self._prepare_prediction_features(target_date)
-            
-            # Escalar features
-            features_scaled = self.scaler.transform([features])
-            
-            # Hacer predicción
-            prediction = self.model.predict(features_scaled)[0]
-            
-            # Calcular intervalo de confianza (simplificado)
-            confidence_interval = prediction * 0.1  # 10% de variación
-            
+        current_date = timezone.localdate()
+        first_date = current_date + timedelta(days=1)
+        last_date = current_date + timedelta(days=days_ahead)
+        
+        if self.uses_legacy_features():
+            # Modelo previo al feature store: todo el horizonte en una sola matriz
+            features = self._prepare_legacy_prediction_features(first_date, last_date)
+            prediction, lower, upper = self._predict_with_interval(self.scaler.transform(features.values))
+            dates = list(features.index)
+        else:
+            # Hoy sigue abierto: se pronostica también para que su total alimente el historial
+            dates, prediction, lower, upper = self._predict_rolling(current_date, last_date)
+            dates, prediction, lower, upper = dates[1:], prediction[1:], lower[1:], upper[1:]
+        
+        predictions = []
+        for i, target_date in enumerate(dates):
             predictions.append({
                 'date': target_date,
-                'predicted_sales': max(0, prediction),
-                'confidence_lower': max(0, prediction - confidence_interval),
-                'confidence_upper': prediction + confidence_interval,
+                'predicted_sales': max(0, float(prediction[i])),
+                'confidence_lower': max(0, float(lower[i])),
+                'confidence_upper': max(0, float(upper[i])),
                 'day_of_week': target_date.weekday(),
                 'is_weekend': target_date.weekday() >= 5
             })
         
         return predictions
     
-    def _prepare_prediction_features(self, target_date) -> List[float]:
-        """Prepara features para una fecha específica"""
-        # Obtener datos históricos para calcular tendencias
-        week_ago = target_date - timedelta(days=7)
-        recent_sales = Sale.objects.filter(
-            created_at__date__gte=week_ago,
-            created_at__date__lt=target_date,
-            is_active=True
-        ).aggregate(total=Sum('total'))['total'] or 0
+    def get_forecast(self, days_ahead: int = 30) -> Dict[str, Any]:
+        """
+        Pronóstico servido desde las predicciones guardadas
         
-        # Features temporales
-        day_of_week = target_date.weekday()
-        day_of_month = target_date.day
-        month = target_date.month
-        quarter = (month - 1) // 3 + 1
-        is_weekend = day_of_week >= 5
-        is_month_start = day_of_month <= 7
-        is_month_end = day_of_month >= 25
-        is_holiday = self._is_holiday(target_date)
-        season = self._get_season(month)
-        
-        # Features estimadas (en producción se calcularían con datos reales)
-        num_transactions = 20  # Estimación
-        avg_transaction = recent_sales / max(1, num_transactions)
-        unique_clients = 15  # Estimación
+        Las predicciones se guardan en Prediction por (modelo, horizonte, fecha
+        objetivo) junto con el último día cerrado y el archivo del modelo que las
+        produjo. El pronóstico solo lee días cerrados, así que las ventas de hoy
+        no lo invalidan: se recalcula al cambiar de día o al reentrenar.
+        """
+        if not self.model:
+            self._load_latest_model()
         
-        return [
-            num_transactions,
-            avg_transaction,
-            day_of_week,
-            day_of_month,
-            month,
-            quarter,
-            int(is_weekend),
-            int(is_month_start),
-            int(is_month_end),
-            recent_sales,
-            int(is_holiday),
-            season,
-            unique_clients
-        ]
+        if not self.model:
+            raise ValueError("No hay modelo entrenado disponible")
+        
+        days_ahead = int(days_ahead)
+        current_date = timezone.localdate()
+        first_date = current_date + timedelta(days=1)
+        last_date = current_date + timedelta(days=days_ahead)
+        watermark = f"{current_date - timedelta(days=1)}:{self.model_file}"
+        
+        stored = {
+            row['target_date']: row
+            for row in Prediction.objects.filter(
+                model_id=self.ml_model_id,
+                category=self.FORECAST_CATEGORY,
+                horizon=days_ahead,
+                target_date__gte=first_date,
+                target_date__lte=last_date,
+                data_watermark=watermark,
+                is_active=True
+            ).values('target_date', 'prediction_result', 'prediction_date')
+        }
+        
+        if days_ahead > 0 and len(stored) == days_ahead:
+            predictions = []
+            for target_date in sorted(stored):
+                result = dict(stored[target_date]['prediction_result'])
+                result['date'] = target_date
+                predictions.append(result)
+            return {
+                'predictions': predictions,
+                'generated_at': min(row['prediction_date'] for row in stored.values()),
+                'cached': True
+            }
+        
+        predictions = self.predict_sales(days_ahead=days_ahead)
+        generated_at = timezone.now()
+        
+        with transaction.atomic():
+            Prediction.objects.filter(
+                model_id=self.ml_model_id,
+                category=self.FORECAST_CATEGORY,
+                horizon=days_ahead
+            ).delete()
+            Prediction.objects.bulk_create([
+                Prediction(
+                    model_id=self.ml_model_id,
+                    input_data={
+                        'horizon': days_ahead,
+                        'model_version': self.model_version,
+                        'model_file': self.model_file
+                    },
+                    prediction_result={**prediction, 'date': prediction['date'].isoformat()},
+                    prediction_date=generated_at,
+                    target_date=prediction['date'],
+                    category=self.FORECAST_CATEGORY,
+                    horizon=days_ahead,
+                    data_watermark=watermark
+                )
+                for prediction in predictions
+            ])
+        
+        return {
+            'predictions': predictions,
+            'generated_at': generated_at,
+            'cached': False
+        }
+    
+    @classmethod
+    def invalidate_forecasts(cls, ml_model_id) -> int:
+        """Elimina los pronósticos guardados de un modelo (p. ej. tras reentrenarlo)"""
+        deleted, _ = Prediction.objects.filter(
+            model_id=ml_model_id,
+            category=cls.FORECAST_CATEGORY
+        ).delete()
+        return deleted
+    
+    def _predict_with_interval(self, X) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Predicción puntual e intervalo de confianza
+        
+        Para bosques el intervalo sale de la dispersión de las predicciones de
+        cada árbol (la media de los árboles es la predicción del bosque). Otros
+        estimadores usan ±10% de la predicción.
+        """
+        estimators = getattr(self.model, 'estimators_', None)
+        if estimators is not None and len(estimators) > 1:
+            # Validación una sola vez (como hace el bosque) y no en cada árbol
+            X = np.asarray(X, dtype=np.float32)
+            tree_predictions = np.stack([tree.predict(X, check_input=False) for tree in estimators])
+            prediction = tree_predictions.mean(axis=0)
+            lower, upper = np.percentile(tree_predictions, self.CONFIDENCE_PERCENTILES, axis=0)
+            return prediction, lower, upper
+        
+        prediction = self.model.predict(X)
+        confidence_interval = np.abs(prediction) * 0.1  # 10% de variación
+        return prediction, prediction - confidence_interval, prediction + confidence_interval
+    
+    def uses_legacy_features(self) -> bool:
+        """El modelo cargado se entrenó con las features anteriores al feature store"""
+        return bool(self.feature_names) and not set(self.feature_names) <= set(DailyFeatureStore.FEATURE_COLUMNS)
+    
+    def _predict_rolling(self, origin, last_date) -> Tuple[List, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pronóstico día a día desde `origin` hasta `last_date` (solo lectura)
+        
+        El historial de cada día son sus HISTORY_DAYS días previos, como al
+        entrenar: los totales reales mientras el día esté cerrado y, dentro del
+        horizonte, las predicciones de los días anteriores. Las transacciones y
+        clientes de los días pronosticados se estiman con el promedio diario de
+        la semana real.
+        """
+        feature_columns = self.feature_names or DailyFeatureStore.FEATURE_COLUMNS
+        window = DailyFeatureStore.serving_history(origin)
+        _, transactions, clients = window.mean(axis=0)
+        
+        dates = pd.date_range(origin, last_date, freq='D')
+        calendar = DailyFeatureStore.calendar_features(dates).to_dict('records')
+        prediction, lower, upper = np.zeros(len(dates)), np.zeros(len(dates)), np.zeros(len(dates))
+        
+        for i, day_calendar in enumerate(calendar):
+            row = {**day_calendar, **DailyFeatureStore.history_features(window)}
+            X = self.scaler.transform(np.array([[row[column] for column in feature_columns]], dtype=float))
+            day_prediction, day_lower, day_upper = self._predict_with_interval(X)
+            prediction[i], lower[i], upper[i] = day_prediction[0], day_lower[0], day_upper[0]
+            window = np.vstack([window[1:], [max(0.0, prediction[i]), transactions, clients]])
+        
+        return list(dates.date), prediction, lower, upper
+    
+    # Estimaciones de las features del constructor anterior que no se conocen a futuro
+    ESTIMATED_TRANSACTIONS = 20
+    ESTIMATED_UNIQUE_CLIENTS = 15
+    
+    def _prepare_legacy_prediction_features(self, first_date, last_date) -> pd.DataFrame:
+        """Matriz de features del constructor anterior para un rango de fechas futuras"""
+        missing = [column for column in self.feature_names if column not in self.LEGACY_FEATURE_COLUMNS]
+        if missing:
+            raise ValueError(
+                f"El modelo activo usa features que ya no existen ({', '.join(missing)}); reentrénalo"
+            )
+        
+        # Historial reciente para la tendencia semanal: solo días cerrados (hoy y
+        # los días futuros cuentan como cero)
+        rows = SalesDailyRollup.objects.filter(
+            date__gte=first_date - timedelta(days=7),
+            date__lt=first_date - timedelta(days=1)
+        ).values('date', 'revenue', 'transaction_count', 'unique_clients')
+        history = pd.DataFrame.from_records(
+            rows, columns=['date', 'revenue', 'transaction_count', 'unique_clients']
+        )
+        
+        df = self.build_daily_features(history, first_date, last_date)
+        
+        # Features estimadas (no se conocen para fechas futuras)
+        df['num_transactions'] = self.ESTIMATED_TRANSACTIONS
+        df['avg_transaction'] = df['week_sales'] / self.ESTIMATED_TRANSACTIONS
+        df['unique_clients'] = self.ESTIMATED_UNIQUE_CLIENTS
+        
+        return df.set_index('date')[self.feature_names]
     
     def _load_latest_model(self):
-        """Carga el modelo más reciente"""
+        """Carga el modelo más reciente desde el registro en memoria del proceso"""
         try:
-            latest_model = MLModel.objects.filter(
-                model_type='sales_forecast',
-                is_active=True
-            ).order_by('-created_at').first()
+            loaded = model_registry.get('sales_forecast')
             
-            if latest_model:
-                model_path = os.path.join(self.model_path, latest_model.model_file)
-                if os.path.exists(model_path):
-                    self.model = joblib.load(model_path)
-                    
-                    # Cargar scaler
-                    scaler_filename = latest_model.model_file.replace('sales_forecast_', 'scaler_')
-                    scaler_path = os.path.join(self.model_path, scaler_filename)
-                    if os.path.exists(scaler_path):
-                        self.scaler = joblib.load(scaler_path)
-                    
-                    self.feature_names = latest_model.features_used
+            if loaded:
+                self.model = loaded.model
+                if loaded.scaler is not None:
+                    self.scaler = loaded.scaler
+                self.feature_names = loaded.feature_names
+                self.ml_model_id = loaded.ml_model_id
+                self.model_version = loaded.version
+                self.model_file = loaded.model_file
                     
         except Exception as e:
             print(f"Error cargando modelo: {e}")
 
 
+def _forecast_demand_chunk(
+    quantities: np.ndarray,
+    first_weekday: int,
+    horizon: int,
+    alpha: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pronóstico de demanda para un bloque de productos (una fila por producto)
+    
+    Nivel: promedio exponencial de la cantidad diaria. Estacionalidad: factor por
+    día de la semana relativo al promedio del producto. Todo se calcula con
+    operaciones matriciales sobre el bloque completo; se ejecuta en el pool de
+    procesos, por eso es una función de módulo.
+    
+    Returns:
+        (pronóstico diario productos × horizonte, desviación estándar diaria por producto)
+    """
+    n_days = quantities.shape[1]
+    if n_days < 1:
+        raise ValueError("Se necesita al menos un día de historial para pronosticar la demanda")
+    
+    # Pesos exponenciales (el día más reciente pesa más)
+    weights = alpha * (1 - alpha) ** np.arange(n_days - 1, -1, -1)
+    level = quantities @ (weights / weights.sum())
+    
+    # Factores por día de la semana
+    weekdays = (first_weekday + np.arange(n_days)) % 7
+    overall_mean = quantities.mean(axis=1)
+    factors = np.ones((quantities.shape[0], 7))
+    for weekday in range(7):
+        columns = weekdays == weekday
+        if columns.any():
+            weekday_mean = quantities[:, columns].mean(axis=1)
+            factors[:, weekday] = np.divide(
+                weekday_mean, overall_mean,
+                out=np.ones_like(overall_mean), where=overall_mean > 0
+            )
+    
+    horizon_weekdays = (first_weekday + n_days + np.arange(horizon)) % 7
+    forecast = level[:, None] * factors[:, horizon_weekdays]
+    sigma = quantities.std(axis=1, ddof=1) if n_days > 1 else np.zeros(quantities.shape[0])
+    
+    return forecast, sigma
+
+
+class DemandForecastService:
+    """
+    Pronóstico de demanda por producto (SKU) para el tipo de modelo demand_forecast
+    
+    Construye la matriz (producto × día) de cantidades vendidas en una consulta,
+    pronostica todos los productos en bloques dentro de un pool de procesos y
+    guarda un resultado por producto activo, con punto de reorden sugerido.
+    """
+    
+    MODEL_NAME = 'Demand Forecast Model'
+    FORECAST_CATEGORY = 'demand_forecast'
+    
+    # Suavizado exponencial del nivel de demanda
+    ALPHA = 0.1
+    # Productos por bloque enviado a cada proceso
+    CHUNK_SIZE = 500
+    # Nivel de servicio del stock de seguridad (z para ~95%)
+    SERVICE_LEVEL_Z = 1.65
+    
+    def __init__(self, days_back: int = 180, horizon: int = 30, lead_time_days: Optional[int] = None):
+        # Sin días de historial los pesos del nivel quedan vacíos (división por cero)
+        if days_back < 1:
+            raise ValueError("days_back debe ser mayor o igual a 1")
+        if horizon < 1:
+            raise ValueError("horizon debe ser mayor o igual a 1")
+        self.days_back = days_back
+        self.horizon = horizon
+        self.lead_time_days = lead_time_days or getattr(settings, 'DEMAND_LEAD_TIME_DAYS', 7)
+        self.n_jobs = getattr(settings, 'ML_TRAINING_N_JOBS', 2)
+    
+    def build_quantity_matrix(self, product_ids: List[int], start_date, end_date) -> Tuple[np.ndarray, int]:
+        """
+        Matriz de cantidades vendidas (producto × día) en una sola consulta agrupada
+        
+        Returns:
+            (matriz alineada con product_ids, cantidad de pares producto-día con ventas)
+        """
+        start, _ = SalesRollupService.day_bounds(start_date)
+        _, end = SalesRollupService.day_bounds(end_date)
+        rows = list(SaleItem.objects.filter(
+            sale__is_active=True,
+            sale__status='completed',
+            sale__created_at__gte=start,
+            sale__created_at__lt=end,
+            product__is_active=True
+        ).annotate(
+            day=TruncDate('sale__created_at')
+        ).values('product_id', 'day').annotate(quantity=Sum('quantity')).values_list('product_id', 'day', 'quantity'))
+        
+        n_days = (end_date - start_date).days + 1
+        matrix = np.zeros((len(product_ids), n_days))
+        
+        row_index = {product_id: i for i, product_id in enumerate(product_ids)}
+        rows = [row for row in rows if row[0] in row_index]
+        if not rows:
+            return matrix, 0
+        
+        product_col, day_col, quantity_col = zip(*rows)
+        matrix[
+            [row_index[product_id] for product_id in product_col],
+            [(day - start_date).days for day in day_col]
+        ] = quantity_col
+        return matrix, len(quantity_col)
+    
+    def forecast(self, quantities: np.ndarray, first_weekday: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Pronostica todos los productos, repartiendo bloques en un pool de procesos"""
+        chunks = [
+            quantities[i:i + self.CHUNK_SIZE]
+            for i in range(0, quantities.shape[0], self.CHUNK_SIZE)
+        ]
+        args = [(chunk, first_weekday, self.horizon, self.ALPHA) for chunk in chunks]
+        
+        if len(chunks) <= 1 or self.n_jobs <= 1:
+            results = [_forecast_demand_chunk(*arg) for arg in args]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(chunks))) as executor:
+                results = list(executor.map(_forecast_demand_chunk, *zip(*args)))
+        
+        if not results:
+            return np.zeros((0, self.horizon)), np.zeros(0)
+        return (
+            np.vstack([forecast for forecast, _ in results]),
+            np.concatenate([sigma for _, sigma in results])
+        )
+    
+    def reorder_points(self, forecast: np.ndarray, sigma: np.ndarray, products: pd.DataFrame) -> pd.DataFrame:
+        """
+        Punto de reorden y cantidad sugerida contrastados con min_stock/max_stock
+        
+        reorden = demanda en el tiempo de entrega + stock de seguridad, nunca por
+        debajo de min_stock ni por encima de max_stock. Si el stock actual está en
+        o por debajo del punto de reorden se sugiere reponer hasta max_stock.
+        """
+        lead_time = min(self.lead_time_days, self.horizon)
+        lead_time_demand = forecast[:, :lead_time].sum(axis=1)
+        safety_stock = self.SERVICE_LEVEL_Z * sigma * np.sqrt(lead_time)
+        
+        min_stock = products['min_stock'].to_numpy()
+        max_stock = products['max_stock'].to_numpy()
+        stock = products['stock'].to_numpy()
+        
+        reorder_point = np.ceil(np.clip(lead_time_demand + safety_stock, min_stock, np.maximum(max_stock, min_stock)))
+        needs_reorder = stock <= reorder_point
+        suggested_order = np.where(needs_reorder, np.maximum(max_stock - stock, 0), 0)
+        
+        return products.assign(
+            horizon_demand=forecast.sum(axis=1),
+            lead_time_demand=lead_time_demand,
+            safety_stock=safety_stock,
+            reorder_point=reorder_point.astype(int),
+            needs_reorder=needs_reorder,
+            suggested_order_qty=suggested_order.astype(int)
+        )
+    
+    def run(self) -> Dict[str, Any]:
+        """Ejecuta el pronóstico para todos los productos activos y guarda los resultados"""
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=self.days_back - 1)
+        
+        products = pd.DataFrame.from_records(
+            Product.objects.filter(is_active=True).order_by('id').values(
+                'id', 'sku', 'name', 'stock', 'min_stock', 'max_stock'
+            ),
+            columns=['id', 'sku', 'name', 'stock', 'min_stock', 'max_stock']
+        )
+        
+        product_ids = products['id'].tolist()
+        quantities, data_points = self.build_quantity_matrix(product_ids, start_date, end_date)
+        forecast, sigma = self.forecast(quantities, start_date.weekday())
+        results = self.reorder_points(forecast, sigma, products)
+        
+        ml_model, _ = MLModel.objects.get_or_create(
+            name=self.MODEL_NAME,
+            model_type='demand_forecast',
+            defaults={'model_file': ''}
+        )
+        ml_model.training_data_size = data_points
+        ml_model.training_date = timezone.now()
+        ml_model.features_used = ['daily_quantity', 'day_of_week']
+        ml_model.hyperparameters = {
+            'alpha': self.ALPHA,
+            'days_back': self.days_back,
+            'horizon': self.horizon,
+            'lead_time_days': self.lead_time_days,
+            'service_level_z': self.SERVICE_LEVEL_Z
+        }
+        ml_model.save()
+        
+        first_date = end_date + timedelta(days=1)
+        generated_at = timezone.now()
+        predictions = [
+            Prediction(
+                model=ml_model,
+                input_data={
+                    'product_id': int(row.id),
+                    'days_back': self.days_back,
+                    'stock': int(row.stock),
+                    'min_stock': int(row.min_stock),
+                    'max_stock': int(row.max_stock)
+                },
+                prediction_result={
+                    'product_id': int(row.id),
+                    'sku': row.sku,
+                    'name': row.name,
+                    'daily_forecast': [round(float(value), 2) for value in forecast[i]],
+                    'horizon_demand': round(float(row.horizon_demand), 2),
+                    'lead_time_demand': round(float(row.lead_time_demand), 2),
+                    'safety_stock': round(float(row.safety_stock), 2),
+                    'reorder_point': int(row.reorder_point),
+                    'needs_reorder': bool(row.needs_reorder),
+                    'suggested_order_qty': int(row.suggested_order_qty)
+                },
+                prediction_date=generated_at,
+                target_date=first_date,
+                category=self.FORECAST_CATEGORY,
+                horizon=self.horizon
+            )
+            for i, row in enumerate(results.itertuples(index=False))
+        ]
+        
+        with transaction.atomic():
+            Prediction.objects.filter(model=ml_model, category=self.FORECAST_CATEGORY).delete()
+            Prediction.objects.bulk_create(predictions, batch_size=1000)
+        
+        return {
+            'success': True,
+            'products': len(predictions),
+            'needs_reorder': int(results['needs_reorder'].sum()) if len(results) else 0,
+            'data_points': data_points,
+            'generated_at': generated_at
+        }
+
+
+class PriceElasticityService:
+    """
+    Elasticidad precio-demanda por producto (tipo de modelo price_optimization)
+    
+    Cada cambio de PriceHistory abre una ventana de precio. Las cantidades
+    diarias de SaleItem se asignan a la ventana vigente con un as-of join
+    (`pd.merge_asof` por producto) y, para todos los productos a la vez, se
+    ajusta log(demanda diaria) ~ log(precio) ponderado por la duración de cada
+    ventana. La pendiente es la elasticidad, de la que se deriva una banda de
+    precio sugerida.
+    """
+    
+    MODEL_NAME = 'Price Elasticity Model'
+    FORECAST_CATEGORY = 'price_elasticity'
+    
+    # Días mínimos de una ventana para usarla en el ajuste
+    MIN_WINDOW_DAYS = 3
+    # Ventanas con precios distintos necesarias para estimar la elasticidad
+    MIN_WINDOWS = 2
+    # R² mínimo para confiar en la elasticidad estimada
+    MIN_R2 = 0.3
+    # Cuánto puede salirse la banda del rango de precios observado
+    PRICE_RANGE_MARGIN = 0.10
+    # Ancho de la banda alrededor del precio sugerido
+    BAND_WIDTH = 0.05
+    
+    def __init__(self, days_back: int = 730):
+        self.days_back = days_back
+    
+    def load_price_windows(self, start_date, end_date) -> pd.DataFrame:
+        """
+        Ventanas de precio por producto recortadas al periodo [start_date, end_date]
+        
+        Un cambio rige desde su día local; antes del primer cambio rige su precio anterior.
+        """
+        history = pd.DataFrame.from_records(
+            PriceHistory.objects.filter(
+                product__is_active=True,
+                created_at__lte=SalesRollupService.day_bounds(end_date)[1]
+            ).order_by('product_id', 'created_at').values_list('product_id', 'created_at', 'old_price', 'new_price'),
+            columns=['product_id', 'created_at', 'old_price', 'new_price']
+        )
+        if history.empty:
+            return pd.DataFrame(columns=['product_id', 'window_start', 'window_end', 'price'])
+        
+        history['window_start'] = (
+            pd.to_datetime(history['created_at'], utc=True)
+            .dt.tz_convert(settings.TIME_ZONE).dt.tz_localize(None).dt.normalize()
+        )
+        first = history.drop_duplicates('product_id', keep='first')
+        initial = pd.DataFrame({
+            'product_id': first['product_id'],
+            'window_start': pd.Timestamp(start_date),
+            'price': first['old_price']
+        })
+        changes = history.drop_duplicates(['product_id', 'window_start'], keep='last').rename(
+            columns={'new_price': 'price'}
+        )[['product_id', 'window_start', 'price']]
+        
+        windows = pd.concat([initial, changes], ignore_index=True).sort_values(
+            ['product_id', 'window_start'], kind='stable'
+        )
+        windows['price'] = windows['price'].astype(float)
+        windows['window_start'] = windows['window_start'].astype('datetime64[ns]').clip(lower=pd.Timestamp(start_date))
+        windows['window_end'] = windows.groupby('product_id')['window_start'].shift(-1).fillna(
+            pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        )
+        # Se descartan las ventanas vacías (cambios previos al periodo o del mismo día)
+        windows = windows[windows['window_end'] > windows['window_start']]
+        return windows.reset_index(drop=True)
+    
+    def load_daily_quantities(self, start_date, end_date) -> pd.DataFrame:
+        """Cantidad vendida por producto y día en una consulta agrupada"""
+        start, _ = SalesRollupService.day_bounds(start_date)
+        _, end = SalesRollupService.day_bounds(end_date)
+        daily = pd.DataFrame.from_records(
+            SaleItem.objects.filter(
+                sale__is_active=True,
+                sale__status='completed',
+                sale__created_at__gte=start,
+                sale__created_at__lt=end,
+                product__is_active=True
+            ).annotate(
+                day=TruncDate('sale__created_at')
+            ).values('product_id', 'day').annotate(quantity=Sum('quantity')).values_list('product_id', 'day', 'quantity'),
+            columns=['product_id', 'day', 'quantity']
+        )
+        daily['day'] = pd.to_datetime(daily['day']).astype('datetime64[ns]')
+        daily['quantity'] = daily['quantity'].astype(float)
+        return daily
+    
+    def window_demand(self, windows: pd.DataFrame, daily: pd.DataFrame) -> pd.DataFrame:
+        """
+        As-of join: suma las cantidades diarias en la ventana de precio vigente
+        
+        Las ventanas empiezan como muy pronto en la primera venta del producto,
+        para no contar como demanda cero los días en que aún no se vendía.
+        """
+        first_sale = windows['product_id'].map(daily.groupby('product_id')['day'].min())
+        windows = windows.assign(window_start=np.maximum(windows['window_start'], first_sale))
+        windows = windows[windows['window_end'] > windows['window_start']].reset_index(drop=True)
+        windows = windows.assign(window_id=np.arange(len(windows)))
+        if windows.empty:
+            quantity = np.zeros(0)
+        else:
+            matched = pd.merge_asof(
+                daily.sort_values('day'),
+                windows[['product_id', 'window_start', 'window_id']].sort_values('window_start'),
+                left_on='day',
+                right_on='window_start',
+                by='product_id',
+                direction='backward'
+            ).dropna(subset=['window_id'])
+            quantity = np.bincount(
+                matched['window_id'].to_numpy(dtype=np.int64),
+                weights=matched['quantity'].to_numpy(),
+                minlength=len(windows)
+            )
+        
+        days = (windows['window_end'] - windows['window_start']).dt.days.to_numpy()
+        return windows.assign(days=days, quantity=quantity)
+    
+    def estimate(self, windows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Elasticidad por producto: pendiente de la regresión log-log ponderada
+        
+        Las ventanas sin ventas se suavizan con +0.5 unidades para poder tomar el logaritmo.
+        """
+        windows = windows[windows['days'] >= self.MIN_WINDOW_DAYS]
+        w = windows['days'].to_numpy(dtype=np.float64)
+        x = np.log(windows['price'].to_numpy())
+        y = np.log((windows['quantity'].to_numpy() + 0.5) / w)
+        
+        frame = pd.DataFrame({'product_id': windows['product_id'].to_numpy(), 'w': w, 'wx': w * x, 'wy': w * y})
+        groups = frame.groupby('product_id')
+        totals = groups[['w', 'wx', 'wy']].transform('sum')
+        dx = x - totals['wx'].to_numpy() / totals['w'].to_numpy()
+        dy = y - totals['wy'].to_numpy() / totals['w'].to_numpy()
+        
+        moments = pd.DataFrame({
+            'product_id': frame['product_id'],
+            'sxy': w * dx * dy,
+            'sxx': w * dx ** 2,
+            'syy': w * dy ** 2,
+            'price': windows['price'].to_numpy(),
+            'quantity': windows['quantity'].to_numpy(),
+            'days': w
+        }).groupby('product_id').agg(
+            sxy=('sxy', 'sum'), sxx=('sxx', 'sum'), syy=('syy', 'sum'),
+            windows=('price', 'size'), distinct_prices=('price', 'nunique'),
+            min_price=('price', 'min'), max_price=('price', 'max'),
+            quantity=('quantity', 'sum'), days=('days', 'sum')
+        )
+        
+        moments = moments[moments['distinct_prices'] >= self.MIN_WINDOWS]
+        sxx = moments['sxx'].to_numpy()
+        syy = moments['syy'].to_numpy()
+        sxy = moments['sxy'].to_numpy()
+        elasticity = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+        r2 = np.divide(sxy ** 2, sxx * syy, out=np.zeros_like(sxy), where=(sxx * syy) > 0)
+        return moments.assign(elasticity=elasticity, r2=r2).reset_index()
+    
+    def price_bands(self, estimates: pd.DataFrame, products: pd.DataFrame) -> pd.DataFrame:
+        """
+        Precio y banda sugeridos a partir de la elasticidad
+        
+        Con demanda elástica (e < -1) el precio que maximiza el margen es
+        costo·e/(1+e); con demanda inelástica subir el precio aumenta el margen,
+        así que se sugiere el extremo superior. Todo se acota al rango observado
+        (± PRICE_RANGE_MARGIN) y nunca por debajo del costo. Si la estimación no
+        es confiable se mantiene el precio actual.
+        """
+        data = estimates.merge(products, left_on='product_id', right_on='id')
+        elasticity = data['elasticity'].to_numpy()
+        cost = data['cost'].to_numpy()
+        current = data['current_price'].to_numpy()
+        
+        lower = np.maximum(data['min_price'].to_numpy() * (1 - self.PRICE_RANGE_MARGIN), cost)
+        upper = np.maximum(data['max_price'].to_numpy() * (1 + self.PRICE_RANGE_MARGIN), lower)
+        reliable = (elasticity < 0) & (data['r2'].to_numpy() >= self.MIN_R2)
+        
+        elastic = elasticity < -1
+        optimal = np.where(
+            elastic,
+            cost * elasticity / np.where(elastic, 1 + elasticity, -1),
+            upper
+        )
+        suggested = np.where(reliable, np.clip(optimal, lower, upper), current)
+        return data.assign(
+            reliable=reliable,
+            suggested_price=suggested,
+            band_low=np.where(reliable, np.clip(suggested * (1 - self.BAND_WIDTH), lower, upper), suggested * (1 - self.BAND_WIDTH)),
+            band_high=np.where(reliable, np.clip(suggested * (1 + self.BAND_WIDTH), lower, upper), suggested * (1 + self.BAND_WIDTH))
+        )
+    
+    def run(self) -> Dict[str, Any]:
+        """Estima la elasticidad de todos los productos con cambios de precio y guarda los resultados"""
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=self.days_back - 1)
+        
+        windows = self.window_demand(
+            self.load_price_windows(start_date, end_date),
+            self.load_daily_quantities(start_date, end_date)
+        )
+        estimates = self.estimate(windows)
+        products = pd.DataFrame.from_records(
+            Product.objects.filter(id__in=estimates['product_id'].tolist()).values_list('id', 'sku', 'name', 'price', 'cost'),
+            columns=['id', 'sku', 'name', 'current_price', 'cost']
+        ).astype({'current_price': float, 'cost': float})
+        results = self.price_bands(estimates, products)
+        
+        ml_model, _ = MLModel.objects.get_or_create(
+            name=self.MODEL_NAME,
+            model_type='price_optimization',
+            defaults={'model_file': ''}
+        )
+        ml_model.training_data_size = len(windows)
+        ml_model.training_date = timezone.now()
+        ml_model.features_used = ['log_price', 'log_daily_quantity']
+        ml_model.hyperparameters = {
+            'days_back': self.days_back,
+            'min_window_days': self.MIN_WINDOW_DAYS,
+            'min_r2': self.MIN_R2,
+            'price_range_margin': self.PRICE_RANGE_MARGIN,
+            'band_width': self.BAND_WIDTH
+        }
+        ml_model.save()
+        
+        generated_at = timezone.now()
+        predictions = [
+            Prediction(
+                model=ml_model,
+                input_data={
+                    'product_id': int(row.product_id),
+                    'days_back': self.days_back,
+                    'windows': int(row.windows),
+                    'current_price': round(float(row.current_price), 2),
+                    'cost': round(float(row.cost), 2)
+                },
+                prediction_result={
+                    'product_id': int(row.product_id),
+                    'sku': row.sku,
+                    'name': row.name,
+                    'elasticity': round(float(row.elasticity), 4),
+                    'r2': round(float(row.r2), 4),
+                    'reliable': bool(row.reliable),
+                    'observed_price_range': [round(float(row.min_price), 2), round(float(row.max_price), 2)],
+                    'current_price': round(float(row.current_price), 2),
+                    'suggested_price': round(float(row.suggested_price), 2),
+                    'price_band': [round(float(row.band_low), 2), round(float(row.band_high), 2)]
+                },
+                confidence=round(float(row.r2), 4),
+                prediction_date=generated_at,
+                target_date=end_date,
+                category=self.FORECAST_CATEGORY
+            )
+            for row in results.itertuples(index=False)
+        ]
+        
+        with transaction.atomic():
+            Prediction.objects.filter(model=ml_model, category=self.FORECAST_CATEGORY).delete()
+            Prediction.objects.bulk_create(predictions, batch_size=1000)
+        
+        return {
+            'success': True,
+            'products': len(predictions),
+            'reliable': int(results['reliable'].sum()) if len(results) else 0,
+            'windows': len(windows),
+            'generated_at': generated_at
+        }
+
+
+class RecommendationService:
+    """
+    Recomendaciones "comprados juntos frecuentemente" (tipo de modelo recommendation)
+    
+    El índice (ItemRecommender) se guarda como artefacto joblib y se sirve desde
+    el registro de modelos del proceso. Las ventas nuevas se incorporan de forma
+    incremental con el evento de outbox `recommender_update`.
+    """
+    
+    MODEL_NAME = 'Recommendation Model'
+    
+    def __init__(self):
+        self.model_path = 'ml_models/'
+        # Margen para no leer ventas cuya transacción aún podría no estar confirmada
+        self.settle_seconds = getattr(settings, 'RECOMMENDER_UPDATE_DELAY_SECONDS', 300)
+    
+    # Generaciones de artefactos que se conservan en disco (la actual y la anterior,
+    # que otros procesos pueden estar cargando todavía)
+    KEEP_ARTIFACTS = 2
+    # Filas por bloque al leer y escribir canastas
+    CHUNK_SIZE = 1000
+    
+    def update(self, full: bool = False, removed_sale_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Sincroniza el índice con las ventas modificadas desde la última actualización
+        
+        La marca de agua es `updated_at` de la venta, así que entran también las
+        ventas que pasan a completadas después (o con fecha retroactiva), y las
+        que se cancelan o desactivan se restan del índice.
+        
+        Args:
+            full: Reconstruir el índice desde cero con todo el histórico
+            removed_sale_ids: Ventas eliminadas que hay que restar
+        """
+        with transaction.atomic():
+            # Bloqueo para que dos actualizaciones concurrentes no se pisen el artefacto
+            ml_model = MLModel.objects.select_for_update().filter(
+                name=self.MODEL_NAME,
+                model_type='recommendation'
+            ).first()
+            
+            recommender = None
+            if ml_model and ml_model.model_file and not full:
+                model_file = os.path.join(self.model_path, ml_model.model_file)
+                if os.path.exists(model_file):
+                    recommender = joblib.load(model_file)
+            # Sin canastas registradas que coincidan con el índice (p. ej. artefactos
+            # que las guardaban adentro) no se puede restar nada: se reconstruye
+            if recommender is None or recommender.basket_count != RecommenderBasket.objects.count():
+                recommender = ItemRecommender(top_k=getattr(settings, 'RECOMMENDER_TOP_K', 20))
+                RecommenderBasket.objects.all().delete()
+            
+            until = timezone.now() - timedelta(seconds=self.settle_seconds)
+            eligible = Q(is_active=True, status='completed')
+            if recommender.last_updated_at is None:
+                changed = Sale.objects.filter(eligible)
+            else:
+                changed = Sale.objects.filter(
+                    updated_at__gt=recommender.last_updated_at,
+                    updated_at__lte=until
+                )
+            
+            incoming: Dict[str, set] = {}
+            for sale_id, product_id in SaleItem.objects.filter(
+                sale__in=changed.filter(eligible)
+            ).values_list('sale_id', 'product_id').iterator(chunk_size=self.CHUNK_SIZE):
+                incoming.setdefault(str(sale_id), set()).add(product_id)
+            removed_ids = {str(sale_id) for sale_id in removed_sale_ids or []}
+            if recommender.last_updated_at is not None:
+                # Ventas que dejaron de contar (canceladas, reembolsadas o desactivadas)
+                removed_ids.update(str(sale_id) for sale_id in changed.exclude(eligible).values_list('id', flat=True))
+            
+            if not incoming and not removed_ids and ml_model and ml_model.model_file and not full:
+                return {'success': True, 'baskets': 0, 'removed': 0, 'products_updated': 0}
+            
+            added, removed = self._basket_changes(incoming, removed_ids)
+            updated = recommender.update(list(added.values()), list(removed.values()))
+            recommender.last_updated_at = max(until, recommender.last_updated_at or until)
+            
+            self._save(ml_model, recommender)
+        
+        return {
+            'success': True,
+            'baskets': len(added),
+            'removed': len(set(removed) - set(added)),
+            'products_updated': updated,
+            'products': len(recommender.product_ids)
+        }
+    
+    def _basket_changes(
+        self,
+        incoming: Dict[str, set],
+        removed_ids: set
+    ) -> Tuple[Dict[str, Tuple[int, ...]], Dict[str, Tuple[int, ...]]]:
+        """
+        Compara las canastas recibidas con las registradas y actualiza RecommenderBasket
+        
+        Solo se leen las canastas involucradas, por bloques de CHUNK_SIZE.
+        
+        Returns:
+            (canastas a sumar, canastas a restar con los productos con que se incorporaron)
+        """
+        involved = list(set(incoming) | removed_ids)
+        previous = {}
+        for start in range(0, len(involved), self.CHUNK_SIZE):
+            previous.update(
+                (str(sale_id), tuple(product_ids))
+                for sale_id, product_ids in RecommenderBasket.objects.filter(
+                    sale_id__in=involved[start:start + self.CHUNK_SIZE]
+                ).values_list('sale_id', 'product_ids')
+            )
+        
+        added, removed = {}, {}
+        for sale_id, products in incoming.items():
+            products = tuple(sorted(products))
+            if previous.get(sale_id) == products:
+                continue
+            if sale_id in previous:
+                removed[sale_id] = previous[sale_id]
+            added[sale_id] = products
+        for sale_id in removed_ids - set(incoming):
+            if sale_id in previous:
+                removed[sale_id] = previous[sale_id]
+        
+        stale = list(removed)
+        for start in range(0, len(stale), self.CHUNK_SIZE):
+            RecommenderBasket.objects.filter(sale_id__in=stale[start:start + self.CHUNK_SIZE]).delete()
+        RecommenderBasket.objects.bulk_create([
+            RecommenderBasket(sale_id=sale_id, product_ids=list(products))
+            for sale_id, products in added.items()
+        ], batch_size=self.CHUNK_SIZE)
+        return added, removed
+    
+    def _save(self, ml_model: Optional[MLModel], recommender: ItemRecommender):
+        """Guarda el índice y apunta el MLModel al nuevo archivo"""
+        os.makedirs(self.model_path, exist_ok=True)
+        
+        model_filename = f"recommendation_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.joblib"
+        joblib.dump(recommender, os.path.join(self.model_path, model_filename))
+        
+        if ml_model is None:
+            ml_model = MLModel(name=self.MODEL_NAME, model_type='recommendation')
+        ml_model.model_file = model_filename
+        ml_model.features_used = ['basket_cooccurrence']
+        ml_model.hyperparameters = {'top_k': recommender.top_k, 'similarity': 'cosine'}
+        ml_model.training_data_size = recommender.basket_count
+        ml_model.last_retrain = timezone.now()
+        ml_model.save()
+        
+        self._prune_artifacts()
+    
+    def _prune_artifacts(self):
+        """
+        Elimina los artefactos viejos del recomendador
+        
+        El anterior se conserva: otros procesos pueden haber leído su nombre en
+        MLModel y estar cargándolo (el registro pasa al nuevo en su próxima lectura).
+        """
+        artifacts = sorted(
+            name for name in os.listdir(self.model_path)
+            if name.startswith('recommendation_') and name.endswith('.joblib')
+        )
+        for name in artifacts[:-self.KEEP_ARTIFACTS]:
+            try:
+                os.remove(os.path.join(self.model_path, name))
+            except OSError:
+                pass
+    
+    @staticmethod
+    def frequently_bought_together(product_ids: List[int], limit: int = 5) -> List[Dict[str, Any]]:
+        """Productos comprados junto con los indicados, listos para mostrar"""
+        loaded = model_registry.get('recommendation')
+        if not loaded or not product_ids:
+            return []
+        
+        scored = loaded.model.recommend(product_ids, limit=limit)
+        if not scored:
+            return []
+        
+        products = Product.objects.filter(
+            id__in=[product_id for product_id, _ in scored],
+            is_active=True
+        ).in_bulk()
+        return [
+            {
+                'id': product_id,
+                'name': products[product_id].name,
+                'price': float(products[product_id].price),
+                'stock': products[product_id].stock,
+                'score': round(score, 4)
+            }
+            for product_id, score in scored
+            if product_id in products
+        ]
+    
+    @staticmethod
+    def schedule_update():
+        """Encola una actualización incremental si no hay otra pendiente"""
+        from apps.core.models import OutboxEvent
+        
+        if OutboxEvent.objects.filter(event_type='recommender_update', status='pending').exists():
+            return
+        OutboxService.enqueue(
+            'recommender_update',
+            delay_seconds=getattr(settings, 'RECOMMENDER_UPDATE_DELAY_SECONDS', 300)
+        )
+
+
+class CustomerSegmentationService:
+    """
+    Segmentación RFM de clientes (tipo de modelo customer_segmentation)
+    
+    Calcula recencia, frecuencia y monto de todos los clientes en una consulta
+    agrupada, los puntúa por quintiles (o KMeans) con numpy y actualiza
+    Client.segment solo en las filas cuyo segmento cambió.
+    """
+    
+    MODEL_NAME = 'Customer Segmentation Model'
+    
+    # Puntaje RFM (3 a 15) a partir del cual el cliente es VIP
+    VIP_MIN_SCORE = 12
+    # Días desde el registro en que un cliente con una sola compra sigue siendo nuevo
+    NEW_CLIENT_DAYS = 30
+    # Filas por lote al escribir los cambios
+    BATCH_SIZE = 1000
+    
+    def __init__(self, method: str = 'quantile'):
+        if method not in ('quantile', 'kmeans'):
+            raise ValueError(f"Método de segmentación inválido: {method}")
+        self.method = method
+    
+    def load_rfm(self) -> Dict[str, np.ndarray]:
+        """Recencia, frecuencia y monto de cada cliente activo en una consulta agrupada"""
+        completed = Q(sale__status='completed', sale__is_active=True)
+        rows = Client.objects.filter(is_active=True).annotate(
+            last_sale=Max('sale__created_at', filter=completed),
+            frequency=Count('sale', filter=completed),
+            monetary=Sum('sale__total', filter=completed)
+        ).values_list('id', 'segment', 'created_at', 'last_sale', 'frequency', 'monetary').order_by()
+        
+        now = timezone.now()
+        ids, segments, age_days, recency_days, frequency, monetary = [], [], [], [], [], []
+        for client_id, segment, created_at, last_sale, count, total in rows.iterator(chunk_size=10000):
+            ids.append(client_id)
+            segments.append(segment)
+            age_days.append((now - created_at).days)
+            recency_days.append((now - last_sale).days if last_sale else -1)
+            frequency.append(count)
+            monetary.append(float(total or 0))
+        
+        return {
+            'ids': np.array(ids, dtype=np.int64),
+            'segments': np.array(segments, dtype=object),
+            'age_days': np.array(age_days, dtype=np.int64),
+            'recency_days': np.array(recency_days, dtype=np.int64),
+            'frequency': np.array(frequency, dtype=np.int64),
+            'monetary': np.array(monetary, dtype=np.float64)
+        }
+    
+    @staticmethod
+    def quintile_scores(values: np.ndarray, reverse: bool = False) -> np.ndarray:
+        """
+        Puntaje 1-5 por quintil (reverse: valores bajos puntúan alto, p. ej. recencia)
+        
+        Usa el percentil de rango promedio para que los empates reciban el mismo
+        puntaje sin cargarse todos a un extremo.
+        """
+        if not len(values):
+            return np.zeros(0, dtype=np.int64)
+        from scipy.stats import rankdata
+        
+        percentile = (rankdata(values, method='average') - 0.5) / len(values)
+        scores = np.clip(np.ceil(percentile * 5), 1, 5).astype(np.int64)
+        return 6 - scores if reverse else scores
+    
+    def score(self, rfm: Dict[str, np.ndarray]) -> np.ndarray:
+        """Asigna el segmento (vip/regular/new) a cada cliente"""
+        buyers = rfm['frequency'] > 0
+        segments = np.full(len(rfm['ids']), 'regular', dtype=object)
+        
+        if buyers.any():
+            recency = rfm['recency_days'][buyers]
+            frequency = rfm['frequency'][buyers]
+            monetary = rfm['monetary'][buyers]
+            
+            if self.method == 'kmeans':
+                vip = self._kmeans_vip(recency, frequency, monetary)
+            else:
+                total_score = (
+                    self.quintile_scores(recency, reverse=True)
+                    + self.quintile_scores(frequency)
+                    + self.quintile_scores(monetary)
+                )
+                vip = total_score >= self.VIP_MIN_SCORE
+            
+            buyer_segments = segments[buyers]
+            buyer_segments[vip] = 'vip'
+            segments[buyers] = buyer_segments
+        
+        # Nuevos: sin compras, o una sola compra y registro reciente
+        new = ~buyers | ((rfm['frequency'] == 1) & (rfm['age_days'] <= self.NEW_CLIENT_DAYS))
+        segments[new] = 'new'
+        return segments
+    
+    @staticmethod
+    def _kmeans_vip(recency: np.ndarray, frequency: np.ndarray, monetary: np.ndarray) -> np.ndarray:
+        """VIP = clúster KMeans (k=3) de mayor monto promedio sobre RFM logarítmico estandarizado"""
+        from sklearn.cluster import KMeans
+        
+        features = StandardScaler().fit_transform(np.column_stack([
+            np.log1p(recency), np.log1p(frequency), np.log1p(monetary)
+        ]))
+        n_clusters = min(3, len(features))
+        labels = KMeans(n_clusters=n_clusters, n_init=10, random_state=42).fit_predict(features)
+        cluster_monetary = np.array([monetary[labels == label].mean() for label in range(n_clusters)])
+        return labels == cluster_monetary.argmax()
+    
+    def run(self) -> Dict[str, Any]:
+        """Segmenta todos los clientes activos y guarda solo los cambios"""
+        rfm = self.load_rfm()
+        segments = self.score(rfm)
+        
+        changed = np.flatnonzero(segments != rfm['segments'])
+        now = timezone.now()
+        for start in range(0, len(changed), self.BATCH_SIZE):
+            batch = changed[start:start + self.BATCH_SIZE]
+            Client.objects.bulk_update(
+                [Client(id=int(rfm['ids'][i]), segment=segments[i], updated_at=now) for i in batch],
+                ['segment', 'updated_at']
+            )
+        
+        counts = {segment: int((segments == segment).sum()) for segment in ('vip', 'regular', 'new')}
+        
+        ml_model, _ = MLModel.objects.get_or_create(
+            name=self.MODEL_NAME,
+            model_type='customer_segmentation',
+            defaults={'model_file': ''}
+        )
+        ml_model.training_data_size = len(rfm['ids'])
+        ml_model.training_date = now
+        ml_model.features_used = ['recency_days', 'frequency', 'monetary']
+        ml_model.hyperparameters = {
+            'method': self.method,
+            'vip_min_score': self.VIP_MIN_SCORE,
+            'new_client_days': self.NEW_CLIENT_DAYS
+        }
+        ml_model.save()
+        
+        return {
+            'success': True,
+            'clients': len(rfm['ids']),
+            'changed': len(changed),
+            'segments': counts
+        }
+
+
+class ChurnPredictionService:
+    """
+    Riesgo de abandono de clientes (tipo de modelo churn_prediction)
+    
+    Recorre las ventas completadas ordenadas por cliente en lotes
+    (`iterator(chunk_size=...)`) y procesa cada bloque de clientes completos
+    apenas termina de leerlo, así que la memoria depende del tamaño del lote y
+    no de la cantidad de ventas o clientes. Primera pasada: deriva los
+    intervalos entre compras con numpy y arma una muestra de entrenamiento con
+    un corte histórico (features hasta hace HORIZON_DAYS y etiqueta "no volvió a
+    comprar desde entonces") para una regresión logística. Segunda pasada:
+    puntúa cada bloque con las features de hoy y lo guarda en ClientChurnScore.
+    """
+    
+    MODEL_NAME = 'Churn Prediction Model'
+    FEATURE_NAMES = [
+        'log_recency_days', 'log_purchase_count', 'log_avg_interval_days',
+        'interval_cv', 'recency_interval_ratio', 'log_tenure_days'
+    ]
+    
+    # Días sin comprar después del corte para considerar que el cliente abandonó
+    HORIZON_DAYS = 90
+    # Clientes mínimos (con ambas clases) para entrenar; si no, se usa la heurística
+    MIN_TRAINING_CLIENTS = 20
+    # Clientes de la muestra aleatoria con que se entrena y se estima el intervalo típico
+    SAMPLE_SIZE = 100000
+    # Umbrales de riesgo para los niveles medio y alto
+    RISK_LEVELS = ((0.7, 'high'), (0.4, 'medium'))
+    # Filas por lote al leer ventas y al escribir puntajes
+    CHUNK_SIZE = 10000
+    BATCH_SIZE = 1000
+    
+    def __init__(self, horizon_days: Optional[int] = None):
+        self.horizon_days = horizon_days or self.HORIZON_DAYS
+    
+    def purchase_chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (cliente, día) de las ventas completadas, por bloques de clientes completos
+        
+        Cada bloque tiene al menos CHUNK_SIZE ventas (salvo el último) y nunca
+        parte las compras de un cliente; van ordenadas por cliente y fecha.
+        """
+        rows = Sale.objects.filter(
+            status='completed',
+            is_active=True,
+            client__is_active=True
+        ).order_by('client_id', 'created_at').values_list('client_id', 'created_at')
+        
+        client_ids, days = [], []
+        for client_id, created_at in rows.iterator(chunk_size=self.CHUNK_SIZE):
+            if len(client_ids) >= self.CHUNK_SIZE and client_id != client_ids[-1]:
+                yield np.array(client_ids, dtype=np.int64), np.array(days, dtype=np.float64)
+                client_ids, days = [], []
+            client_ids.append(client_id)
+            days.append(created_at.timestamp() / 86400)
+        if client_ids:
+            yield np.array(client_ids, dtype=np.int64), np.array(days, dtype=np.float64)
+    
+    @staticmethod
+    def interval_features(client_ids: np.ndarray, days: np.ndarray, reference: float) -> Dict[str, np.ndarray]:
+        """
+        Estadísticas de intervalos entre compras por cliente, vectorizadas
+        
+        Espera las compras ordenadas por cliente y fecha; `reference` es el día
+        (época en días) respecto al que se mide la recencia.
+        """
+        ids, start, counts = np.unique(client_ids, return_index=True, return_counts=True)
+        last = days[start + counts - 1]
+        
+        # Intervalos entre compras consecutivas del mismo cliente
+        same_client = client_ids[1:] == client_ids[:-1]
+        gaps = np.diff(days)[same_client]
+        gap_owner = np.searchsorted(ids, client_ids[1:][same_client])
+        n_gaps = counts - 1
+        gap_sum = np.bincount(gap_owner, weights=gaps, minlength=len(ids))
+        gap_sq_sum = np.bincount(gap_owner, weights=gaps ** 2, minlength=len(ids))
+        
+        has_gaps = n_gaps > 0
+        avg_interval = np.full(len(ids), np.nan)
+        avg_interval[has_gaps] = gap_sum[has_gaps] / n_gaps[has_gaps]
+        std_interval = np.zeros(len(ids))
+        std_interval[has_gaps] = np.sqrt(np.maximum(
+            gap_sq_sum[has_gaps] / n_gaps[has_gaps] - avg_interval[has_gaps] ** 2, 0
+        ))
+        
+        return {
+            'ids': ids,
+            'purchase_count': counts,
+            'recency_days': np.maximum(reference - last, 0),
+            'tenure_days': np.maximum(reference - days[start], 0),
+            'avg_interval_days': avg_interval,
+            'std_interval_days': std_interval
+        }
+    
+    def typical_interval(self, avg_interval: np.ndarray) -> float:
+        """Intervalo mediano de los clientes con más de una compra"""
+        known = avg_interval[~np.isnan(avg_interval)]
+        return float(np.median(known)) if len(known) else float(self.horizon_days)
+    
+    @staticmethod
+    def feature_matrix(stats: Dict[str, np.ndarray], typical: float) -> np.ndarray:
+        """Matriz de features; los clientes de una sola compra usan el intervalo típico"""
+        avg_interval = stats['avg_interval_days']
+        known = ~np.isnan(avg_interval)
+        interval = np.maximum(np.where(known, avg_interval, typical), 1.0)
+        
+        return np.column_stack([
+            np.log1p(stats['recency_days']),
+            np.log1p(stats['purchase_count']),
+            np.log1p(interval),
+            np.where(known, stats['std_interval_days'] / interval, 0.0),
+            np.minimum(stats['recency_days'] / interval, 10.0),
+            np.log1p(stats['tenure_days'])
+        ])
+    
+    def _sample(self, sample: Optional[Dict[str, np.ndarray]], rows: Dict[str, np.ndarray], rng) -> Dict[str, np.ndarray]:
+        """
+        Muestra aleatoria uniforme de hasta SAMPLE_SIZE filas (claves aleatorias)
+        
+        Cada fila recibe una clave al azar y se conservan las de clave menor, así
+        la muestra no depende de cómo se partieron los bloques.
+        """
+        rows = {**rows, 'key': rng.random(len(next(iter(rows.values()))))}
+        if sample is not None:
+            rows = {name: np.concatenate([sample[name], values]) for name, values in rows.items()}
+        if len(rows['key']) > self.SAMPLE_SIZE:
+            keep = np.argpartition(rows['key'], self.SAMPLE_SIZE)[:self.SAMPLE_SIZE]
+            rows = {name: values[keep] for name, values in rows.items()}
+        return rows
+    
+    def collect(self, now: float) -> Tuple[Optional[Dict[str, np.ndarray]], Optional[np.ndarray], int]:
+        """
+        Primera pasada: muestra de entrenamiento al corte y de intervalos actuales
+        
+        Returns:
+            (muestra con las estadísticas al corte y la etiqueta, muestra de
+            intervalos promedio de hoy, clientes con compras)
+        """
+        rng = np.random.default_rng(0)
+        cutoff = now - self.horizon_days
+        training, intervals, clients = None, None, 0
+        
+        for client_ids, days in self.purchase_chunks():
+            current = self.interval_features(client_ids, days, now)
+            clients += len(current['ids'])
+            intervals = self._sample(intervals, {'avg_interval_days': current['avg_interval_days']}, rng)
+            
+            before = days < cutoff
+            if before.any():
+                stats = self.interval_features(client_ids[before], days[before], cutoff)
+                returned = np.isin(stats['ids'], np.unique(client_ids[~before]))
+                training = self._sample(training, {**stats, 'label': (~returned).astype(np.int64)}, rng)
+        
+        return training, None if intervals is None else intervals['avg_interval_days'], clients
+    
+    def train(self, training: Optional[Dict[str, np.ndarray]]) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Entrena con la muestra al corte `now - horizon_days`
+        
+        Returns:
+            (pipeline o None si no hay datos suficientes, métricas)
+        """
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+        
+        if training is None:
+            return None, {'training_clients': 0}
+        
+        # Orden estable (por cliente) para que la validación cruzada sea reproducible
+        order = np.argsort(training['ids'])
+        stats = {name: values[order] for name, values in training.items()}
+        labels = stats['label']
+        metrics = {'training_clients': len(labels), 'churn_rate': float(labels.mean())}
+        
+        if len(labels) < self.MIN_TRAINING_CLIENTS or len(np.unique(labels)) < 2:
+            return None, metrics
+        
+        X = self.feature_matrix(stats, self.typical_interval(stats['avg_interval_days']))
+        pipeline = make_pipeline(StandardScaler(), LogisticRegression(class_weight='balanced', max_iter=1000))
+        
+        folds = min(5, int(np.bincount(labels).min()))
+        if folds >= 2:
+            metrics['roc_auc'] = float(cross_val_score(pipeline, X, labels, cv=folds, scoring='roc_auc').mean())
+        pipeline.fit(X, labels)
+        return pipeline, metrics
+    
+    def risk_levels(self, risk: np.ndarray) -> np.ndarray:
+        """Nivel (low/medium/high) para cada riesgo"""
+        levels = np.full(len(risk), 'low', dtype=object)
+        for threshold, level in reversed(self.RISK_LEVELS):
+            levels[risk >= threshold] = level
+        return levels
+    
+    def score(self, stats: Dict[str, np.ndarray], pipeline, typical: float) -> np.ndarray:
+        """Riesgo de abandono de un bloque de clientes"""
+        features = self.feature_matrix(stats, typical)
+        if pipeline is not None:
+            return pipeline.predict_proba(features)[:, 1]
+        # Heurística: probabilidad de no haber comprado aún si el cliente
+        # siguiera comprando a su ritmo habitual (proceso de Poisson)
+        return 1 - np.exp(-features[:, 4])
+    
+    def run(self) -> Dict[str, Any]:
+        """Entrena, puntúa a todos los clientes con compras y guarda los puntajes por bloques"""
+        scored_at = timezone.now()
+        now = scored_at.timestamp() / 86400
+        
+        training, intervals, clients = self.collect(now)
+        if not clients:
+            ClientChurnScore.objects.all().delete()
+            return {'success': True, 'clients': 0, 'method': None, 'levels': {}}
+        
+        pipeline, metrics = self.train(training)
+        method = 'logistic_regression' if pipeline is not None else 'interval_heuristic'
+        typical = self.typical_interval(intervals)
+        
+        level_counts = {'high': 0, 'medium': 0, 'low': 0}
+        scored = 0
+        with transaction.atomic():
+            for client_ids, days in self.purchase_chunks():
+                stats = self.interval_features(client_ids, days, now)
+                risk = self.score(stats, pipeline, typical)
+                levels = self.risk_levels(risk)
+                for level in level_counts:
+                    level_counts[level] += int((levels == level).sum())
+                scored += len(stats['ids'])
+                
+                ClientChurnScore.objects.bulk_create(
+                    [
+                        ClientChurnScore(
+                            client_id=int(stats['ids'][i]),
+                            churn_risk=round(float(risk[i]), 4),
+                            risk_level=levels[i],
+                            purchase_count=int(stats['purchase_count'][i]),
+                            days_since_last_purchase=int(stats['recency_days'][i]),
+                            avg_interval_days=None if np.isnan(stats['avg_interval_days'][i]) else round(float(stats['avg_interval_days'][i]), 2),
+                            scored_at=scored_at
+                        )
+                        for i in range(len(stats['ids']))
+                    ],
+                    batch_size=self.BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['client'],
+                    update_fields=[
+                        'churn_risk', 'risk_level', 'purchase_count', 'days_since_last_purchase',
+                        'avg_interval_days', 'scored_at', 'updated_at'
+                    ]
+                )
+            # Clientes que ya no tienen compras válidas (o se desactivaron)
+            ClientChurnScore.objects.exclude(scored_at=scored_at).delete()
+        
+        ml_model, _ = MLModel.objects.get_or_create(
+            name=self.MODEL_NAME,
+            model_type='churn_prediction',
+            defaults={'model_file': ''}
+        )
+        ml_model.training_data_size = metrics['training_clients']
+        ml_model.accuracy = metrics.get('roc_auc')
+        ml_model.training_date = scored_at
+        ml_model.features_used = self.FEATURE_NAMES
+        ml_model.hyperparameters = {
+            'method': method,
+            'horizon_days': self.horizon_days,
+            'risk_levels': {level: threshold for threshold, level in self.RISK_LEVELS},
+            'churn_rate': metrics.get('churn_rate')
+        }
+        if pipeline is not None:
+            ml_model.hyperparameters['coefficients'] = dict(zip(
+                self.FEATURE_NAMES,
+                [round(float(c), 4) for c in pipeline[-1].coef_[0]]
+            ))
+        ml_model.save()
+        
+        return {
+            'success': True,
+            'clients': scored,
+            'method': method,
+            'roc_auc': metrics.get('roc_auc'),
+            'levels': level_counts
+        }
+
+
 class MLModelService:
     """Servicio general para gestión de modelos ML"""
     
+    # Tipo de modelo -> servicio que lo entrena (los demás tipos se generan con
+    # sus propios comandos, p. ej. forecast_demand)
+    TRAINERS = {
+        'sales_forecast': SalesForecastService,
+    }
+    # Igual al máximo de intentos por defecto de los eventos del outbox
+    MAX_TRAINING_ATTEMPTS = 5
+    
+    @staticmethod
+    def submit_training(
+        model: MLModel,
+        training_type: str = 'retrain',
+        use_synthetic: bool = False,
+        search: Optional[bool] = None,
+        time_budget_seconds: Optional[int] = None
+    ) -> ModelTrainingLog:
+        """
+        Encola un entrenamiento para que lo ejecute el worker
+        
+        El estado del trabajo se consulta en el ModelTrainingLog retornado.
+        Lanza ValueError si el tipo de modelo no se entrena con este servicio.
+        """
+        if model.model_type not in MLModelService.TRAINERS:
+            raise ValueError(f"El tipo de modelo '{model.model_type}' no se puede entrenar desde este servicio")
+        if search is None:
+            search = getattr(settings, 'ML_HYPERPARAMETER_SEARCH', True)
+        if time_budget_seconds:
+            time_budget_seconds = int(time_budget_seconds)
+        with transaction.atomic():
+            training_log = ModelTrainingLog.objects.create(
+                model=model,
+                training_type=training_type,
+                status='started',
+                training_data_size=0,
+                accuracy_before=model.accuracy,
+                parameters_used={
+                    'use_synthetic': use_synthetic,
+                    'search': search,
+                    'time_budget_seconds': time_budget_seconds
+                }
+            )
+            OutboxService.enqueue('ml_model_training', {'training_log_id': training_log.id})
+        
+        return training_log
+    
+    @staticmethod
+    def run_training(training_log_id: int, retry_transient: bool = True) -> Dict[str, Any]:
+        """
+        Ejecuta un entrenamiento registrado y actualiza su log
+        
+        Ante una falla transitoria, con `retry_transient` el log vuelve a
+        'started' y se relanza la excepción para que el outbox reintente con
+        backoff; al agotar MAX_TRAINING_ATTEMPTS (o sin `retry_transient`) el
+        entrenamiento queda como fallido.
+        """
+        training_log = ModelTrainingLog.objects.select_related('model').get(id=training_log_id)
+        if training_log.status in ('completed', 'failed'):
+            return {'success': training_log.status == 'completed', 'message': 'Entrenamiento ya procesado'}
+        
+        model = training_log.model
+        trainer = MLModelService.TRAINERS.get(model.model_type)
+        if trainer is None:
+            training_log.status = 'failed'
+            training_log.error_message = f"El tipo de modelo '{model.model_type}' no se puede entrenar desde este servicio"
+            training_log.save()
+            return {'success': False, 'error': training_log.error_message}
+        
+        use_synthetic = training_log.parameters_used.get('use_synthetic', False)
+        search = training_log.parameters_used.get('search', False)
+        time_budget_seconds = training_log.parameters_used.get('time_budget_seconds')
+        attempts = training_log.parameters_used.get('attempts', 0) + 1
+        started_at = timezone.now()
+        
+        service = trainer(hyperparameters=model.hyperparameters)
+        training_log.status = 'processing'
+        training_log.parameters_used = {
+            **training_log.parameters_used,
+            'attempts': attempts,
+            'n_jobs': service.n_jobs,
+            'hyperparameters': model.hyperparameters
+        }
+        training_log.save(update_fields=['status', 'parameters_used', 'updated_at'])
+        
+        try:
+            if not use_synthetic:
+                # El worker es quien materializa el feature store (los requests solo leen)
+                DailyFeatureStore.materialize()
+            result = service.train_model(
+                use_synthetic=use_synthetic,
+                search=search,
+                time_budget_seconds=time_budget_seconds
+            )
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'transient': isinstance(e, TRANSIENT_ERRORS)}
+        
+        training_log.training_duration = timezone.now() - started_at
+        
+        if not result['success']:
+            if result.get('transient') and retry_transient and attempts < MLModelService.MAX_TRAINING_ATTEMPTS:
+                training_log.status = 'started'
+                training_log.error_message = f"Intento {attempts} falló, se reintentará: {result['error']}"
+                training_log.save()
+                raise RuntimeError(f"Falla transitoria entrenando el modelo {model.id}: {result['error']}")
+            
+            training_log.status = 'failed'
+            training_log.error_message = result['error']
+            training_log.save()
+            
+            return {'success': False, 'error': result['error']}
+        
+        # Actualizar modelo (recargado: _save_model acaba de registrar el nuevo archivo)
+        model.refresh_from_db()
+        model.accuracy = result['r2_score']
+        model.r2_score = result['r2_score']
+        model.mae = result['mae']
+        model.rmse = result['rmse']
+        model.training_data_size = result['training_data_size']
+        model.last_retrain = timezone.now()
+        model.save()
+        
+        # Invalidar pronósticos guardados con la versión anterior
+        trainer.invalidate_forecasts(model.id)
+        
+        # Actualizar log
+        training_log.status = 'completed'
+        training_log.accuracy_after = result['r2_score']
+        training_log.training_data_size = result['training_data_size']
+        training_log.parameters_used = {
+            **training_log.parameters_used,
+            'hyperparameters': result['hyperparameters'],
+            'search': result['search']
+        }
+        training_log.save()
+        
+        # Guardar importancia de features
+        for i, feature_data in enumerate(result['feature_importance']):
+            FeatureImportance.objects.update_or_create(
+                model=model,
+                feature_name=feature_data['feature'],
+                defaults={
+                    'importance_score': feature_data['importance'],
+                    'rank': i + 1
+                }
+            )
+        
+        return {'success': True, 'message': 'Modelo reentrenado exitosamente', 'result': result}
+    
     @staticmethod
     def retrain_model(model_id: str, force: bool = False) -> Dict[str, Any]:
-        """Reentrena un modelo específico"""
+        """Reentrena un modelo específico de forma síncrona (comandos y worker)"""
         try:
             model = MLModel.objects.get(id=model_id)
             
@@ -421,45 +2014,13 @@ class MLModelService:
                 model=model,
                 training_type='retrain',
                 status='started',
-                training_data_size=0
+                training_data_size=0,
+                accuracy_before=model.accuracy
             )
             
-            # Ejecutar reentrenamiento
-            service = SalesForecastService()
-            result = service.train_model()
-            
-            if result['success']:
-                # Actualizar modelo
-                model.accuracy = result['r2_score']
-                model.r2_score = result['r2_score']
-                model.mae = result['mae']
-                model.rmse = result['rmse']
-                model.last_retrain = timezone.now()
-                model.save()
-                
-                # Actualizar log
-                training_log.status = 'completed'
-                training_log.accuracy_after = result['r2_score']
-                training_log.save()
-                
-                # Guardar importancia de features
-                for i, feature_data in enumerate(result['feature_importance']):
-                    FeatureImportance.objects.update_or_create(
-                        model=model,
-                        feature_name=feature_data['feature'],
-                        defaults={
-                            'importance_score': feature_data['importance'],
-                            'rank': i + 1
-                        }
-                    )
-                
-                return {'success': True, 'message': 'Modelo reentrenado exitosamente'}
-            else:
-                training_log.status = 'failed'
-                training_log.error_message = result['error']
-                training_log.save()
-                
-                return {'success': False, 'error': result['error']}
+            result = MLModelService.run_training(training_log.id, retry_transient=False)
+            result.pop('result', None)
+            return result
                 
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -499,3 +2060,16 @@ class MLModelService:
             
         except Exception as e:
             return {'error': str(e)}
+
+
+def handle_ml_model_training(payload: Dict[str, Any]):
+    """Handler del outbox: ejecuta un entrenamiento encolado (las fallas transitorias se relanzan)"""
+    MLModelService.run_training(payload['training_log_id'])
+
+
+def handle_recommender_update(payload: Dict[str, Any]):
+    """Handler del outbox: sincroniza el recomendador con las ventas modificadas o eliminadas"""
+    RecommendationService().update(
+        full=payload.get('full', False),
+        removed_sale_ids=payload.get('removed_sale_ids')
+    )
@@ -0,0 +1,46 @@
+"""
+Señales de ML: mantienen el recomendador y el detector de anomalías al día con
+las ventas nuevas vía outbox
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from apps.core.outbox import OutboxService
+from apps.sales.models import Sale
+from .services import RecommendationService
+
+
+@receiver(post_save, sender=Sale)
+def schedule_recommender_update(sender, instance, created, **kwargs):
+    """Encola (una vez) la actualización incremental del recomendador"""
+    # Una venta existente puede entrar (se completa) o salir (se cancela) del índice
+    if instance.status == 'completed' or not created:
+        RecommendationService.schedule_update()
+
+
+@receiver(post_delete, sender=Sale)
+def remove_sale_from_recommender(sender, instance, **kwargs):
+    """Las ventas eliminadas se restan del índice (sus ítems ya no existen)"""
+    OutboxService.enqueue('recommender_update', {'removed_sale_ids': [str(instance.id)]})
+
+
+@receiver(pre_save, sender=Sale)
+def remember_previous_status(sender, instance, **kwargs):
+    """Guarda el estado anterior para detectar cuándo una venta pasa a completada"""
+    if instance._state.adding:
+        instance._previous_status = None
+    else:
+        instance._previous_status = Sale.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Sale)
+def observe_sale_for_anomalies(sender, instance, created, **kwargs):
+    """Encola la venta que se completa para el detector de anomalías (por hora y por día)"""
+    if instance.status != 'completed' or getattr(instance, '_previous_status', None) == 'completed':
+        return
+    OutboxService.enqueue('sales_anomaly_observe', {
+        'sale_id': str(instance.id),
+        'created_at': instance.created_at.isoformat(),
+        # Las que se completan después cuentan en el período en que se completaron
+        'completed_at': (instance.created_at if created else instance.updated_at).isoformat(),
+        'total': str(instance.total)
+    })
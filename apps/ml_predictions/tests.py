@@ -0,0 +1,801 @@
+"""
+Pruebas del detector de anomalías, del pronóstico guardado y de las vistas de predicción
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from apps.clients.models import Client
+from apps.core.models import OutboxEvent
+from apps.products.models import Category, PriceHistory, Product
+from apps.sales.models import Sale, SaleItem, SalesDailyRollup
+from .anomalies import SalesAnomalyDetector, handle_sales_anomaly_observe
+from .estimators import build_estimator, candidate_grid, evaluate_candidate, resolve_hyperparameters
+from .features import DailyFeatureStore
+from .models import (
+    ClientChurnScore, DailyFeatures, MLModel, ModelTrainingLog, Prediction, RecommenderBasket, SalesAnomalyObservation, SalesAnomalyState
+)
+from .recommender import ItemRecommender
+from .registry import ModelRegistry
+from .services import (
+    ChurnPredictionService, CustomerSegmentationService, DemandForecastService, MLModelService,
+    PriceElasticityService, RecommendationService, SalesForecastService, _forecast_demand_chunk
+)
+
+
+class SalesAnomalyObserveTests(TestCase):
+    """Cada venta se incorpora una sola vez aunque el outbox repita el evento"""
+
+    def setUp(self):
+        self.detector = SalesAnomalyDetector()
+        self.now = timezone.now()
+
+    def test_repeated_sale_is_observed_once(self):
+        sale_id = str(uuid.uuid4())
+
+        self.detector.observe(self.now, 100.0, sale_id=sale_id)
+        self.detector.observe(self.now, 100.0, sale_id=sale_id)
+
+        self.assertEqual(SalesAnomalyObservation.objects.filter(sale_id=sale_id).count(), 1)
+        for state in SalesAnomalyState.objects.all():
+            self.assertEqual(state.bucket_transactions, 1)
+            self.assertEqual(state.bucket_revenue, 100.0)
+
+    def test_replayed_outbox_event_is_deduplicated(self):
+        payload = {
+            'sale_id': str(uuid.uuid4()),
+            'created_at': self.now.isoformat(),
+            'completed_at': self.now.isoformat(),
+            'total': '80.00'
+        }
+
+        handle_sales_anomaly_observe(payload)
+        handle_sales_anomaly_observe(payload)
+
+        state = SalesAnomalyState.objects.get(granularity='day')
+        self.assertEqual(state.bucket_transactions, 1)
+        self.assertEqual(state.bucket_revenue, 80.0)
+
+    def test_distinct_sales_are_added(self):
+        self.detector.observe(self.now, 100.0, sale_id=str(uuid.uuid4()))
+        self.detector.observe(self.now, 50.0, sale_id=str(uuid.uuid4()))
+
+        state = SalesAnomalyState.objects.get(granularity='day')
+        self.assertEqual(state.bucket_transactions, 2)
+        self.assertEqual(state.bucket_revenue, 150.0)
+
+    def test_late_sale_does_not_reopen_closed_period(self):
+        self.detector.observe(self.now, 100.0, sale_id=str(uuid.uuid4()))
+
+        with self.assertLogs('apps.ml_predictions.anomalies', level='WARNING'):
+            self.detector.observe(self.now - timedelta(days=2), 30.0, sale_id=str(uuid.uuid4()))
+
+        state = SalesAnomalyState.objects.get(granularity='day')
+        self.assertEqual(state.bucket_start, self.detector.bucket_start(self.now, 'day'))
+        self.assertEqual(state.bucket_transactions, 1)
+
+
+class HistoricalDataViewTests(APITestCase):
+    """Serie histórica agrupada desde el resumen diario"""
+
+    url = '/api/v1/ml/predictions/historical_data/'
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username='ml', email='ml@example.com', password='secreto')
+        self.client.force_authenticate(user)
+        self.today = timezone.localdate()
+        for days, revenue in ((0, '100.00'), (1, '50.00')):
+            SalesDailyRollup.objects.create(
+                date=self.today - timedelta(days=days), revenue=Decimal(revenue), transaction_count=2
+            )
+
+    def test_groups_by_month(self):
+        response = self.client.get(self.url, {'days_back': 1, 'group_by': 'month'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(row['total_sales'] for row in response.data['data']), 150.0)
+        self.assertEqual(sum(row['num_transactions'] for row in response.data['data']), 4)
+        self.assertEqual(response.data['data'][-1]['date'], self.today.replace(day=1).isoformat())
+
+    def test_days_without_sales_are_zero(self):
+        response = self.client.get(self.url, {'days_back': 3, 'group_by': 'day'})
+
+        self.assertEqual([row['total_sales'] for row in response.data['data']], [0.0, 0.0, 50.0, 100.0])
+
+    def test_invalid_group_by_is_rejected(self):
+        response = self.client.get(self.url, {'group_by': 'year'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+
+
+def fitted_forecast_service(n_estimators=3):
+    """Servicio de pronóstico con un bosque pequeño ajustado sobre datos aleatorios"""
+    columns = DailyFeatureStore.FEATURE_COLUMNS
+    rng = np.random.default_rng(0)
+    X, y = rng.random((40, len(columns))) * 1000, rng.random(40) * 100
+    ml_model = MLModel.objects.create(
+        name='Pronóstico', model_type='sales_forecast', model_file='sales_forecast_a.joblib'
+    )
+
+    service = SalesForecastService()
+    service.scaler = StandardScaler().fit(X)
+    service.model = RandomForestRegressor(n_estimators=n_estimators, random_state=0).fit(service.scaler.transform(X), y)
+    service.feature_names = columns
+    service.ml_model_id = ml_model.id
+    service.model_file = ml_model.model_file
+    return service
+
+
+class ForecastCacheTests(TestCase):
+    """Los pronósticos guardados dependen de los días cerrados y del archivo del modelo"""
+
+    def setUp(self):
+        self.service = fitted_forecast_service()
+
+    def test_sales_today_keep_the_stored_forecast(self):
+        self.assertFalse(self.service.get_forecast(3)['cached'])
+
+        SalesDailyRollup.objects.create(date=timezone.localdate(), revenue=Decimal('500.00'), transaction_count=5)
+
+        self.assertTrue(self.service.get_forecast(3)['cached'])
+
+    def test_new_model_file_recomputes(self):
+        self.service.get_forecast(3)
+
+        self.service.model_file = 'sales_forecast_b.joblib'
+
+        self.assertFalse(self.service.get_forecast(3)['cached'])
+        self.assertTrue(self.service.get_forecast(3)['cached'])
+
+
+class LegacyDailyFeaturesTests(SimpleTestCase):
+    """Features diarias del constructor anterior calculadas de forma vectorizada"""
+
+    def test_matches_day_by_day_definition(self):
+        daily = pd.DataFrame({
+            'date': [date(2025, 12, 20), date(2025, 12, 22), date(2025, 12, 25)],
+            'revenue': [70.0, 140.0, 300.0],
+            'transaction_count': [7, 14, 0],
+            'unique_clients': [5, 9, 0],
+        })
+
+        df = SalesForecastService().build_daily_features(daily, date(2025, 12, 24), date(2025, 12, 29))
+
+        self.assertEqual(list(df['date']), [date(2025, 12, 24) + timedelta(days=i) for i in range(6)])
+        # Ventas de los 7 días previos, sin incluir el propio día; los días sin ventas cuentan cero
+        self.assertEqual(list(df['week_sales']), [210.0, 210.0, 510.0, 510.0, 440.0, 440.0])
+        self.assertEqual(list(df['total_sales']), [0.0, 300.0, 0.0, 0.0, 0.0, 0.0])
+        # Sin transacciones el ticket promedio es cero (no NaN)
+        self.assertEqual(df['avg_transaction'].iloc[1], 0)
+        self.assertEqual(list(df['is_holiday']), [0, 1, 0, 0, 0, 0])
+        self.assertEqual(set(df['season']), {0})
+        self.assertEqual(list(df['is_weekend']), [0, 0, 0, 1, 1, 0])
+        self.assertEqual(df.columns.tolist()[0], 'date')
+        self.assertTrue(set(SalesForecastService.LEGACY_FEATURE_COLUMNS) <= set(df.columns))
+
+
+class ModelRegistryTests(TestCase):
+    """El modelo activo se carga una vez por proceso y se recarga solo si cambia"""
+
+    def setUp(self):
+        self.model_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_path, ignore_errors=True)
+        self.registry = ModelRegistry(model_path=self.model_path)
+        self.ml_model = MLModel.objects.create(
+            name='Pronóstico', model_type='sales_forecast', model_file=self.write('sales_forecast_a.joblib', 1)
+        )
+        self.write('scaler_a.joblib', StandardScaler())
+
+    def write(self, filename, value):
+        joblib.dump(value, os.path.join(self.model_path, filename))
+        return filename
+
+    def test_repeated_get_reuses_loaded_model(self):
+        first = self.registry.get('sales_forecast')
+
+        with self.assertNumQueries(1):
+            second = self.registry.get('sales_forecast')
+
+        self.assertIs(first, second)
+        self.assertEqual(first.model_file, 'sales_forecast_a.joblib')
+        self.assertIsInstance(first.scaler, StandardScaler)
+
+    def test_new_model_file_is_loaded(self):
+        self.registry.get('sales_forecast')
+        self.ml_model.model_file = self.write('sales_forecast_b.joblib', 2)
+        self.ml_model.save()
+
+        entry = self.registry.get('sales_forecast')
+
+        self.assertEqual(entry.model, 2)
+        self.assertIsNone(entry.scaler)
+
+    def test_missing_file_returns_none(self):
+        os.remove(os.path.join(self.model_path, 'sales_forecast_a.joblib'))
+
+        self.assertIsNone(self.registry.get('sales_forecast'))
+
+
+class HorizonPredictionTests(TestCase):
+    """Horizonte pronosticado en bloque con intervalo de los árboles del bosque"""
+
+    def setUp(self):
+        self.service = fitted_forecast_service(n_estimators=10)
+
+    def test_interval_comes_from_the_trees(self):
+        X = self.service.scaler.transform(np.random.default_rng(1).random((5, len(self.service.feature_names))) * 1000)
+
+        prediction, lower, upper = self.service._predict_with_interval(X)
+
+        np.testing.assert_allclose(prediction, self.service.model.predict(X))
+        self.assertTrue(np.all(lower <= prediction))
+        self.assertTrue(np.all(prediction <= upper))
+
+    def test_predicts_every_day_of_the_horizon(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+
+        predictions = self.service.predict_sales(days_ahead=10)
+
+        self.assertEqual([p['date'] for p in predictions], [tomorrow + timedelta(days=i) for i in range(10)])
+        for p in predictions:
+            self.assertLessEqual(p['confidence_lower'], p['predicted_sales'])
+            self.assertLessEqual(p['predicted_sales'], p['confidence_upper'])
+            self.assertEqual(p['is_weekend'], p['date'].weekday() >= 5)
+
+    def test_non_positive_horizon_is_empty(self):
+        self.assertEqual(self.service.predict_sales(days_ahead=0), [])
+
+
+class TrainingJobTests(TestCase):
+    """Entrenamientos encolados: reintento de fallas transitorias y fallas definitivas"""
+
+    def setUp(self):
+        self.ml_model = MLModel.objects.create(
+            name='Pronóstico', model_type='sales_forecast', model_file='sales_forecast_a.joblib'
+        )
+
+    def submit(self):
+        return MLModelService.submit_training(self.ml_model, use_synthetic=True, search=False)
+
+    def test_submit_queues_the_training(self):
+        training_log = self.submit()
+
+        self.assertEqual(training_log.status, 'started')
+        event = OutboxEvent.objects.get(event_type='ml_model_training')
+        self.assertEqual(event.payload, {'training_log_id': training_log.id})
+
+    def test_unsupported_model_type_is_rejected(self):
+        self.ml_model.model_type = 'customer_segmentation'
+
+        with self.assertRaises(ValueError):
+            MLModelService.submit_training(self.ml_model)
+
+    def test_transient_failure_is_retried(self):
+        training_log = self.submit()
+        failure = {'success': False, 'error': 'conexión perdida', 'transient': True}
+
+        with mock.patch.object(SalesForecastService, 'train_model', return_value=failure):
+            with self.assertRaises(RuntimeError):
+                MLModelService.run_training(training_log.id)
+
+        training_log.refresh_from_db()
+        self.assertEqual(training_log.status, 'started')
+        self.assertEqual(training_log.parameters_used['attempts'], 1)
+        self.assertIsNotNone(training_log.training_duration)
+
+    def test_transient_failure_fails_after_last_attempt(self):
+        training_log = self.submit()
+        failure = {'success': False, 'error': 'conexión perdida', 'transient': True}
+
+        with mock.patch.object(SalesForecastService, 'train_model', return_value=failure):
+            for _ in range(MLModelService.MAX_TRAINING_ATTEMPTS - 1):
+                with self.assertRaises(RuntimeError):
+                    MLModelService.run_training(training_log.id)
+            result = MLModelService.run_training(training_log.id)
+
+        training_log.refresh_from_db()
+        self.assertFalse(result['success'])
+        self.assertEqual(training_log.status, 'failed')
+        self.assertEqual(training_log.parameters_used['attempts'], MLModelService.MAX_TRAINING_ATTEMPTS)
+
+    def test_other_failures_are_not_retried(self):
+        training_log = self.submit()
+
+        with mock.patch.object(SalesForecastService, 'train_model', side_effect=ValueError('sin datos')):
+            result = MLModelService.run_training(training_log.id)
+
+        training_log.refresh_from_db()
+        self.assertFalse(result['success'])
+        self.assertEqual(training_log.status, 'failed')
+        self.assertEqual(training_log.error_message, 'sin datos')
+
+
+def create_products(count, **fields):
+    """Productos de prueba con SKU distinto en una misma categoría"""
+    category = Category.objects.create(name='General')
+    return [
+        Product.objects.create(
+            name=f'Producto {i}', description='', sku=f'SKU-{i}', price=Decimal('10.00'),
+            cost=Decimal('6.00'), category=category, **fields
+        )
+        for i in range(count)
+    ]
+
+
+def create_sale(client_record, items, days_ago=0):
+    """Venta completada con (producto, cantidad[, precio]) y fecha `days_ago` días atrás"""
+    sale = Sale.objects.create(client=client_record, subtotal=0, total=0, status='completed')
+    for product, quantity, *price in items:
+        SaleItem.objects.create(sale=sale, product=product, quantity=quantity, price=price[0] if price else product.price)
+    if days_ago:
+        Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+    return sale
+
+
+class DemandForecastTests(TestCase):
+    """Pronóstico de demanda por SKU y punto de reorden"""
+
+    def test_constant_demand_is_forecast_flat(self):
+        forecast, sigma = _forecast_demand_chunk(np.full((2, 28), 3.0), first_weekday=0, horizon=5, alpha=0.1)
+
+        np.testing.assert_allclose(forecast, np.full((2, 5), 3.0))
+        np.testing.assert_allclose(sigma, [0.0, 0.0])
+
+    def test_weekday_pattern_is_kept(self):
+        # Solo se vende los lunes (el primer día es lunes)
+        quantities = np.zeros((1, 28))
+        quantities[0, ::7] = 7.0
+
+        forecast, _ = _forecast_demand_chunk(quantities, first_weekday=0, horizon=7, alpha=0.1)
+
+        self.assertGreater(forecast[0, 0], 0)
+        np.testing.assert_allclose(forecast[0, 1:], 0)
+
+    def test_chunks_match_a_single_block(self):
+        quantities = np.random.default_rng(0).poisson(4, (5, 60)).astype(float)
+        service = DemandForecastService(horizon=10)
+        service.n_jobs = 1
+        whole = service.forecast(quantities, first_weekday=3)
+
+        service.CHUNK_SIZE = 2
+        chunked = service.forecast(quantities, first_weekday=3)
+
+        np.testing.assert_allclose(whole[0], chunked[0])
+        np.testing.assert_allclose(whole[1], chunked[1])
+
+    def test_reorder_point_is_clipped_to_stock_limits(self):
+        service = DemandForecastService(horizon=10, lead_time_days=5)
+        products = pd.DataFrame({'min_stock': [20, 0], 'max_stock': [100, 8], 'stock': [30, 2]})
+
+        results = service.reorder_points(np.full((2, 10), 1.0), np.zeros(2), products)
+
+        self.assertEqual(results['reorder_point'].tolist(), [20, 5])
+        self.assertEqual(results['needs_reorder'].tolist(), [False, True])
+        self.assertEqual(results['suggested_order_qty'].tolist(), [0, 6])
+
+    def test_run_stores_one_prediction_per_active_product(self):
+        sold, unsold, inactive = create_products(3, stock=1, min_stock=0, max_stock=50)
+        Product.objects.filter(pk=inactive.pk).update(is_active=False)
+        client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+        for days_ago in range(10):
+            create_sale(client_record, [(sold, 2)], days_ago=days_ago)
+
+        result = DemandForecastService(days_back=10, horizon=7).run()
+
+        self.assertEqual(result['products'], 2)
+        self.assertEqual(result['data_points'], 10)
+        forecasts = {
+            row['product_id']: row
+            for row in Prediction.objects.filter(category='demand_forecast').values_list('prediction_result', flat=True)
+        }
+        self.assertEqual(set(forecasts), {sold.id, unsold.id})
+        self.assertAlmostEqual(forecasts[sold.id]['horizon_demand'], 14.0)
+        self.assertTrue(forecasts[sold.id]['needs_reorder'])
+        self.assertEqual(forecasts[unsold.id]['horizon_demand'], 0)
+
+
+class ItemRecommenderTests(SimpleTestCase):
+    """Índice de co-ocurrencia actualizado de forma incremental"""
+
+    def test_recommends_products_bought_together(self):
+        recommender = ItemRecommender(top_k=5)
+        recommender.update([(1, 2), (1, 2), (1, 3), (4, 5)])
+
+        self.assertEqual([product_id for product_id, _ in recommender.recommend([1])], [2, 3])
+        self.assertEqual(recommender.recommend([99]), [])
+
+    def test_removing_a_basket_matches_a_rebuild(self):
+        baskets = [(1, 2), (1, 3), (2, 3), (1, 2, 4)]
+        incremental = ItemRecommender(top_k=5)
+        incremental.update(baskets)
+        incremental.update([], [(1, 2, 4)])
+
+        rebuilt = ItemRecommender(top_k=5)
+        rebuilt.update(baskets[:3])
+
+        for product_id in (1, 2, 3):
+            self.assertEqual(
+                [p for p, _ in incremental.recommend([product_id])],
+                [p for p, _ in rebuilt.recommend([product_id])]
+            )
+            np.testing.assert_allclose(
+                [score for _, score in incremental.recommend([product_id])],
+                [score for _, score in rebuilt.recommend([product_id])],
+                rtol=1e-6
+            )
+        self.assertEqual(incremental.basket_count, 3)
+
+
+class RecommendationServiceTests(TestCase):
+    """Sincronización del recomendador con las ventas y sus canastas registradas"""
+
+    def setUp(self):
+        self.model_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_path, ignore_errors=True)
+        self.products = create_products(4, stock=100)
+        self.client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+
+    def service(self):
+        service = RecommendationService()
+        service.model_path = self.model_path
+        service.settle_seconds = 0
+        return service
+
+    def load(self):
+        model_file = MLModel.objects.get(model_type='recommendation').model_file
+        return joblib.load(os.path.join(self.model_path, model_file))
+
+    def test_baskets_are_kept_out_of_the_artifact(self):
+        a, b, c, _ = self.products
+        create_sale(self.client_record, [(a, 1), (b, 1)])
+        create_sale(self.client_record, [(a, 1), (c, 1)])
+
+        result = self.service().update()
+
+        self.assertEqual(result['baskets'], 2)
+        self.assertEqual(RecommenderBasket.objects.count(), 2)
+        self.assertFalse(hasattr(self.load(), 'baskets'))
+
+    def test_deactivated_sale_is_removed_like_a_rebuild(self):
+        a, b, c, d = self.products
+        create_sale(self.client_record, [(a, 1), (b, 1)])
+        create_sale(self.client_record, [(a, 1), (c, 1)])
+        cancelled = create_sale(self.client_record, [(a, 1), (d, 1)])
+        self.service().update()
+
+        cancelled.is_active = False
+        cancelled.save()
+        result = self.service().update()
+        incremental = self.load()
+        self.service().update(full=True)
+        rebuilt = self.load()
+
+        self.assertEqual(result['removed'], 1)
+        self.assertEqual(RecommenderBasket.objects.count(), 2)
+        self.assertEqual(incremental.basket_count, rebuilt.basket_count)
+        self.assertEqual(incremental.recommend([a.id]), rebuilt.recommend([a.id]))
+        self.assertNotIn(d.id, [product_id for product_id, _ in incremental.recommend([a.id])])
+
+
+class CustomerSegmentationTests(TestCase):
+    """Segmentación RFM vectorizada que escribe solo los segmentos que cambian"""
+
+    def create_client(self, index, days_registered=365):
+        client_record = Client.objects.create(name=f'Cliente {index}', email=f'cliente{index}@example.com')
+        Client.objects.filter(pk=client_record.pk).update(created_at=timezone.now() - timedelta(days=days_registered))
+        return client_record
+
+    def test_quintile_scores_share_ties(self):
+        scores = CustomerSegmentationService.quintile_scores(np.array([1, 1, 1, 1, 10, 20, 30, 40, 50, 60]))
+
+        self.assertEqual(len(set(scores[:4])), 1)
+        self.assertEqual(scores[-1], 5)
+        self.assertEqual(CustomerSegmentationService.quintile_scores(np.array([1.0, 100.0]), reverse=True).tolist(), [4, 2])
+
+    def test_segments_and_idempotent_run(self):
+        product = create_products(1, stock=1000)[0]
+        clients = [self.create_client(i) for i in range(10)]
+        for i, client_record in enumerate(clients[:8]):
+            for _ in range(i + 1):
+                create_sale(client_record, [(product, 1)], days_ago=30 - 3 * i)
+        newcomer = self.create_client(10, days_registered=5)
+        create_sale(newcomer, [(product, 1)])
+        Sale.objects.update(total=Decimal('100.00'))
+        Sale.objects.filter(client=clients[7]).update(total=Decimal('500.00'))
+
+        result = CustomerSegmentationService().run()
+
+        segments = dict(Client.objects.values_list('id', 'segment'))
+        self.assertEqual(segments[clients[7].id], 'vip')
+        self.assertEqual(segments[clients[1].id], 'regular')
+        self.assertEqual(segments[clients[9].id], 'new')
+        self.assertEqual(segments[newcomer.id], 'new')
+        self.assertEqual(result['clients'], 11)
+
+        # Sin cambios en las ventas no se escribe nada
+        self.assertEqual(CustomerSegmentationService().run()['changed'], 0)
+
+    def test_invalid_method_is_rejected(self):
+        with self.assertRaises(ValueError):
+            CustomerSegmentationService(method='dbscan')
+
+
+class ChurnPredictionTests(TestCase):
+    """Riesgo de abandono calculado por bloques de clientes completos"""
+
+    def setUp(self):
+        self.product = create_products(1, stock=1000)[0]
+
+    def create_buyer(self, index, days_ago):
+        client_record = Client.objects.create(name=f'Cliente {index}', email=f'cliente{index}@example.com')
+        for days in days_ago:
+            create_sale(client_record, [(self.product, 1)], days_ago=days)
+        return client_record
+
+    def test_interval_features(self):
+        client_ids = np.array([1, 1, 1, 2])
+        days = np.array([10.0, 20.0, 40.0, 35.0])
+
+        stats = ChurnPredictionService.interval_features(client_ids, days, reference=50.0)
+
+        self.assertEqual(stats['ids'].tolist(), [1, 2])
+        self.assertEqual(stats['purchase_count'].tolist(), [3, 1])
+        self.assertEqual(stats['recency_days'].tolist(), [10.0, 15.0])
+        self.assertEqual(stats['tenure_days'].tolist(), [40.0, 15.0])
+        self.assertEqual(stats['avg_interval_days'][0], 15.0)
+        self.assertTrue(np.isnan(stats['avg_interval_days'][1]))
+        self.assertEqual(stats['std_interval_days'].tolist(), [5.0, 0.0])
+
+    def test_chunks_never_split_a_client(self):
+        for index in range(3):
+            self.create_buyer(index, days_ago=[30, 20, 10])
+        service = ChurnPredictionService()
+        service.CHUNK_SIZE = 2
+
+        chunks = [client_ids for client_ids, _ in service.purchase_chunks()]
+
+        self.assertEqual([len(client_ids) for client_ids in chunks], [3, 3, 3])
+        self.assertTrue(all(len(set(client_ids)) == 1 for client_ids in chunks))
+
+    def test_lapsed_client_scores_higher_than_regular_one(self):
+        regular = self.create_buyer(0, days_ago=[40, 30, 20, 10, 1])
+        lapsed = self.create_buyer(1, days_ago=[140, 130, 120, 110, 100])
+
+        result = ChurnPredictionService().run()
+
+        scores = {score.client_id: score for score in ClientChurnScore.objects.all()}
+        self.assertEqual(result['method'], 'interval_heuristic')
+        self.assertEqual(scores[lapsed.id].risk_level, 'high')
+        self.assertEqual(scores[regular.id].risk_level, 'low')
+        self.assertEqual(scores[lapsed.id].purchase_count, 5)
+        self.assertAlmostEqual(scores[lapsed.id].avg_interval_days, 10.0, places=1)
+
+    def test_scores_do_not_depend_on_chunk_size(self):
+        for index in range(6):
+            self.create_buyer(index, days_ago=[5 * index + 50, 5 * index + 25, 5 * index])
+        ChurnPredictionService().run()
+        whole = dict(ClientChurnScore.objects.values_list('client_id', 'churn_risk'))
+
+        service = ChurnPredictionService()
+        service.CHUNK_SIZE = 1
+        service.run()
+
+        self.assertEqual(dict(ClientChurnScore.objects.values_list('client_id', 'churn_risk')), whole)
+
+    def test_clients_without_valid_sales_are_removed(self):
+        client_record = self.create_buyer(0, days_ago=[20, 10])
+        ChurnPredictionService().run()
+
+        Sale.objects.filter(client=client_record).update(is_active=False)
+        ChurnPredictionService().run()
+
+        self.assertFalse(ClientChurnScore.objects.exists())
+
+
+class PriceElasticityTests(TestCase):
+    """Elasticidad por ventanas de precio y banda de precio sugerida"""
+
+    def setUp(self):
+        self.service = PriceElasticityService()
+
+    def test_price_windows_follow_price_history(self):
+        product = create_products(1)[0]
+        today = timezone.localdate()
+        for days_ago, old_price, new_price in ((20, 10, 12), (10, 12, 15)):
+            change = PriceHistory.objects.create(product=product, old_price=old_price, new_price=new_price)
+            PriceHistory.objects.filter(pk=change.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+        windows = self.service.load_price_windows(today - timedelta(days=29), today)
+
+        self.assertEqual(windows['price'].tolist(), [10.0, 12.0, 15.0])
+        self.assertEqual(
+            [timestamp.date() for timestamp in windows['window_end']],
+            [today - timedelta(days=20), today - timedelta(days=10), today + timedelta(days=1)]
+        )
+
+    def test_daily_quantities_are_assigned_to_the_current_window(self):
+        windows = pd.DataFrame({
+            'product_id': [1, 1],
+            'window_start': pd.to_datetime(['2025-01-01', '2025-01-11']),
+            'window_end': pd.to_datetime(['2025-01-11', '2025-01-21']),
+            'price': [10.0, 12.0]
+        })
+        daily = pd.DataFrame({
+            'product_id': [1, 1, 1],
+            'day': pd.to_datetime(['2025-01-05', '2025-01-10', '2025-01-15']),
+            'quantity': [4.0, 6.0, 3.0]
+        })
+
+        demand = self.service.window_demand(windows, daily)
+
+        self.assertEqual(demand['quantity'].tolist(), [10.0, 3.0])
+        # La primera ventana empieza con la primera venta del producto
+        self.assertEqual(demand['days'].tolist(), [6, 10])
+
+    def test_estimates_constant_elasticity(self):
+        prices = np.array([8.0, 10.0, 12.0, 14.0])
+        windows = pd.DataFrame({
+            'product_id': 1,
+            'price': prices,
+            'days': 30,
+            'quantity': 30 * 1e5 * prices ** -2.0
+        })
+
+        estimates = self.service.estimate(windows)
+
+        self.assertAlmostEqual(estimates['elasticity'].iloc[0], -2.0, places=3)
+        self.assertGreater(estimates['r2'].iloc[0], 0.99)
+
+    def test_price_bands(self):
+        estimates = pd.DataFrame({
+            'product_id': [1, 2], 'elasticity': [-2.0, 0.5], 'r2': [0.9, 0.9],
+            'min_price': [8.0, 8.0], 'max_price': [14.0, 14.0]
+        })
+        products = pd.DataFrame({'id': [1, 2], 'current_price': [12.0, 12.0], 'cost': [5.0, 5.0]})
+
+        bands = self.service.price_bands(estimates, products)
+
+        # Elástica: costo·e/(1+e) = 10; sin estimación confiable se mantiene el precio actual
+        self.assertEqual(bands['reliable'].tolist(), [True, False])
+        self.assertAlmostEqual(bands['suggested_price'].iloc[0], 10.0)
+        self.assertAlmostEqual(bands['suggested_price'].iloc[1], 12.0)
+        self.assertLessEqual(bands['band_low'].iloc[0], 10.0)
+        self.assertGreaterEqual(bands['band_high'].iloc[0], 10.0)
+
+
+class DailyFeatureStoreTests(TestCase):
+    """Materialización incremental del feature store desde el resumen diario"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        for days_ago in range(1, 11):
+            self.rollup(days_ago, days_ago * 10)
+
+    def rollup(self, days_ago, revenue):
+        SalesDailyRollup.objects.update_or_create(
+            date=self.today - timedelta(days=days_ago),
+            defaults={'revenue': Decimal(revenue), 'transaction_count': 1, 'unique_clients': 1}
+        )
+
+    def test_features_only_use_previous_days(self):
+        DailyFeatureStore.materialize()
+
+        yesterday = DailyFeatures.objects.get(date=self.today - timedelta(days=1))
+        # Semana previa a ayer: hace 2 a 8 días
+        self.assertEqual(yesterday.week_sales, sum(days * 10 for days in range(2, 9)))
+        self.assertEqual(yesterday.total_sales, 10)
+        # El día en curso se guarda sin objetivo y no entra al entrenamiento
+        self.assertIsNone(DailyFeatures.objects.get(date=self.today).total_sales)
+        frame = DailyFeatureStore.training_frame(self.today - timedelta(days=10), self.today)
+        self.assertEqual(frame['date'].max(), self.today - timedelta(days=1))
+
+    def test_materialize_is_incremental(self):
+        DailyFeatureStore.materialize()
+
+        self.assertEqual(DailyFeatureStore.materialize(), 0)
+
+        # Un cambio en un día pasado recalcula ese día y los siguientes
+        self.rollup(5, 1000)
+        self.assertEqual(DailyFeatureStore.materialize(), 6)
+        self.assertEqual(
+            DailyFeatures.objects.get(date=self.today - timedelta(days=4)).week_sales,
+            sum(days * 10 for days in range(6, 11)) + 1000
+        )
+
+    def test_serving_history_matches_materialized_features(self):
+        DailyFeatureStore.materialize()
+
+        window = DailyFeatureStore.serving_history(self.today)
+        features = DailyFeatureStore.history_features(window)
+
+        stored = DailyFeatures.objects.get(date=self.today)
+        self.assertEqual(features['week_sales'], stored.week_sales)
+        self.assertEqual(features['week_transactions'], stored.week_transactions)
+
+
+class ForecastEstimatorTests(TestCase):
+    """Familias de estimador intercambiables y su comparación"""
+
+    def test_default_is_the_original_forest(self):
+        hyperparameters = resolve_hyperparameters({})
+
+        self.assertEqual(hyperparameters['estimator'], 'random_forest')
+        self.assertEqual(resolve_hyperparameters({'n_estimators': 10})['n_estimators'], 10)
+        with self.assertRaises(ValueError):
+            resolve_hyperparameters({'estimator': 'svm'})
+
+    def test_unknown_parameters_are_ignored(self):
+        estimator = build_estimator({'estimator': 'ridge', 'alpha': 3.0, 'n_estimators': 50}, n_jobs=2)
+
+        self.assertIsInstance(estimator, Ridge)
+        self.assertEqual(estimator.alpha, 3.0)
+        self.assertEqual(build_estimator({}, n_jobs=2).n_jobs, 2)
+
+    def test_linear_feature_importance_uses_coefficients(self):
+        service = SalesForecastService()
+        service.model = Ridge().fit(np.array([[1.0, 0.0], [0.0, 1.0], [2.0, 1.0]]), np.array([3.0, 1.0, 7.0]))
+
+        importance = service._get_feature_importance(['a', 'b'])
+
+        self.assertAlmostEqual(sum(row['importance'] for row in importance), 1.0)
+        self.assertEqual(importance[0]['feature'], 'a')
+
+    def test_benchmark_reports_every_estimator(self):
+        results = SalesForecastService().benchmark(
+            estimators=['ridge', 'hist_gradient_boosting'], n_splits=2, use_synthetic=True, horizon=5, repeats=1
+        )
+
+        self.assertEqual([row['estimator'] for row in results], ['ridge', 'hist_gradient_boosting'])
+        for row in results:
+            self.assertGreater(row['artifact_kb'], 0)
+            self.assertGreaterEqual(row['mae'], 0)
+            self.assertGreater(row['training_data_size'], 0)
+
+
+class HyperparameterSearchTests(SimpleTestCase):
+    """Búsqueda en grilla con particiones temporales en un pool de procesos"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.random((120, 3))
+        self.y = self.X @ np.array([100.0, 20.0, 0.0]) + rng.normal(0, 1, 120)
+
+    def test_current_hyperparameters_are_evaluated_first(self):
+        candidates = candidate_grid({'estimator': 'ridge', 'alpha': 10.0})
+
+        self.assertEqual(candidates[0]['alpha'], 10.0)
+        self.assertEqual(len(candidates), 4)
+        self.assertEqual(len({c['alpha'] for c in candidates}), len(candidates))
+
+    def test_evaluation_uses_time_series_folds(self):
+        result = evaluate_candidate(self.X, self.y, {'estimator': 'ridge', 'alpha': 0.1}, n_splits=3)
+
+        self.assertLess(result['mae'], 5)
+        self.assertLessEqual(result['mae'], result['rmse'])
+
+    def test_search_picks_lowest_error(self):
+        service = SalesForecastService()
+        service.n_jobs = 2
+
+        search = service.search_hyperparameters(self.X, self.y, {'estimator': 'ridge', 'alpha': 100.0}, time_budget_seconds=60)
+
+        self.assertFalse(search['timed_out'])
+        self.assertEqual(search['evaluated'], 4)
+        self.assertEqual(search['best']['hyperparameters']['alpha'], 0.1)
+        self.assertEqual([r['mae'] for r in search['results']], sorted(r['mae'] for r in search['results']))
@@ -5,6 +5,7 @@ from . import views
 router = DefaultRouter()
 router.register(r'models', views.MLModelViewSet)
 router.register(r'predictions', views.PredictionViewSet)
+router.register(r'training-jobs', views.ModelTrainingLogViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
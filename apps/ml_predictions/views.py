@@ -1,45 +1,80 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import MLModel, Prediction
-from .serializers import MLModelSerializer, PredictionSerializer
-from .services import SalesForecastService, MLModelService
+from .models import MLModel, Prediction, ModelTrainingLog
+from .serializers import MLModelSerializer, PredictionSerializer, ModelTrainingLogSerializer
+from .services import SalesForecastService, MLModelService, DemandForecastService, PriceElasticityService
+from .estimators import resolve_hyperparameters
 import json
 
 
+def _flag(value, default=None):
+    """Booleano enviado por JSON o formulario ("false" o "0" no cuentan como verdadero)"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('true', '1', 'yes', 'on')
+
+
+# Períodos por los que se agrupa la serie histórica
+GROUP_BY_PERIODS = ('day', 'week', 'month')
+
+
+def _positive_int(value, name):
+    """Entero mayor o igual a 1 enviado como parámetro; ValueError con el mensaje para el cliente"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} debe ser un número entero")
+    if number < 1:
+        raise ValueError(f"{name} debe ser mayor o igual a 1")
+    return number
+
+
 class MLModelViewSet(viewsets.ModelViewSet):
     queryset = MLModel.objects.filter(is_active=True)
     serializer_class = MLModelSerializer
 
     @action(detail=False, methods=['post'])
     def train_sales_forecast(self, request):
-        """Entrenar modelo de pronóstico de ventas"""
+        """Encolar entrenamiento del modelo de pronóstico de ventas"""
         try:
-            service = SalesForecastService()
-            use_synthetic = request.data.get('use_synthetic', True)
+            use_synthetic = _flag(request.data.get('use_synthetic'), default=True)
+            estimator = request.data.get('estimator')
             
-            result = service.train_model(use_synthetic=use_synthetic)
+            model, created = MLModel.objects.get_or_create(
+                name=SalesForecastService.MODEL_NAME,
+                model_type='sales_forecast',
+                defaults={'model_file': ''}
+            )
+            if estimator:
+                # Cambia la familia del modelo; valida el nombre antes de encolar
+                try:
+                    model.hyperparameters = resolve_hyperparameters({'estimator': estimator})
+                except ValueError as e:
+                    return Response({
+                        'success': False,
+                        'error': str(e)
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                model.save(update_fields=['hyperparameters', 'updated_at'])
+            training_log = MLModelService.submit_training(
+                model,
+                training_type='initial' if created else 'retrain',
+                use_synthetic=use_synthetic,
+                search=_flag(request.data.get('search')),
+                time_budget_seconds=request.data.get('time_budget_seconds')
+            )
             
-            if result['success']:
-                return Response({
-                    'success': True,
-                    'message': 'Modelo entrenado exitosamente',
-                    'metrics': {
-                        'r2_score': result['r2_score'],
-                        'mae': result['mae'],
-                        'rmse': result['rmse'],
-                        'cv_mean': result['cv_mean'],
-                        'cv_std': result['cv_std']
-                    },
-                    'feature_importance': result['feature_importance']
-                }, status=status.HTTP_201_CREATED)
-            else:
-                return Response({
-                    'success': False,
-                    'error': result['error']
-                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'success': True,
+                'message': 'Entrenamiento encolado',
+                'job': ModelTrainingLogSerializer(training_log).data
+            }, status=status.HTTP_202_ACCEPTED)
                 
         except Exception as e:
             return Response({
@@ -49,10 +84,27 @@ class MLModelViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def retrain(self, request, pk=None):
-        """Reentrenar modelo específico"""
+        """Encolar reentrenamiento de un modelo específico"""
         try:
-            result = MLModelService.retrain_model(pk, force=True)
-            return Response(result)
+            model = self.get_object()
+            try:
+                training_log = MLModelService.submit_training(
+                    model,
+                    training_type='retrain',
+                    use_synthetic=_flag(request.data.get('use_synthetic'), default=False),
+                    search=_flag(request.data.get('search')),
+                    time_budget_seconds=request.data.get('time_budget_seconds')
+                )
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'success': True,
+                'message': 'Reentrenamiento encolado',
+                'job': ModelTrainingLogSerializer(training_log).data
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({
                 'success': False,
@@ -82,13 +134,15 @@ class PredictionViewSet(viewsets.ModelViewSet):
             days_ahead = request.data.get('days_ahead', 30)
             service = SalesForecastService()
             
-            predictions = service.predict_sales(days_ahead=days_ahead)
+            forecast = service.get_forecast(days_ahead=days_ahead)
+            predictions = forecast['predictions']
             
             return Response({
                 'success': True,
                 'predictions': predictions,
                 'total_days': len(predictions),
-                'generated_at': timezone.now().isoformat()
+                'generated_at': forecast['generated_at'].isoformat(),
+                'cached': forecast['cached']
             })
             
         except Exception as e:
@@ -101,95 +155,40 @@ class PredictionViewSet(viewsets.ModelViewSet):
     def historical_data(self, request):
         """Obtener datos históricos para el dashboard"""
         try:
-            from apps.sales.models import Sale, SaleItem
-            from apps.products.models import Product
-            from django.db.models import Sum, Count, Avg
-            from datetime import timedelta
+            from apps.sales.services import SalesRollupService
             
             # Parámetros de filtro
-            days_back = int(request.query_params.get('days_back', 365))
-            group_by = request.query_params.get('group_by', 'day')  # day, week, month
+            try:
+                days_back = _positive_int(request.query_params.get('days_back', 365), 'days_back')
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            group_by = request.query_params.get('group_by', 'day')
+            if group_by not in GROUP_BY_PERIODS:
+                return Response({
+                    'success': False,
+                    'error': f"group_by debe ser uno de: {', '.join(GROUP_BY_PERIODS)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             end_date = timezone.now()
             start_date = end_date - timedelta(days=days_back)
             
-            # Obtener datos de ventas
-            sales_data = Sale.objects.filter(
-                created_at__gte=start_date,
-                created_at__lte=end_date,
-                is_active=True
-            ).select_related('client').prefetch_related('items__product')
+            # La respuesta se invalida sola cuando cambia el resumen de ventas (marca de agua)
+            cache_key = 'ml:historical_data:{}:{}:{}:{}'.format(
+                days_back, group_by, timezone.localdate(end_date).isoformat(), SalesRollupService.watermark()
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return Response(cached)
             
-            # Agrupar datos según el parámetro
-            if group_by == 'day':
-                historical_data = []
-                current_date = start_date.date()
-                
-                while current_date <= end_date.date():
-                    day_sales = sales_data.filter(created_at__date=current_date)
-                    total_sales = sum(sale.total for sale in day_sales)
-                    num_transactions = day_sales.count()
-                    
-                    historical_data.append({
-                        'date': current_date.isoformat(),
-                        'total_sales': float(total_sales),
-                        'num_transactions': num_transactions,
-                        'avg_transaction': float(total_sales / num_transactions) if num_transactions > 0 else 0
-                    })
-                    
-                    current_date += timedelta(days=1)
-                    
-            elif group_by == 'week':
-                # Agrupar por semana
-                historical_data = []
-                current_date = start_date.date()
-                
-                while current_date <= end_date.date():
-                    week_end = current_date + timedelta(days=6)
-                    week_sales = sales_data.filter(
-                        created_at__date__gte=current_date,
-                        created_at__date__lte=week_end
-                    )
-                    total_sales = sum(sale.total for sale in week_sales)
-                    num_transactions = week_sales.count()
-                    
-                    historical_data.append({
-                        'date': current_date.isoformat(),
-                        'total_sales': float(total_sales),
-                        'num_transactions': num_transactions,
-                        'avg_transaction': float(total_sales / num_transactions) if num_transactions > 0 else 0
-                    })
-                    
-                    current_date += timedelta(days=7)
-                    
-            elif group_by == 'month':
-                # Agrupar por mes
-                historical_data = []
-                current_date = start_date.replace(day=1).date()
-                
-                while current_date <= end_date.date():
-                    if current_date.month == 12:
-                        next_month = current_date.replace(year=current_date.year + 1, month=1)
-                    else:
-                        next_month = current_date.replace(month=current_date.month + 1)
-                    
-                    month_sales = sales_data.filter(
-                        created_at__date__gte=current_date,
-                        created_at__date__lt=next_month
-                    )
-                    total_sales = sum(sale.total for sale in month_sales)
-                    num_transactions = month_sales.count()
-                    
-                    historical_data.append({
-                        'date': current_date.isoformat(),
-                        'total_sales': float(total_sales),
-                        'num_transactions': num_transactions,
-                        'avg_transaction': float(total_sales / num_transactions) if num_transactions > 0 else 0
-                    })
-                    
-                    current_date = next_month
+            # Agrupación en una sola consulta (Trunc + Sum) con períodos vacíos en cero
+            historical_data = SalesRollupService.grouped_series(
+                timezone.localdate(start_date), timezone.localdate(end_date), group_by
+            )
             
-            return Response({
+            response_data = {
                 'success': True,
                 'data': historical_data,
                 'period': {
@@ -198,7 +197,10 @@ class PredictionViewSet(viewsets.ModelViewSet):
                     'days_back': days_back,
                     'group_by': group_by
                 }
-            })
+            }
+            cache.set(cache_key, response_data, getattr(settings, 'HISTORICAL_DATA_CACHE_TIMEOUT', 3600))
+            
+            return Response(response_data)
             
         except Exception as e:
             return Response({
@@ -210,33 +212,38 @@ class PredictionViewSet(viewsets.ModelViewSet):
     def product_analysis(self, request):
         """Análisis de productos más vendidos"""
         try:
-            from apps.sales.models import SaleItem
-            from django.db.models import Sum, Count
+            from apps.sales.services import ProductSalesService
             
-            days_back = int(request.query_params.get('days_back', 90))
+            try:
+                days_back = _positive_int(request.query_params.get('days_back', 90), 'days_back')
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
             limit = int(request.query_params.get('limit', 10))
             
             end_date = timezone.now()
             start_date = end_date - timedelta(days=days_back)
             
             # Obtener productos más vendidos
-            product_stats = SaleItem.objects.filter(
-                sale__created_at__gte=start_date,
-                sale__created_at__lte=end_date,
-                sale__is_active=True
-            ).values(
-                'product__name',
-                'product__sku',
-                'product__category__name'
-            ).annotate(
-                total_quantity=Sum('quantity'),
-                total_revenue=Sum('quantity') * Sum('price'),
-                num_sales=Count('sale')
-            ).order_by('-total_revenue')[:limit]
+            product_stats = [
+                {
+                    'product__name': product['name'],
+                    'product__sku': product['sku'],
+                    'product__category__name': product['category__name'],
+                    'total_quantity': product['units_sold'],
+                    'total_revenue': product['revenue'],
+                    'num_sales': product['num_sales']
+                }
+                for product in ProductSalesService.product_totals(
+                    start_date, end_date, include_unsold=False
+                ).order_by('-revenue')[:limit]
+            ]
             
             return Response({
                 'success': True,
-                'data': list(product_stats),
+                'data': product_stats,
                 'period': {
                     'start_date': start_date.isoformat(),
                     'end_date': end_date.isoformat(),
@@ -257,7 +264,13 @@ class PredictionViewSet(viewsets.ModelViewSet):
             from apps.sales.models import Sale
             from django.db.models import Sum, Count, Avg
             
-            days_back = int(request.query_params.get('days_back', 90))
+            try:
+                days_back = _positive_int(request.query_params.get('days_back', 90), 'days_back')
+            except ValueError as e:
+                return Response({
+                    'success': False,
+                    'error': str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
             limit = int(request.query_params.get('limit', 10))
             
             end_date = timezone.now()
@@ -292,3 +305,75 @@ class PredictionViewSet(viewsets.ModelViewSet):
                 'success': False,
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'])
+    def demand_forecast(self, request):
+        """Pronóstico de demanda por producto (generado con `manage.py forecast_demand`)"""
+        try:
+            needs_reorder = request.query_params.get('needs_reorder')
+            
+            rows = Prediction.objects.filter(
+                category=DemandForecastService.FORECAST_CATEGORY,
+                model__model_type='demand_forecast',
+                is_active=True
+            ).values('prediction_result', 'prediction_date', 'target_date', 'horizon')
+            
+            results = [row['prediction_result'] for row in rows]
+            if needs_reorder in ('true', '1'):
+                results = [row for row in results if row['needs_reorder']]
+            results.sort(key=lambda row: (not row['needs_reorder'], -row['horizon_demand']))
+            
+            first = rows[0] if rows else None
+            return Response({
+                'success': True,
+                'data': results,
+                'total_products': len(results),
+                'generated_at': first['prediction_date'].isoformat() if first else None,
+                'start_date': first['target_date'].isoformat() if first else None,
+                'horizon': first['horizon'] if first else None
+            })
+            
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'])
+    def price_elasticity(self, request):
+        """Elasticidad y banda de precio por producto (generado con `manage.py estimate_elasticity`)"""
+        try:
+            reliable = request.query_params.get('reliable')
+            
+            rows = Prediction.objects.filter(
+                category=PriceElasticityService.FORECAST_CATEGORY,
+                model__model_type='price_optimization',
+                is_active=True
+            ).values('prediction_result', 'prediction_date', 'target_date')
+            
+            results = [row['prediction_result'] for row in rows]
+            if reliable in ('true', '1'):
+                results = [row for row in results if row['reliable']]
+            results.sort(key=lambda row: (not row['reliable'], -row['r2']))
+            
+            first = rows[0] if rows else None
+            return Response({
+                'success': True,
+                'data': results,
+                'total_products': len(results),
+                'generated_at': first['prediction_date'].isoformat() if first else None,
+                'end_date': first['target_date'].isoformat() if first else None
+            })
+            
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ModelTrainingLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Estado de los trabajos de entrenamiento (para hacer polling)"""
+    queryset = ModelTrainingLog.objects.select_related('model')
+    serializer_class = ModelTrainingLogSerializer
+    filterset_fields = ['model', 'status']
@@ -147,12 +147,15 @@ class FrequentClientSerializer(serializers.ModelSerializer):
     total_spent = serializers.SerializerMethodField()
     last_purchase_date = serializers.SerializerMethodField()  # Cambiar a SerializerMethodField
     is_vip = serializers.ReadOnlyField()
+    churn_risk = serializers.FloatField(source='churn_score.churn_risk', read_only=True, default=None)
+    churn_risk_level = serializers.CharField(source='churn_score.risk_level', read_only=True, default=None)
     
     class Meta:
         model = Client
         fields = [
             'id', 'name', 'email', 'phone', 'city', 'segment',
-            'purchase_count', 'total_spent', 'last_purchase_date', 'is_vip', 'total_purchases'
+            'purchase_count', 'total_spent', 'last_purchase_date', 'is_vip', 'total_purchases',
+            'churn_risk', 'churn_risk_level'
         ]
     
     def get_total_spent(self, obj):
@@ -860,6 +860,9 @@ def frequent_clients_report(request):
             days = 30
             limit = 10
             min_purchases = 1
+        # Filtro y orden por riesgo de abandono (ClientChurnScore, comando score_churn)
+        churn_risk = request.GET.get('churn_risk')
+        sort = request.GET.get('sort', 'purchases')
         
         start_date = timezone.now() - timedelta(days=days)
         
@@ -884,7 +887,7 @@ def frequent_clients_report(request):
                 purchase_count=Count('sale', filter=Q(sale__status='completed')),
                 total_spent=Sum('sale__total', filter=Q(sale__status='completed')),
                 last_sale_date=Max('sale__created_at', filter=Q(sale__status='completed'))  # Usar alias diferente
-            ).order_by('-total_purchases', '-created_at')[:limit]
+            ).order_by('-total_purchases', '-created_at')
         else:
             # Obtener clientes con más compras en el período
             frequent_clients = Client.objects.filter(
@@ -896,7 +899,15 @@ def frequent_clients_report(request):
                 last_sale_date=Max('sale__created_at', filter=Q(sale__status='completed'))  # Usar alias diferente
             ).filter(
                 purchase_count__gte=min_purchases
-            ).order_by('-purchase_count', '-total_spent')[:limit]
+            ).order_by('-purchase_count', '-total_spent')
+        
+        if churn_risk in ('low', 'medium', 'high'):
+            frequent_clients = frequent_clients.filter(churn_score__risk_level=churn_risk)
+        if sort == 'churn_risk':
+            frequent_clients = frequent_clients.order_by(
+                F('churn_score__churn_risk').desc(nulls_last=True), '-purchase_count'
+            )
+        frequent_clients = frequent_clients.select_related('churn_score')[:limit]
         
         serializer = FrequentClientSerializer(frequent_clients, many=True)
         
@@ -911,6 +922,7 @@ def frequent_clients_report(request):
         return Response({
             'results': serializer.data,
             'period_days': days,
+            'sort': sort,
             'stats': {
                 'total_clients': total_clients,
                 'clients_with_purchases': clients_with_purchases,
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='reference',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Referencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('reference', ''), _negated=True), fields=('user', 'reference'), name='unique_notification_reference_per_user'),
+        ),
+    ]
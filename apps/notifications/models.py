@@ -14,11 +14,20 @@ class Notification(BaseModel):
     ], default='info', verbose_name='Tipo')
     is_read = models.BooleanField(default=False, verbose_name='Leída')
     read_at = models.DateTimeField(null=True, blank=True, verbose_name='Leída en')
+    # Origen de la notificación (p. ej. "sale:<id>"): evita duplicarla si el evento se reintenta
+    reference = models.CharField(max_length=100, blank=True, default='', verbose_name='Referencia')
     
     class Meta:
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'reference'],
+                condition=~models.Q(reference=''),
+                name='unique_notification_reference_per_user'
+            )
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
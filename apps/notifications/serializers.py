@@ -5,4 +5,4 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
-        read_only_fields = ['user', 'read_at']
+        read_only_fields = ['user', 'read_at', 'reference']
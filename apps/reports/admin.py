@@ -3,6 +3,6 @@ from .models import Report
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
-    list_display = ['name', 'report_type', 'created_at']
-    list_filter = ['report_type', 'created_at']
+    list_display = ['name', 'report_type', 'format', 'status', 'user', 'generated_at', 'created_at']
+    list_filter = ['report_type', 'status', 'format', 'created_at']
     search_fields = ['name', 'description']
@@ -4,13 +4,18 @@ Exportadores para diferentes formatos de reportes
 import os
 import io
 import csv
+import json
 from datetime import datetime
+from itertools import chain, islice
 from django.conf import settings
 from django.http import HttpResponse
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -18,9 +23,45 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 
 
+def split_rows(data):
+    """
+    Separa la primera fila de un reporte (lista o iterador) del resto
+
+    Permite tomar los encabezados de la primera fila y seguir recorriendo el
+    iterador sin cargarlo completo en memoria.
+
+    Returns:
+        (primera fila o None, iterador con todas las filas)
+    """
+    rows = iter(data if data is not None else [])
+    first = next(rows, None)
+    if first is None:
+        return None, iter([])
+    return first, chain([first], rows)
+
+
 class PDFExporter:
     """Exportador para archivos PDF"""
     
+    # Filas de datos por tabla; cada tabla repite los encabezados
+    TABLE_CHUNK_ROWS = 500
+    
+    @staticmethod
+    def table(headers, chunk):
+        """Tabla con los encabezados y un bloque de filas del reporte"""
+        table = Table([headers] + chunk, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        return table
+    
     @staticmethod
     def export_report(data, prompt):
         """Exporta un reporte a PDF"""
@@ -49,38 +90,24 @@ class PDFExporter:
             story.append(Spacer(1, 20))
             
             # Datos del reporte
-            if isinstance(data, list) and len(data) > 0:
-                # Crear tabla con los datos
-                table_data = []
-                
-                # Encabezados
-                if isinstance(data[0], dict):
-                    headers = list(data[0].keys())
-                    table_data.append(headers)
-                    
-                    # Datos
-                    for row in data:
-                        table_data.append([str(row.get(header, '')) for header in headers])
+            first, rows = split_rows(data)
+            if first is not None:
+                if isinstance(first, dict):
+                    # Tablas de TABLE_CHUNK_ROWS filas: reportlab no tiene que medir
+                    # ni partir en páginas una sola tabla con todo el reporte
+                    headers = list(first.keys())
+                    chunk = []
+                    for row in rows:
+                        chunk.append([str(row.get(header, '')) for header in headers])
+                        if len(chunk) == PDFExporter.TABLE_CHUNK_ROWS:
+                            story.append(PDFExporter.table(headers, chunk))
+                            chunk = []
+                    if chunk:
+                        story.append(PDFExporter.table(headers, chunk))
                 else:
                     # Si no es una lista de diccionarios, mostrar como texto
                     story.append(Paragraph("<b>Datos:</b>", styles['Normal']))
-                    story.append(Paragraph(str(data), styles['Normal']))
-                
-                if table_data:
-                    # Crear tabla
-                    table = Table(table_data)
-                    table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 12),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
-                    
-                    story.append(table)
+                    story.append(Paragraph(str(list(rows)), styles['Normal']))
             else:
                 story.append(Paragraph("No hay datos para mostrar", styles['Normal']))
             
@@ -93,7 +120,8 @@ class PDFExporter:
             
             # Guardar archivo
             file_path = f'reports/{filename}'
-            default_storage.save(file_path, ContentFile(pdf_content))
+            # El storage puede renombrar el archivo si ya existe uno igual
+            file_path = default_storage.save(file_path, ContentFile(pdf_content))
             
             # Retornar URL del archivo
             return f'/media/{file_path}'
@@ -106,6 +134,16 @@ class PDFExporter:
 class ExcelExporter:
     """Exportador para archivos Excel"""
     
+    # Filas que se miran para calcular el ancho de las columnas
+    WIDTH_SAMPLE_ROWS = 100
+    
+    @staticmethod
+    def cell_value(value):
+        """Las listas (p. ej. productos de una venta) se escriben como texto"""
+        if isinstance(value, (list, tuple)):
+            return ', '.join(str(item) for item in value)
+        return value
+    
     @staticmethod
     def export_report(data, prompt):
         """Exporta un reporte a Excel"""
@@ -114,56 +152,65 @@ class ExcelExporter:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f'reporte_{timestamp}.xlsx'
             
-            # Crear workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Reporte"
+            # Workbook de solo escritura: las filas se vuelcan a medida que se
+            # agregan en lugar de quedar todas como celdas en memoria
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Reporte")
             
             # Estilos
             header_font = Font(bold=True, color="FFFFFF")
             header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
             center_alignment = Alignment(horizontal="center", vertical="center")
             
-            # Información del reporte
-            ws['A1'] = "Reporte Generado"
-            ws['A1'].font = Font(bold=True, size=16)
-            ws.merge_cells('A1:D1')
+            def styled(value, **style):
+                cell = WriteOnlyCell(ws, value=value)
+                for name, style_value in style.items():
+                    setattr(cell, name, style_value)
+                return cell
             
-            ws['A3'] = f"Prompt: {prompt}"
-            ws['A4'] = f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+            info = [
+                [styled("Reporte Generado", font=Font(bold=True, size=16))],
+                [],
+                [f"Prompt: {prompt}"],
+                [f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}"],
+                [],
+            ]
             
             # Datos del reporte
-            if isinstance(data, list) and len(data) > 0:
+            first, rows = split_rows(data)
+            headers = list(first.keys()) if isinstance(first, dict) else None
+            
+            # Los anchos se fijan antes de la primera fila: se calculan con los
+            # encabezados y una muestra de las primeras filas
+            sample = []
+            if headers is not None:
+                sample = [
+                    [ExcelExporter.cell_value(row.get(header, '')) for header in headers]
+                    for row in islice(rows, ExcelExporter.WIDTH_SAMPLE_ROWS)
+                ]
+                for col, header in enumerate(headers, 1):
+                    max_length = max([len(str(header))] + [len(str(values[col - 1])) for values in sample])
+                    ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
+            
+            for values in info:
+                ws.append(values)
+            
+            if headers is not None:
                 # Encabezados
-                if isinstance(data[0], dict):
-                    headers = list(data[0].keys())
-                    for col, header in enumerate(headers, 1):
-                        cell = ws.cell(row=6, column=col, value=header)
-                        cell.font = header_font
-                        cell.fill = header_fill
-                        cell.alignment = center_alignment
-                    
-                    # Datos
-                    for row_idx, row_data in enumerate(data, 7):
-                        for col_idx, header in enumerate(headers, 1):
-                            ws.cell(row=row_idx, column=col_idx, value=row_data.get(header, ''))
-                else:
-                    # Si no es una lista de diccionarios, mostrar como texto
-                    ws['A6'] = "Datos:"
-                    ws['A7'] = str(data)
-            
-            # Ajustar ancho de columnas
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+                ws.append([
+                    styled(header, font=header_font, fill=header_fill, alignment=center_alignment)
+                    for header in headers
+                ])
+                
+                # Datos
+                for values in sample:
+                    ws.append(values)
+                for row_data in rows:
+                    ws.append([ExcelExporter.cell_value(row_data.get(header, '')) for header in headers])
+            elif first is not None:
+                # Si no es una lista de diccionarios, mostrar como texto
+                ws.append(["Datos:"])
+                ws.append([str(list(rows))])
             
             # Guardar archivo
             file_path = f'reports/{filename}'
@@ -171,7 +218,8 @@ class ExcelExporter:
             wb.save(buffer)
             buffer.seek(0)
             
-            default_storage.save(file_path, ContentFile(buffer.getvalue()))
+            # El storage puede renombrar el archivo si ya existe uno igual
+            file_path = default_storage.save(file_path, ContentFile(buffer.getvalue()))
             buffer.close()
             
             # Retornar URL del archivo
@@ -196,17 +244,18 @@ class CSVExporter:
             # Crear buffer para el CSV
             buffer = io.StringIO()
             
-            if isinstance(data, list) and len(data) > 0:
-                if isinstance(data[0], dict):
+            first, rows = split_rows(data)
+            if first is not None:
+                if isinstance(first, dict):
                     # Escribir CSV con diccionarios
-                    fieldnames = list(data[0].keys())
+                    fieldnames = list(first.keys())
                     writer = csv.DictWriter(buffer, fieldnames=fieldnames)
                     writer.writeheader()
-                    writer.writerows(data)
+                    writer.writerows(rows)
                 else:
                     # Escribir CSV simple
                     writer = csv.writer(buffer)
-                    for row in data:
+                    for row in rows:
                         writer.writerow([row])
             else:
                 # Escribir datos simples
@@ -217,7 +266,8 @@ class CSVExporter:
             csv_content = buffer.getvalue()
             buffer.close()
             
-            default_storage.save(file_path, ContentFile(csv_content.encode('utf-8')))
+            # El storage puede renombrar el archivo si ya existe uno igual
+            file_path = default_storage.save(file_path, ContentFile(csv_content.encode('utf-8')))
             
             # Retornar URL del archivo
             return f'/media/{file_path}'
@@ -225,3 +275,42 @@ class CSVExporter:
         except Exception as e:
             print(f"Error generando CSV: {str(e)}")
             return None
+
+
+class JSONExporter:
+    """Exportador para archivos JSON (reportes en segundo plano con formato pantalla)"""
+    
+    @staticmethod
+    def export_report(data, prompt):
+        """Exporta un reporte a JSON escribiendo las filas a medida que llegan"""
+        try:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'reporte_{timestamp}.json'
+            
+            buffer = io.StringIO()
+            buffer.write('{"prompt": %s, "data": [' % json.dumps(prompt))
+            for index, row in enumerate(data if data is not None else []):
+                if index:
+                    buffer.write(', ')
+                buffer.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            buffer.write(']}')
+            
+            # Guardar archivo
+            file_path = f'reports/{filename}'
+            file_path = default_storage.save(file_path, ContentFile(buffer.getvalue().encode('utf-8')))
+            buffer.close()
+            
+            return f'/media/{file_path}'
+            
+        except Exception as e:
+            print(f"Error generando JSON: {str(e)}")
+            return None
+
+
+# Formato -> exportador de archivo (mismas claves que Report.format)
+EXPORTERS = {
+    'pdf': PDFExporter,
+    'excel': ExcelExporter,
+    'csv': CSVExporter,
+    'json': JSONExporter,
+}
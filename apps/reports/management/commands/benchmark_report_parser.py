@@ -0,0 +1,63 @@
+"""
+Comando para medir el costo de interpretar prompts de reportes
+"""
+import time
+from django.core.management.base import BaseCommand
+from apps.reports.services import ReportPromptParser
+
+# Prompts reales de las plantillas y del uso habitual de la app
+PROMPTS = [
+    'Ventas del mes actual agrupadas por producto',
+    'Top 10 productos más vendidos del mes',
+    'Clientes con más compras y sus montos totales',
+    'Ventas del mes de septiembre agrupadas por producto en PDF',
+    'Ventas del periodo del 01/10/2024 al 01/01/2025 en Excel',
+    'ventas de este mes',
+    'ventas de octubre',
+    'todas las ventas',
+    'mostrar ventas del 18 de octubre',
+    'ventas desde el 18 de octubre hasta el 19 de octubre',
+    'ventas del 18 al 25 de octubre por cliente',
+    'ventas del 15/10/2025',
+    'reporte de productos en excel',
+    'top 5 clientes ordenado por monto',
+    'ventas de marzo vs abril',
+]
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark de ReportPromptParser: interpretación en frío y memorizada'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Veces que se interpreta el corpus completo',
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        total = repeat * len(PROMPTS)
+
+        # En frío: cada vuelta con la memoria vacía (solo regex precompiladas)
+        parser = ReportPromptParser()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            parser._parse_cached.cache_clear()
+            for prompt in PROMPTS:
+                parser.parse_prompt(prompt)
+        cold = time.perf_counter() - started
+
+        # Memorizado: el corpus ya interpretado
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for prompt in PROMPTS:
+                parser.parse_prompt(prompt)
+        warm = time.perf_counter() - started
+
+        self.stdout.write(f"Prompts del corpus: {len(PROMPTS)}, interpretaciones por modo: {total}\n")
+        self.stdout.write(f"{'Modo':<14}{'Total (ms)':>14}{'Por prompt (µs)':>18}")
+        for name, seconds in (('frío', cold), ('memorizado', warm)):
+            self.stdout.write(f"{name:<14}{seconds * 1000:>14.1f}{seconds / total * 1e6:>18.1f}")
+        self.stdout.write(self.style.SUCCESS(f'✅ Benchmark completado ({parser._parse_cached.cache_info()})'))
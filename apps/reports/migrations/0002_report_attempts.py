@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Intentos'),
+        ),
+    ]
@@ -39,6 +39,7 @@ class Report(BaseModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Usuario')
     generated_at = models.DateTimeField(null=True, blank=True, verbose_name='Generado en')
     error_message = models.TextField(blank=True, verbose_name='Mensaje de Error')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Intentos')
     
     class Meta:
         verbose_name = 'Reporte'
@@ -0,0 +1,97 @@
+"""
+Caché de resultados de los reportes dinámicos
+
+La clave es la salida normalizada de ReportPromptParser.parse_prompt, así que
+prompts distintos que piden lo mismo ("ventas del mes", "ventas de este mes")
+comparten el resultado. Cada clave incluye además una marca de agua que las
+señales de ventas, productos y clientes renuevan al confirmarse un cambio:
+
+- `live`: cambia con cualquier modificación; la usan los reportes que
+  incluyen el día de hoy o dependen de datos vivos (stock, última compra).
+- `history`: solo cambia si se modifican ventas de días anteriores o datos
+  de productos/clientes; la usan los reportes de ventas de períodos ya
+  cerrados, que se guardan con una expiración larga.
+
+Los resultados se guardan con su propia clave en el alias de caché `reports`,
+que expulsa el resultado usado hace más tiempo cuando se llena (LRU, ver
+REPORTS_CACHE en la configuración). Las marcas de agua quedan en el caché por
+defecto para que ninguna expulsión las borre.
+"""
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils import timezone
+
+
+class ReportResultCache:
+    """Resultados de reportes en el caché de Django, con invalidación por marca de agua"""
+
+    KEY_PREFIX = 'reports:result'
+    VERSION_KEY = 'reports:version:{scope}'
+
+    # Parámetros que no cambian el resultado
+    IGNORED_PARAMS = ('format',)
+
+    @staticmethod
+    def version(scope: str) -> str:
+        """Marca de agua actual del alcance (se crea si el caché no la tiene)"""
+        key = ReportResultCache.VERSION_KEY.format(scope=scope)
+        token = cache.get(key)
+        if token is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            token = cache.get(key)
+        return token
+
+    @staticmethod
+    def bump(*scopes: str):
+        """Renueva las marcas de agua: los resultados anteriores dejan de usarse"""
+        for scope in scopes:
+            cache.set(ReportResultCache.VERSION_KEY.format(scope=scope), uuid.uuid4().hex, None)
+
+    @staticmethod
+    def is_closed(params: Dict[str, Any]) -> bool:
+        """Reporte de ventas de un período que terminó antes de hoy"""
+        if params.get('type') != 'sales':
+            return False
+        if params.get('specific_date'):
+            last_day = params['specific_date']
+        elif params.get('date_range'):
+            last_day = params['date_range'][1]
+        else:
+            return False
+        return last_day < timezone.localdate()
+
+    @classmethod
+    def key(cls, params: Dict[str, Any]) -> str:
+        """Clave del resultado: parámetros normalizados + marca de agua del alcance"""
+        normalized = json.dumps(
+            {name: value for name, value in params.items() if name not in cls.IGNORED_PARAMS},
+            sort_keys=True,
+            default=str
+        )
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        scope = 'history' if cls.is_closed(params) else 'live'
+        return f"{cls.KEY_PREFIX}:{scope}:{cls.version(scope)}:{digest}"
+
+    @staticmethod
+    def store():
+        """Caché LRU donde viven los resultados"""
+        return caches['reports']
+    
+    @classmethod
+    def get(cls, key: str) -> Optional[List[Dict]]:
+        return cls.store().get(key)
+    
+    @classmethod
+    def set(cls, key: str, rows: List[Dict], params: Dict[str, Any]):
+        """Guarda el resultado si no es demasiado grande"""
+        if len(rows) > getattr(settings, 'REPORTS_CACHE_MAX_ROWS', 5000):
+            return
+        if cls.is_closed(params):
+            timeout = getattr(settings, 'REPORTS_CACHE_HISTORY_TIMEOUT', 7 * 24 * 3600)
+        else:
+            timeout = getattr(settings, 'REPORTS_CACHE_TIMEOUT', 300)
+        cls.store().set(key, rows, timeout)
@@ -1,7 +1,15 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Report
 
 class ReportSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = Report
         fields = '__all__'
+    
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.file_path:
+            return None
+        return f"{settings.MEDIA_URL}{obj.file_path}"
@@ -3,37 +3,253 @@ Servicios para generación dinámica de reportes
 """
 import re
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Tuple
-from django.db import connection
-from django.db.models import Q, Sum, Count, Avg
+import time
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.db.models import (
+    F, Q, Sum, Count, Avg, Min, Max, Value, Aggregate, CharField, DecimalField, OuterRef, Subquery
+)
+from django.db.models.functions import Cast, Coalesce, Concat
 from django.utils import timezone
 from apps.sales.models import Sale, SaleItem
+from apps.sales.services import ProductSalesService
 from apps.products.models import Product
 from apps.clients.models import Client
+from apps.core.outbox import OutboxService
+from .exporters import EXPORTERS
+from .models import Report
+from .result_cache import ReportResultCache
+
+logger = logging.getLogger(__name__)
+
+# Fallas de base de datos o de disco que pueden resolverse solas; se reintentan
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError)
+
+
+class GroupConcat(Aggregate):
+    """Concatena los textos de un grupo (STRING_AGG en PostgreSQL, GROUP_CONCAT en SQLite)"""
+    function = 'STRING_AGG'
+    output_field = CharField()
+    # Separador que no aparece en nombres de productos
+    SEPARATOR = '\x1f'
+    
+    def __init__(self, expression, **extra):
+        super().__init__(expression, Value(self.SEPARATOR), **extra)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='GROUP_CONCAT', **extra_context)
+
+
+class ReportInstrumentation:
+    """
+    Tiempos y consultas SQL por etapa de un reporte, registrados en el log
+    
+    Solo mide cuando REPORTS_DEBUG está activo; si no, las etapas no agregan
+    trabajo a la ejecución del reporte.
+    """
+    
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = getattr(settings, 'REPORTS_DEBUG', False) if enabled is None else enabled
+        self.queries = 0
+    
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+    
+    @contextmanager
+    def stage(self, name: str, **extra):
+        """Mide una etapa y la registra con su duración y cantidad de consultas"""
+        if not self.enabled:
+            yield
+            return
+        
+        queries = self.queries
+        started = time.perf_counter()
+        with connection.execute_wrapper(self._count_query):
+            yield
+        self.log(name, time.perf_counter() - started, self.queries - queries, **extra)
+    
+    def rows(self, rows: Iterable[Dict], params: Dict[str, Any]) -> Iterable[Dict]:
+        """
+        Envuelve las filas para medir la etapa de lectura
+        
+        Solo se cuenta el tiempo y las consultas de producir cada fila, no el del
+        consumidor (p. ej. el exportador) entre una fila y la siguiente.
+        """
+        if not self.enabled:
+            return rows
+        return self._measured_rows(iter(rows), params)
+    
+    def _measured_rows(self, rows: Iterator[Dict], params: Dict[str, Any]) -> Iterator[Dict]:
+        queries = self.queries
+        elapsed = 0.0
+        count = 0
+        while True:
+            started = time.perf_counter()
+            with connection.execute_wrapper(self._count_query):
+                row = next(rows, None)
+            elapsed += time.perf_counter() - started
+            if row is None:
+                break
+            count += 1
+            yield row
+        self.log('rows', elapsed, self.queries - queries, rows=count, report_type=params.get('type'))
+    
+    @staticmethod
+    def log(stage: str, seconds: float, queries: int, **extra):
+        logger.info(
+            f"Reporte [{stage}] {seconds * 1000:.1f} ms, {queries} consulta(s)",
+            extra={'report_stage': stage, 'elapsed_ms': round(seconds * 1000, 1), 'queries': queries, **extra}
+        )
+
+
+# Meses en español -> número
+MONTHS = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
+    'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
+    'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
+}
+MONTH = '(' + '|'.join(MONTHS) + ')'
 
 
 class ReportPromptParser:
-    """Parser para interpretar prompts de reportes"""
+    """
+    Parser para interpretar prompts de reportes
+    
+    Las expresiones regulares se compilan una sola vez al importar el módulo y
+    los resultados se memorizan por prompt (en minúsculas) y día, porque las
+    fechas relativas ("este mes") dependen de la fecha actual. Usar la
+    instancia compartida `report_prompt_parser`.
+    """
+    
+    # Prompts distintos que se recuerdan ya interpretados
+    PARSE_CACHE_SIZE = 1024
+    
+    PATTERNS = {
+        'ventas': re.compile(r'(ventas?|sales?)'),
+        'clientes': re.compile(r'(clientes?|customers?)'),
+        'productos': re.compile(r'(productos?|products?)'),
+        'fecha': re.compile(r'(' + '|'.join(MONTHS) + r'|\d{1,2}/\d{1,2}/\d{4})'),
+        'periodo': re.compile(r'(del|desde|hasta|al|entre)\s+(\d{1,2}/\d{1,2}/\d{4}|\d{1,2}/\d{1,2}/\d{4})'),
+        'formato': re.compile(r'(pdf|excel|pantalla|screen)'),
+        'agrupacion': re.compile(r'(agrupado|agrupadas?|por|grouped?)\s+(producto|cliente|fecha|mes|año)'),
+        'orden': re.compile(r'(ordenado|ordenadas?|por|order)\s+(nombre|fecha|monto|cantidad)'),
+        'filtro': re.compile(r'(top|mejores?|peores?)\s+(\d+)'),
+        'comparacion': re.compile(r'(comparar|comparar?|vs|versus)')
+    }
+    
+    SHOW_ALL = re.compile(r'todas.*ventas|todas.*compras|listar.*ventas|mostrar.*ventas')
+    PDF = re.compile(r'pdf')
+    EXCEL = re.compile(r'excel')
+    
+    # Fechas específicas (no rangos): (patrón, usa nombres de meses)
+    SPECIFIC_DATE_PATTERNS = [
+        # Formato: "el 18 de octubre"
+        (re.compile(r'el\s+(\d{1,2})\s+de\s+' + MONTH), True),
+        # Formato: "18 de octubre"
+        (re.compile(r'(\d{1,2})\s+de\s+' + MONTH + r'(?!\s+(hasta|al))'), True),
+        # Formato: "del 18 de octubre"
+        (re.compile(r'del\s+(\d{1,2})\s+de\s+' + MONTH), True),
+        # Formato: "18/10/2025"
+        (re.compile(r'(\d{1,2}/\d{1,2}/\d{4})(?!\s+(al|hasta))'), False)
+    ]
+    
+    # Rangos de fechas: (patrón, usa nombres de meses)
+    DATE_RANGE_PATTERNS = [
+        # Formato: "desde el 18 de octubre hasta el 19 de octubre"
+        (re.compile(r'desde\s+el?\s*(\d{1,2})\s+de\s+' + MONTH + r'\s+(hasta|al)\s+el?\s*(\d{1,2})\s+de\s+' + MONTH), True),
+        # Formato: "18 de octubre hasta 19 de octubre"
+        (re.compile(r'(\d{1,2})\s+de\s+' + MONTH + r'\s+(hasta|al)\s+(\d{1,2})\s+de\s+' + MONTH), True),
+        # Formato: "18/10/2025 al 19/10/2025"
+        (re.compile(r'(\d{1,2}/\d{1,2}/\d{4})\s+(al|hasta)\s+(\d{1,2}/\d{1,2}/\d{4})'), False),
+        # Formato: "desde 18 de octubre hasta 19 de octubre"
+        (re.compile(r'desde\s+(\d{1,2})\s+de\s+' + MONTH + r'\s+(hasta|al)\s+(\d{1,2})\s+de\s+' + MONTH), True),
+        # Formato: "18 al 19 de octubre"
+        (re.compile(r'(\d{1,2})\s+(al|hasta)\s+(\d{1,2})\s+de\s+' + MONTH), True),
+        # Formato: "del 18 de octubre hasta el 19 de octubre"
+        (re.compile(r'del\s+(\d{1,2})\s+de\s+' + MONTH + r'\s+(hasta|al)\s+el?\s*(\d{1,2})\s+de\s+' + MONTH), True)
+    ]
+    
+    # Mes específico, de más a menos común
+    MONTH_PATTERNS = [
+        # "de/del/en [mes]" (ej: "ventas de octubre")
+        re.compile(r'(?:^|\s)(?:de|del|en)\s+' + MONTH + r'(?:\s|$|de|del)'),
+        # "[mes] de/del"
+        re.compile(MONTH + r'\s+(?:de|del)(?:\s|$)'),
+        # "[mes]" al final o solo (último recurso)
+        re.compile(r'(?:^|\s)' + MONTH + r'(?:\s|$)')
+    ]
+    CURRENT_MONTH_MENTION = re.compile(r'mes\s+actual|este\s+mes')
+    CURRENT_MONTH_PATTERNS = [
+        re.compile(r'(?:^|\s)mes\s+actual(?:\s|$)'),
+        re.compile(r'(?:^|\s)este\s+mes(?:\s|$)'),
+        re.compile(r'(?:^|\s)mes\s+corriente(?:\s|$)'),
+        re.compile(r'(?:^|\s)mes\s+presente(?:\s|$)'),
+        re.compile(r'current\s+month')
+    ]
+    
+    GROUP_BY_PATTERNS = [
+        (re.compile(r'agrupado.*producto|agrupa.*producto|por producto'), 'product'),
+        (re.compile(r'agrupado.*cliente|agrupa.*cliente|por cliente'), 'client'),
+        (re.compile(r'agrupado.*fecha|agrupa.*fecha|por fecha'), 'date')
+    ]
+    ORDER_BY_PATTERNS = [
+        (re.compile(r'ordenado.*nombre'), 'name'),
+        (re.compile(r'ordenado.*fecha'), 'date'),
+        (re.compile(r'ordenado.*monto'), 'amount')
+    ]
+    LIMIT = re.compile(r'top\s+(\d+)')
     
     def __init__(self):
-        self.patterns = {
-            'ventas': r'(ventas?|sales?)',
-            'clientes': r'(clientes?|customers?)',
-            'productos': r'(productos?|products?)',
-            'fecha': r'(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre|\d{1,2}/\d{1,2}/\d{4})',
-            'periodo': r'(del|desde|hasta|al|entre)\s+(\d{1,2}/\d{1,2}/\d{4}|\d{1,2}/\d{1,2}/\d{4})',
-            'formato': r'(pdf|excel|pantalla|screen)',
-            'agrupacion': r'(agrupado|agrupadas?|por|grouped?)\s+(producto|cliente|fecha|mes|año)',
-            'orden': r'(ordenado|ordenadas?|por|order)\s+(nombre|fecha|monto|cantidad)',
-            'filtro': r'(top|mejores?|peores?)\s+(\d+)',
-            'comparacion': r'(comparar|comparar?|vs|versus)'
-        }
+        self._parse_cached = lru_cache(maxsize=self.PARSE_CACHE_SIZE)(self._parse)
+        # Día local actual y el instante (epoch) en que termina
+        self._today = None
+        self._today_ends_at = 0.0
     
     def parse_prompt(self, prompt: str) -> Dict[str, Any]:
         """Parsea un prompt y extrae los parámetros del reporte"""
-        prompt_lower = prompt.lower()
-        
+        result = self._parse_cached(prompt.lower(), self.today())
+        # Copia: quien llama puede modificar el resultado sin tocar el memorizado
+        return {**result, 'filters': dict(result['filters'])}
+    
+    def today(self) -> date:
+        """Día local actual; solo se recalcula al pasar la medianoche"""
+        if time.time() >= self._today_ends_at:
+            self._today = timezone.localdate()
+            self._today_ends_at = timezone.make_aware(
+                datetime.combine(self._today + timedelta(days=1), datetime.min.time())
+            ).timestamp()
+        return self._today
+    
+    @staticmethod
+    def load_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Parámetros guardados como JSON (Report.parameters) con sus fechas restauradas"""
+        params = {**parameters, 'filters': dict(parameters.get('filters') or {})}
+        if params.get('date_range'):
+            params['date_range'] = tuple(date.fromisoformat(day) for day in params['date_range'])
+        if params.get('specific_date'):
+            params['specific_date'] = date.fromisoformat(params['specific_date'])
+        return params
+    
+    @staticmethod
+    def month_range(year: int, month: int) -> Tuple[date, date]:
+        """Primer y último día de un mes"""
+        start_date = date(year, month, 1)
+        if month == 12:
+            end_date = date(year + 1, 1, 1) - timedelta(days=1)
+        else:
+            end_date = date(year, month + 1, 1) - timedelta(days=1)
+        return start_date, end_date
+    
+    def _parse(self, prompt_lower: str, today: date) -> Dict[str, Any]:
+        """Interpreta un prompt ya en minúsculas en relación con el día `today`"""
         result = {
             'type': 'sales',  # Por defecto
             'date_range': None,
@@ -46,374 +262,243 @@ class ReportPromptParser:
         }
         
         # Detectar tipo de reporte
-        if re.search(self.patterns['clientes'], prompt_lower):
+        if self.PATTERNS['clientes'].search(prompt_lower):
             result['type'] = 'clients'
-        elif re.search(self.patterns['productos'], prompt_lower):
+        elif self.PATTERNS['productos'].search(prompt_lower):
             result['type'] = 'products'
-        elif re.search(self.patterns['ventas'], prompt_lower):
+        elif self.PATTERNS['ventas'].search(prompt_lower):
             result['type'] = 'sales'
         
         # Detectar si se pide "todas" las ventas
-        if re.search(r'todas.*ventas|todas.*compras|listar.*ventas|mostrar.*ventas', prompt_lower):
+        if self.SHOW_ALL.search(prompt_lower):
             result['show_all'] = True
             result['limit'] = None  # Sin límite
         
         # Detectar formato
-        if re.search(r'pdf', prompt_lower):
+        if self.PDF.search(prompt_lower):
             result['format'] = 'pdf'
-        elif re.search(r'excel', prompt_lower):
+        elif self.EXCEL.search(prompt_lower):
             result['format'] = 'excel'
         
-        # Detectar fechas específicas (no rangos) - Formato: "el 18 de octubre"
-        specific_date_patterns = [
-            # Formato: "el 18 de octubre"
-            r'el\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-            # Formato: "18 de octubre"
-            r'(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)(?!\s+(hasta|al))',
-            # Formato: "del 18 de octubre"
-            r'del\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-            # Formato: "18/10/2025"
-            r'(\d{1,2}/\d{1,2}/\d{4})(?!\s+(al|hasta))'
-        ]
-        
-        # Detectar rango de fechas - Múltiples formatos
-        date_range_patterns = [
-            # Formato: "desde el 18 de octubre hasta el 19 de octubre"
-            r'desde\s+el?\s*(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+(hasta|al)\s+el?\s*(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-            # Formato: "18 de octubre hasta 19 de octubre"
-            r'(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+(hasta|al)\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-            # Formato: "18/10/2025 al 19/10/2025"
-            r'(\d{1,2}/\d{1,2}/\d{4})\s+(al|hasta)\s+(\d{1,2}/\d{1,2}/\d{4})',
-            # Formato: "desde 18 de octubre hasta 19 de octubre"
-            r'desde\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+(hasta|al)\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-            # Formato: "18 al 19 de octubre"
-            r'(\d{1,2})\s+(al|hasta)\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
-            # Formato: "del 18 de octubre hasta el 19 de octubre"
-            r'del\s+(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+(hasta|al)\s+el?\s*(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)'
-        ]
-        
         date_found = False
         
         # Primero intentar detectar fechas específicas (no rangos)
-        for pattern in specific_date_patterns:
-            date_match = re.search(pattern, prompt_lower)
+        for pattern, with_month_names in self.SPECIFIC_DATE_PATTERNS:
+            date_match = pattern.search(prompt_lower)
             if date_match:
                 try:
-                    if 'de' in pattern:  # Formato con nombres de meses
+                    if with_month_names:
                         day, month = date_match.groups()
-                        year = timezone.now().year
-                        
-                        month_names = {
-                            'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
-                            'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
-                            'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
-                        }
-                        
-                        specific_date = datetime(year, month_names[month], int(day)).date()
-                        result['specific_date'] = specific_date
-                        print(f"Fecha específica detectada: {specific_date}")
-                        date_found = True
-                        break
-                    else:  # Formato con números
+                        specific_date = date(today.year, MONTHS[month], int(day))
+                    else:
                         specific_date = datetime.strptime(date_match.group(1), '%d/%m/%Y').date()
-                        result['specific_date'] = specific_date
-                        print(f"Fecha específica detectada: {specific_date}")
-                        date_found = True
-                        break
+                    result['specific_date'] = specific_date
+                    logger.debug(f"Fecha específica detectada: {specific_date}")
+                    date_found = True
+                    break
                 except Exception as e:
-                    print(f"Error parseando fecha específica: {str(e)}")
+                    logger.debug(f"Error parseando fecha específica: {str(e)}")
                     continue
         
         # Si no se encontró fecha específica, intentar detectar rangos
         if not date_found:
-            for pattern in date_range_patterns:
-                date_match = re.search(pattern, prompt_lower)
+            for pattern, with_month_names in self.DATE_RANGE_PATTERNS:
+                date_match = pattern.search(prompt_lower)
                 if date_match:
                     try:
-                        if 'de' in pattern:  # Formato con nombres de meses
+                        if with_month_names:
                             if len(date_match.groups()) == 5:  # "desde X de Y hasta Z de W"
                                 day1, month1, _, day2, month2 = date_match.groups()
-                                year = timezone.now().year
                             elif len(date_match.groups()) == 4:  # "X de Y hasta Z de W" o "X al Y de Z"
                                 if 'al' in date_match.group(0) and 'hasta' not in date_match.group(0):
                                     day1, _, day2, month2 = date_match.groups()
                                     month1 = month2
-                                    year = timezone.now().year
                                 else:
                                     day1, month1, _, day2, month2 = date_match.groups()
-                                    year = timezone.now().year
                             else:  # "X al Y de Z"
                                 day1, _, day2, month2 = date_match.groups()
                                 month1 = month2
-                                year = timezone.now().year
                             
-                            month_names = {
-                                'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
-                                'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
-                                'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
-                            }
-                            
-                            start_date = datetime(year, month_names[month1], int(day1)).date()
-                            end_date = datetime(year, month_names[month2], int(day2)).date()
-                        else:  # Formato con números
+                            start_date = date(today.year, MONTHS[month1], int(day1))
+                            end_date = date(today.year, MONTHS[month2], int(day2))
+                        else:
                             start_date = datetime.strptime(date_match.group(1), '%d/%m/%Y').date()
                             end_date = datetime.strptime(date_match.group(3), '%d/%m/%Y').date()
                         
                         result['date_range'] = (start_date, end_date)
-                        print(f"Rango de fechas detectado: {start_date} a {end_date}")
+                        logger.debug(f"Rango de fechas detectado: {start_date} a {end_date}")
                         date_found = True
                         break
                     except Exception as e:
-                        print(f"Error parseando rango de fechas: {str(e)}")
+                        logger.debug(f"Error parseando rango de fechas: {str(e)}")
                         continue
         
         if not date_found:
-            month_patterns = {
-                'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
-                'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
-                'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
-            }
-            
-            # PRIMERO: Buscar meses específicos con múltiples patrones
-            # Prioridad: meses específicos sobre "mes actual"
+            # PRIMERO: Buscar meses específicos (tienen prioridad sobre "mes actual")
             detected_month = None
-            detected_month_num = None
-            
-            # Patrón 1: "de/del/en [mes]" - más común (ej: "ventas de octubre")
-            pattern1 = re.search(r'(?:^|\s)(?:de|del|en)\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)(?:\s|$|de|del)', prompt_lower)
-            if pattern1:
-                found_month = pattern1.group(1)
-                if found_month in month_patterns:
-                    detected_month = found_month
-                    detected_month_num = month_patterns[found_month]
-                    print(f"🔍 Patrón 1 detectado: '{found_month}' en '{prompt}'")
-            
-            # Patrón 2: "[mes] de/del" - menos común pero posible
-            if not detected_month:
-                pattern2 = re.search(r'(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+(?:de|del)(?:\s|$)', prompt_lower)
-                if pattern2:
-                    found_month = pattern2.group(1)
-                    if found_month in month_patterns:
-                        detected_month = found_month
-                        detected_month_num = month_patterns[found_month]
-                        print(f"🔍 Patrón 2 detectado: '{found_month}' en '{prompt}'")
-            
-            # Patrón 3: "[mes]" al final o solo - último recurso
-            if not detected_month:
-                pattern3 = re.search(r'(?:^|\s)(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)(?:\s|$)', prompt_lower)
-                if pattern3:
-                    found_month = pattern3.group(1)
-                    # Verificar que no sea parte de "mes actual"
-                    if found_month in month_patterns and not re.search(r'mes\s+actual|este\s+mes', prompt_lower):
-                        detected_month = found_month
-                        detected_month_num = month_patterns[found_month]
-                        print(f"🔍 Patrón 3 detectado: '{found_month}' en '{prompt}'")
+            for index, pattern in enumerate(self.MONTH_PATTERNS):
+                month_match = pattern.search(prompt_lower)
+                if not month_match:
+                    continue
+                # El último patrón no aplica si se habla del mes actual
+                if index == len(self.MONTH_PATTERNS) - 1 and self.CURRENT_MONTH_MENTION.search(prompt_lower):
+                    break
+                detected_month = month_match.group(1)
+                break
             
-            # Si se detectó un mes específico, usarlo (tiene prioridad)
             if detected_month:
-                current_year = timezone.now().year
-                start_date = datetime(current_year, detected_month_num, 1).date()
-                if detected_month_num == 12:
-                    end_date = datetime(current_year + 1, 1, 1).date() - timedelta(days=1)
-                else:
-                    end_date = datetime(current_year, detected_month_num + 1, 1).date() - timedelta(days=1)
-                result['date_range'] = (start_date, end_date)
-                print(f"✅ Mes específico detectado: {detected_month} ({detected_month_num}). Rango: {start_date} a {end_date}")
+                result['date_range'] = self.month_range(today.year, MONTHS[detected_month])
+                logger.debug(f"Mes específico detectado: {detected_month}. Rango: {result['date_range']}")
                 date_found = True
             
             # SOLO si NO se detectó un mes específico, buscar "mes actual"
-            if not date_found:
-                # Patrones para "mes actual" - solo si no hay mes específico
-                current_month_patterns = [
-                    r'(?:^|\s)mes\s+actual(?:\s|$)',
-                    r'(?:^|\s)este\s+mes(?:\s|$)',
-                    r'(?:^|\s)mes\s+corriente(?:\s|$)',
-                    r'(?:^|\s)mes\s+presente(?:\s|$)',
-                    r'current\s+month'
-                ]
-                
-                for pattern in current_month_patterns:
-                    if re.search(pattern, prompt_lower):
-                        now = timezone.now()
-                        current_year = now.year
-                        current_month = now.month
-                        start_date = datetime(current_year, current_month, 1).date()
-                        if current_month == 12:
-                            end_date = datetime(current_year + 1, 1, 1).date() - timedelta(days=1)
-                        else:
-                            end_date = datetime(current_year, current_month + 1, 1).date() - timedelta(days=1)
-                        result['date_range'] = (start_date, end_date)
-                        print(f"✅ Mes actual detectado ({current_month}). Rango: {start_date} a {end_date}")
-                        date_found = True
-                        break
+            elif any(pattern.search(prompt_lower) for pattern in self.CURRENT_MONTH_PATTERNS):
+                result['date_range'] = self.month_range(today.year, today.month)
+                logger.debug(f"Mes actual detectado. Rango: {result['date_range']}")
+                date_found = True
         
-        # Log si no se detectó ninguna fecha
         if not date_found:
-            print(f"⚠️ No se detectó ninguna fecha en el prompt: '{prompt}'")
-            print(f"   Se mostrarán TODAS las ventas (sin filtro de fecha)")
+            logger.debug(f"No se detectó ninguna fecha en el prompt '{prompt_lower}': sin filtro de fecha")
         
         # Detectar agrupación SOLO si se especifica explícitamente
-        if re.search(r'agrupado.*producto|agrupa.*producto|por producto', prompt_lower):
-            result['group_by'] = 'product'
-        elif re.search(r'agrupado.*cliente|agrupa.*cliente|por cliente', prompt_lower):
-            result['group_by'] = 'client'
-        elif re.search(r'agrupado.*fecha|agrupa.*fecha|por fecha', prompt_lower):
-            result['group_by'] = 'date'
-        # Si no se especifica agrupación, NO agrupar por defecto
+        for pattern, group_by in self.GROUP_BY_PATTERNS:
+            if pattern.search(prompt_lower):
+                result['group_by'] = group_by
+                break
         
         # Detectar ordenamiento
-        if re.search(r'ordenado.*nombre', prompt_lower):
-            result['order_by'] = 'name'
-        elif re.search(r'ordenado.*fecha', prompt_lower):
-            result['order_by'] = 'date'
-        elif re.search(r'ordenado.*monto', prompt_lower):
-            result['order_by'] = 'amount'
+        for pattern, order_by in self.ORDER_BY_PATTERNS:
+            if pattern.search(prompt_lower):
+                result['order_by'] = order_by
+                break
         
         # Detectar límite (top N)
-        limit_match = re.search(r'top\s+(\d+)', prompt_lower)
+        limit_match = self.LIMIT.search(prompt_lower)
         if limit_match:
             result['limit'] = int(limit_match.group(1))
         
         # Detectar comparación
-        if re.search(self.patterns['comparacion'], prompt_lower):
+        if self.PATTERNS['comparacion'].search(prompt_lower):
             result['comparison'] = True
         
         return result
-    
+
+
+# Parser compartido por todos los requests del proceso
+report_prompt_parser = ReportPromptParser()
+
 
 class DynamicReportGenerator:
     """Generador dinámico de reportes"""
     
+    # Filas por lote al recorrer los resultados con iterator()
+    CHUNK_SIZE = 2000
+    
     def __init__(self):
-        self.parser = ReportPromptParser()
+        self.parser = report_prompt_parser
     
-    def generate_report(self, prompt: str, format_type: str = 'screen') -> Dict[str, Any]:
+    def generate_report(self, prompt: str, format_type: str = 'screen') -> List[Dict]:
         """Genera un reporte basado en el prompt"""
-        parsed_params = self.parser.parse_prompt(prompt)
-        parsed_params['format'] = format_type
+        return list(self.stream_report(prompt, format_type))
+    
+    def stream_report(self, prompt: str, format_type: str = 'screen') -> Iterable[Dict]:
+        """
+        Filas del reporte a medida que se leen de la base de datos
+        
+        El prompt se interpreta de inmediato; las consultas se ejecutan al
+        recorrer el resultado, así los exportadores escriben fila por fila sin
+        cargar el reporte completo en memoria.
+        """
+        instrumentation = ReportInstrumentation()
+        
+        with instrumentation.stage('parse'):
+            parsed_params = self.parser.parse_prompt(prompt)
         
+        return self.stream_params(parsed_params, format_type, instrumentation)
+    
+    def stream_params(
+        self,
+        params: Dict[str, Any],
+        format_type: str = 'screen',
+        instrumentation: Optional[ReportInstrumentation] = None
+    ) -> Iterable[Dict]:
+        """Filas del reporte para parámetros ya interpretados (p. ej. los guardados en Report)"""
+        instrumentation = instrumentation or ReportInstrumentation()
+        parsed_params = {**params, 'format': format_type}
+        
+        with instrumentation.stage('cache'):
+            cache_key = ReportResultCache.key(parsed_params)
+            cached = ReportResultCache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Reporte servido desde caché: {cache_key}")
+            return cached
+        
+        # Los generadores no consultan hasta que se recorren: la consulta se mide
+        # en la etapa de filas
         if parsed_params['type'] == 'sales':
-            return self._generate_sales_report(parsed_params)
+            rows = self._generate_sales_report(parsed_params)
         elif parsed_params['type'] == 'clients':
-            return self._generate_clients_report(parsed_params)
+            rows = self._generate_clients_report(parsed_params)
         elif parsed_params['type'] == 'products':
-            return self._generate_products_report(parsed_params)
+            rows = self._generate_products_report(parsed_params)
         else:
-            return self._generate_sales_report(parsed_params)
+            rows = self._generate_sales_report(parsed_params)
+        
+        return self._cache_rows(instrumentation.rows(rows, parsed_params), cache_key, parsed_params)
+    
+    @staticmethod
+    def _cache_rows(rows: Iterable[Dict], cache_key: str, params: Dict[str, Any]) -> Iterator[Dict]:
+        """Entrega las filas y, si se recorrieron completas y sin errores, las guarda en caché"""
+        max_rows = getattr(settings, 'REPORTS_CACHE_MAX_ROWS', 5000)
+        collected = []
+        for row in rows:
+            if collected is not None:
+                if 'error' in row or len(collected) >= max_rows:
+                    collected = None
+                else:
+                    collected.append(row)
+            yield row
+        if collected is not None:
+            ReportResultCache.set(cache_key, collected, params)
     
-    def _generate_sales_report(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Genera reporte de ventas"""
-        print(f"Generando reporte de ventas con parámetros: {params}")
+    def _generate_sales_report(self, params: Dict[str, Any]) -> Iterable[Dict]:
+        """
+        Genera reporte de ventas
         
-        queryset = Sale.objects.select_related('client', 'user').prefetch_related('items__product')
-        print(f"Queryset inicial: {queryset.count()} ventas")
+        Solo arma el queryset filtrado: las consultas se ejecutan al recorrer
+        las filas (sin conteos ni muestras previas).
+        """
+        queryset = Sale.objects.all()
         
         # Aplicar filtros de fecha
         if params.get('specific_date'):
-            specific_date = params['specific_date']
-            print(f"Aplicando filtro de fecha específica: {specific_date}")
-            # Usar filtro de rango para un día específico con timezone
-            from datetime import timedelta
-            
-            start_datetime = timezone.make_aware(datetime.combine(specific_date, datetime.min.time()))
-            end_datetime = start_datetime + timedelta(days=1)
-            
-            print(f"Rango de filtro: {start_datetime} a {end_datetime}")
-            
-            queryset = queryset.filter(
-                created_at__gte=start_datetime,
-                created_at__lt=end_datetime
-            )
-            print(f"Después de filtro de fecha específica: {queryset.count()} ventas")
-            
-            # Verificar que el filtro se aplicó correctamente
-            if queryset.count() == 0:
-                print("⚠️ No se encontraron ventas en la fecha especificada")
-            else:
-                print(f"✅ Filtro aplicado correctamente: {queryset.count()} ventas encontradas")
+            start_datetime, end_datetime = self._date_bounds({
+                'date_range': (params['specific_date'], params['specific_date'])
+            })
         elif params.get('date_range'):
-            start_date, end_date = params['date_range']
-            print(f"📅 Aplicando filtro de rango de fechas: {start_date} a {end_date}")
-            print(f"   Tipo start_date: {type(start_date)}, Tipo end_date: {type(end_date)}")
-            
-            # Convertir fechas a datetime con timezone para filtrado correcto
-            # start_date debe ser el inicio del primer día del mes
-            start_datetime = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
-            
-            # end_date debe ser el inicio del primer día del mes siguiente (exclusivo)
-            # end_date ya es el último día del mes, así que sumamos 1 día para obtener el inicio del mes siguiente
-            if end_date.month == 12:
-                next_month_start = datetime(end_date.year + 1, 1, 1, 0, 0, 0)
-            else:
-                next_month_start = datetime(end_date.year, end_date.month + 1, 1, 0, 0, 0)
-            
-            end_datetime = timezone.make_aware(next_month_start)
-            
-            print(f"🔍 Rango de filtro (datetime):")
-            print(f"   Desde: {start_datetime} (inclusive)")
-            print(f"   Hasta: {end_datetime} (exclusivo)")
-            print(f"   Esto filtra desde {start_date} hasta {end_date} inclusive")
-            
-            # Obtener algunas ventas de ejemplo antes del filtro para debugging
-            sample_before = queryset.order_by('-created_at')[:5]
-            print(f"📊 Ejemplo de ventas antes del filtro (últimas 5):")
-            for sale in sample_before:
-                print(f"   - {sale.created_at.date()} ({sale.created_at}) - Total: {sale.total}")
-            
+            start_datetime, end_datetime = self._date_bounds(params)
+        else:
+            start_datetime = end_datetime = None
+        
+        if start_datetime:
             queryset = queryset.filter(
                 created_at__gte=start_datetime,
                 created_at__lt=end_datetime
             )
-            
-            count_after = queryset.count()
-            print(f"📊 Después de filtro de rango de fechas: {count_after} ventas")
-            
-            # Mostrar algunas ventas después del filtro para verificar
-            if count_after > 0:
-                sample_after = queryset.order_by('-created_at')[:5]
-                print(f"📊 Ejemplo de ventas después del filtro (últimas 5):")
-                for sale in sample_after:
-                    print(f"   - {sale.created_at.date()} ({sale.created_at}) - Total: {sale.total}")
-            
-            # Verificar que el filtro se aplicó correctamente
-            if count_after == 0:
-                print("⚠️ No se encontraron ventas en el rango de fechas especificado")
-                print(f"   Verificando si hay ventas en la base de datos...")
-                all_sales = Sale.objects.all()
-                print(f"   Total de ventas en BD: {all_sales.count()}")
-                if all_sales.exists():
-                    first_sale = all_sales.order_by('created_at').first()
-                    last_sale = all_sales.order_by('-created_at').first()
-                    print(f"   Primera venta: {first_sale.created_at.date()} ({first_sale.created_at})")
-                    print(f"   Última venta: {last_sale.created_at.date()} ({last_sale.created_at})")
-            else:
-                print(f"✅ Filtro aplicado correctamente: {count_after} ventas encontradas")
+            logger.debug(f"Reporte de ventas desde {start_datetime} hasta {end_datetime} (exclusivo)")
         
         # SOLO agrupar si se especifica explícitamente en el prompt
         if params.get('group_by') == 'product':
-            print("Agrupando por producto")
             return self._group_sales_by_product(queryset, params)
         elif params.get('group_by') == 'client':
-            print("Agrupando por cliente")
             return self._group_sales_by_client(queryset, params)
         else:
-            print("Listando TODAS las ventas sin agrupar")
             return self._get_sales_list(queryset, params)
     
-    def _group_sales_by_product(self, queryset, params: Dict[str, Any]) -> List[Dict]:
-        """Agrupa ventas por producto usando el queryset filtrado"""
-        from django.db.models import Sum, Count, F
-        
-        # Obtener los IDs de las ventas del queryset filtrado
-        sale_ids = list(queryset.values_list('id', flat=True))
-        
-        if not sale_ids:
-            return []
-        
-        # Agrupar por producto usando los IDs filtrados
-        from apps.sales.models import SaleItem
+    def _group_sales_by_product(self, queryset, params: Dict[str, Any]) -> Iterator[Dict]:
+        """Agrupa ventas por producto usando el queryset filtrado (como subconsulta)"""
         results = SaleItem.objects.filter(
-            sale_id__in=sale_ids
+            sale__in=queryset.values('id')
         ).values(
             'product__name', 'product__sku'
         ).annotate(
@@ -422,27 +507,20 @@ class DynamicReportGenerator:
             numero_ventas=Count('sale_id', distinct=True)
         ).order_by('-total_vendido')
         
-        # Convertir a formato de diccionario
-        formatted_results = []
-        for item in results:
-            formatted_results.append({
+        if params.get('limit'):
+            results = results[:params['limit']]
+        
+        for item in results.iterator(chunk_size=self.CHUNK_SIZE):
+            yield {
                 'producto': item['product__name'],
                 'sku': item['product__sku'],
                 'cantidad_vendida': item['cantidad_vendida'],
                 'total_vendido': float(item['total_vendido'] or 0),
                 'numero_ventas': item['numero_ventas']
-            })
-        
-        if params.get('limit'):
-            formatted_results = formatted_results[:params['limit']]
-        
-        return formatted_results
+            }
     
-    def _group_sales_by_client(self, queryset, params: Dict[str, Any]) -> List[Dict]:
+    def _group_sales_by_client(self, queryset, params: Dict[str, Any]) -> Iterator[Dict]:
         """Agrupa ventas por cliente usando el queryset filtrado"""
-        from django.db.models import Sum, Count, Min, Max
-        
-        # Agrupar por cliente usando el queryset filtrado
         results = queryset.values(
             'client__name', 'client__email'
         ).annotate(
@@ -452,123 +530,213 @@ class DynamicReportGenerator:
             ultima_compra=Max('created_at')
         ).order_by('-monto_total')
         
-        # Convertir a formato de diccionario
-        formatted_results = []
-        for item in results:
-            formatted_results.append({
+        if params.get('limit'):
+            results = results[:params['limit']]
+        
+        for item in results.iterator(chunk_size=self.CHUNK_SIZE):
+            yield {
                 'cliente': item['client__name'] or 'Anónimo',
                 'email': item['client__email'] or '',
                 'numero_compras': item['numero_compras'],
                 'monto_total': float(item['monto_total']),
-                'primera_compra': item['primera_compra'].strftime('%d/%m/%Y') if item['primera_compra'] else 'N/A',
-                'ultima_compra': item['ultima_compra'].strftime('%d/%m/%Y') if item['ultima_compra'] else 'N/A'
-            })
-        
-        if params.get('limit'):
-            formatted_results = formatted_results[:params['limit']]
-        
-        return formatted_results
+                'primera_compra': timezone.localtime(item['primera_compra']).strftime('%d/%m/%Y') if item['primera_compra'] else 'N/A',
+                'ultima_compra': timezone.localtime(item['ultima_compra']).strftime('%d/%m/%Y') if item['ultima_compra'] else 'N/A'
+            }
     
-    def _get_sales_list(self, queryset, params: Dict[str, Any]) -> List[Dict]:
-        """Obtiene lista de ventas"""
+    def _get_sales_list(self, queryset, params: Dict[str, Any]) -> Iterator[Dict]:
+        """
+        Lista de ventas, de la más reciente a la más antigua
+        
+        Solo se leen las columnas que se muestran y los productos de cada venta
+        llegan concatenados en la misma consulta (subconsulta agregada), que se
+        recorre por lotes con el LIMIT aplicado en SQL.
+        """
         try:
-            print(f"Procesando {queryset.count()} ventas...")
-            sales_data = []
-            
-            # Ordenar por fecha más reciente primero
-            queryset = queryset.order_by('-created_at')
+            item_names = SaleItem.objects.filter(sale=OuterRef('pk')).values('sale').annotate(
+                names=GroupConcat(Concat(
+                    'product__name', Value(' (x'), Cast('quantity', CharField()), Value(')'),
+                    output_field=CharField()
+                ))
+            ).values('names')
             
-            for sale in queryset:
-                # Obtener productos de la venta
-                products = []
-                for item in sale.items.all():
-                    products.append(f"{item.product.name} (x{item.quantity})")
-                
-                sales_data.append({
-                    'id': str(sale.id),
-                    'cliente': sale.client.name if sale.client else 'Anónimo',
-                    'fecha': sale.created_at.strftime('%d/%m/%Y %H:%M'),
-                    'total': float(sale.total),
-                    'estado': sale.status,
-                    'metodo_pago': sale.payment_status,
-                    'productos': products
-                })
-            
-            print(f"Procesadas {len(sales_data)} ventas")
+            queryset = queryset.order_by('-created_at').values(
+                'id', 'client__name', 'created_at', 'total', 'status', 'payment_status'
+            ).annotate(productos=Subquery(item_names))
             
             # Solo aplicar límite si se especifica explícitamente Y no se pide "todas"
             if params.get('limit') and not params.get('show_all'):
-                sales_data = sales_data[:params['limit']]
-                print(f"Limitadas a {len(sales_data)} ventas")
-            elif params.get('show_all'):
-                print(f"Mostrando TODAS las {len(sales_data)} ventas")
+                queryset = queryset[:params['limit']]
             
-            return sales_data
+            for sale in queryset.iterator(chunk_size=self.CHUNK_SIZE):
+                yield {
+                    'id': str(sale['id']),
+                    'cliente': sale['client__name'] or 'Anónimo',
+                    'fecha': timezone.localtime(sale['created_at']).strftime('%d/%m/%Y %H:%M'),
+                    'total': float(sale['total']),
+                    'estado': sale['status'],
+                    'metodo_pago': sale['payment_status'],
+                    'productos': sale['productos'].split(GroupConcat.SEPARATOR) if sale['productos'] else []
+                }
         except Exception as e:
-            print(f"Error obteniendo lista de ventas: {str(e)}")
-            return [{"error": f"Error obteniendo ventas: {str(e)}"}]
+            logger.error(f"Error obteniendo lista de ventas: {str(e)}", exc_info=True)
+            yield {"error": f"Error obteniendo ventas: {str(e)}"}
+    
+    @staticmethod
+    def _date_bounds(params: Dict[str, Any]) -> Optional[Tuple[datetime, datetime]]:
+        """Inicio (inclusive) y fin (exclusivo) del rango de fechas pedido, en hora local"""
+        if not params.get('date_range'):
+            return None
+        start_date, end_date = params['date_range']
+        return (
+            timezone.make_aware(datetime.combine(start_date, datetime.min.time())),
+            timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        )
     
-    def _generate_clients_report(self, params: Dict[str, Any]) -> List[Dict]:
-        """Genera reporte de clientes"""
+    def _generate_clients_report(self, params: Dict[str, Any]) -> Iterator[Dict]:
+        """
+        Genera reporte de clientes en una sola consulta agregada
+        
+        El rango de fechas se aplica dentro de los agregados (no en el WHERE)
+        para que los clientes sin compras en el período sigan apareciendo.
+        """
         try:
-            queryset = Client.objects.all()
-            
-            clients_data = []
-            for client in queryset:
-                # Obtener ventas del cliente usando la relación inversa correcta
-                client_sales = Sale.objects.filter(client=client)
-                
-                # Aplicar filtros de fecha si existen
-                if params.get('date_range'):
-                    start_date, end_date = params['date_range']
-                    client_sales = client_sales.filter(created_at__date__range=[start_date, end_date])
-                
-                total_purchases = client_sales.count()
-                total_amount = sum(sale.total for sale in client_sales)
-                
-                clients_data.append({
-                    'nombre': client.name,
-                    'email': client.email,
-                    'telefono': client.phone,
-                    'total_compras': total_purchases,
-                    'monto_total': float(total_amount),
-                    'ultima_compra': client.last_purchase_date.strftime('%d/%m/%Y') if client.last_purchase_date else 'Nunca'
-                })
+            in_range = Q()
+            bounds = self._date_bounds(params)
+            if bounds:
+                in_range = Q(sale__created_at__gte=bounds[0], sale__created_at__lt=bounds[1])
             
+            queryset = Client.objects.annotate(
+                total_compras=Count('sale', filter=in_range),
+                monto_total=Coalesce(Sum('sale__total', filter=in_range), Value(Decimal('0')), output_field=DecimalField()),
+                ultima_compra=Max('sale__created_at')
+            ).order_by('-monto_total', 'name').values(
+                'name', 'email', 'phone', 'total_compras', 'monto_total', 'ultima_compra'
+            )
             if params.get('limit'):
-                clients_data = clients_data[:params['limit']]
+                queryset = queryset[:params['limit']]
             
-            return clients_data
+            for client in queryset.iterator(chunk_size=self.CHUNK_SIZE):
+                yield {
+                    'nombre': client['name'],
+                    'email': client['email'],
+                    'telefono': client['phone'],
+                    'total_compras': client['total_compras'],
+                    'monto_total': float(client['monto_total']),
+                    'ultima_compra': timezone.localtime(client['ultima_compra']).strftime('%d/%m/%Y') if client['ultima_compra'] else 'Nunca'
+                }
         except Exception as e:
-            print(f"Error generando reporte de clientes: {str(e)}")
-            return [{"error": f"Error generando reporte de clientes: {str(e)}"}]
-    
-    def _generate_products_report(self, params: Dict[str, Any]) -> List[Dict]:
-        """Genera reporte de productos"""
-        queryset = Product.objects.filter(is_active=True)
-        
-        products_data = []
-        for product in queryset:
-            # Obtener estadísticas de ventas
-            sales_stats = SaleItem.objects.filter(
-                product=product,
-                sale__created_at__date__range=params['date_range'] if params['date_range'] else [None, None]
-            ).aggregate(
-                total_sold=Sum('quantity'),
-                total_revenue=Sum('quantity') * Sum('price')
+            logger.error(f"Error generando reporte de clientes: {str(e)}", exc_info=True)
+            yield {"error": f"Error generando reporte de clientes: {str(e)}"}
+    
+    def _generate_products_report(self, params: Dict[str, Any]) -> Iterator[Dict]:
+        """Genera reporte de productos activos (una sola consulta agrupada)"""
+        start, end = self._date_bounds(params) or (None, None)
+        queryset = ProductSalesService.product_totals(start, end).filter(
+            is_active=True
+        ).order_by('-revenue', 'name')
+        if params.get('limit'):
+            queryset = queryset[:params['limit']]
+        
+        for product in queryset.iterator(chunk_size=self.CHUNK_SIZE):
+            yield {
+                'nombre': product['name'],
+                'sku': product['sku'],
+                'precio': float(product['price']),
+                'stock': product['stock'],
+                'categoria': product['category__name'] or 'Sin categoría',
+                'unidades_vendidas': product['units_sold'],
+                'ingresos': float(product['revenue'])
+            }
+
+
+class ReportJobService:
+    """
+    Reportes en segundo plano sobre el ciclo de vida de Report
+    
+    El request solo registra el Report (pendiente) y encola el evento
+    `report_generation`; el worker del outbox ejecuta la consulta, escribe el
+    archivo y actualiza el estado, que el cliente consulta para descargarlo.
+    """
+    
+    # Formato pedido -> formato del archivo (Report.format)
+    FILE_FORMATS = {'pdf': 'pdf', 'excel': 'excel', 'csv': 'csv', 'screen': 'json', 'json': 'json'}
+    # Igual al máximo de intentos por defecto de los eventos del outbox
+    MAX_ATTEMPTS = 5
+    
+    @staticmethod
+    def submit(user, prompt: str, format_type: str = 'pdf', source: str = 'text') -> Report:
+        """Registra el reporte y lo encola; retorna el Report pendiente"""
+        file_format = ReportJobService.FILE_FORMATS.get(format_type)
+        if not file_format:
+            raise ValueError(
+                f"Formato no soportado: {format_type} (disponibles: {', '.join(ReportJobService.FILE_FORMATS)})"
             )
-            
-            products_data.append({
-                'nombre': product.name,
-                'sku': product.sku,
-                'precio': float(product.price),
-                'stock': product.stock,
-                'categoria': product.category.name if product.category else 'Sin categoría',
-                'unidades_vendidas': sales_stats['total_sold'] or 0,
-                'ingresos': float(sales_stats['total_revenue'] or 0)
-            })
         
-        if params['limit']:
-            products_data = products_data[:params['limit']]
+        params = report_prompt_parser.parse_prompt(prompt)
+        with transaction.atomic():
+            report = Report.objects.create(
+                name=prompt[:200],
+                report_type=params['type'],
+                format=file_format,
+                status='pending',
+                # Fechas como texto ISO para el JSONField
+                parameters=json.loads(json.dumps(params, default=str)),
+                prompt=prompt,
+                source=source if source in ('text', 'voice') else 'text',
+                user=user
+            )
+            OutboxService.enqueue('report_generation', {'report_id': str(report.id)})
+        
+        return report
+    
+    @staticmethod
+    def run(report_id: str, retry_transient: bool = True) -> Report:
+        """
+        Genera el archivo de un reporte encolado y actualiza su estado
+        
+        Ante una falla transitoria, con `retry_transient` el reporte sigue en
+        'processing' y se relanza la excepción para que el outbox reintente con
+        backoff; al agotar MAX_ATTEMPTS (o sin `retry_transient`) el reporte
+        queda como fallido.
+        """
+        report = Report.objects.get(id=report_id)
+        if report.status in ('completed', 'failed'):
+            return report
+        
+        report.status = 'processing'
+        report.attempts += 1
+        report.save(update_fields=['status', 'attempts', 'updated_at'])
         
-        return products_data
\ No newline at end of file
+        try:
+            # Los parámetros guardados al encolar: "este mes" es el mes en que se pidió
+            generator = DynamicReportGenerator()
+            if report.parameters:
+                rows = generator.stream_params(report_prompt_parser.load_parameters(report.parameters), report.format)
+            else:
+                rows = generator.stream_report(report.prompt, report.format)
+            url = EXPORTERS[report.format].export_report(rows, report.prompt)
+            if not url:
+                raise ValueError(f"No se pudo generar el archivo {report.format}")
+            
+            report.file_path = url[len(settings.MEDIA_URL):] if url.startswith(settings.MEDIA_URL) else url
+            report.file_size = default_storage.size(report.file_path)
+            report.generated_at = timezone.now()
+            report.status = 'completed'
+            report.error_message = ''
+        except Exception as e:
+            if isinstance(e, TRANSIENT_ERRORS) and retry_transient and report.attempts < ReportJobService.MAX_ATTEMPTS:
+                logger.warning(f"Intento {report.attempts} del reporte {report.id} falló, se reintentará: {e}")
+                report.error_message = f"Intento {report.attempts} falló, se reintentará: {e}"
+                report.save(update_fields=['error_message', 'updated_at'])
+                raise
+            logger.error(f"Error generando reporte {report.id}: {e}")
+            report.status = 'failed'
+            report.error_message = str(e)
+        
+        report.save()
+        return report
+
+
+def handle_report_generation(payload: Dict[str, Any]):
+    """Handler del outbox: genera un reporte encolado"""
+    ReportJobService.run(payload['report_id'])
@@ -0,0 +1,39 @@
+"""
+Señales de reportes: renuevan la marca de agua del caché de resultados cuando
+cambian ventas, productos o clientes
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.clients.models import Client
+from apps.products.models import Product
+from apps.sales.models import Sale, SaleItem
+from .result_cache import ReportResultCache
+
+
+def _bump_on_commit(*scopes: str):
+    # Tras el commit, para que nadie guarde un resultado sin el cambio bajo la marca nueva
+    transaction.on_commit(lambda: ReportResultCache.bump(*scopes))
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+def invalidate_sales_reports(sender, instance, **kwargs):
+    """Las ventas de días anteriores también invalidan los períodos cerrados"""
+    created_at = instance.created_at if sender is Sale else instance.sale.created_at
+    if created_at and timezone.localdate(created_at) < timezone.localdate():
+        _bump_on_commit('live', 'history')
+    else:
+        _bump_on_commit('live')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_catalog_reports(sender, instance, **kwargs):
+    """Nombres de productos y clientes aparecen también en reportes históricos"""
+    _bump_on_commit('live', 'history')
@@ -0,0 +1,393 @@
+"""
+Pruebas del caché de resultados y de los reportes en segundo plano
+"""
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from apps.clients.models import Client
+from apps.products.models import Category, Product
+from apps.sales.models import Sale, SaleItem
+from .exporters import CSVExporter
+from .models import Report
+from .result_cache import ReportResultCache
+from .services import DynamicReportGenerator, ReportJobService, ReportPromptParser
+
+
+class ReportResultCacheTests(TestCase):
+    """Los resultados guardados dejan de servirse cuando cambian las ventas"""
+
+    def setUp(self):
+        cache.clear()
+        ReportResultCache.store().clear()
+        self.client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+        today = timezone.localdate()
+        self.params = {'type': 'sales', 'date_range': [today, today], 'format': 'screen'}
+
+    def create_sale(self, total):
+        return Sale.objects.create(
+            client=self.client_record,
+            subtotal=Decimal(total),
+            total=Decimal(total),
+            status='completed'
+        )
+
+    def rows(self):
+        return list(DynamicReportGenerator().stream_params(self.params))
+
+    def test_result_is_cached(self):
+        self.create_sale('100.00')
+
+        rows = self.rows()
+
+        self.assertEqual(ReportResultCache.get(ReportResultCache.key(self.params)), rows)
+
+    def test_sale_save_invalidates_cached_result(self):
+        self.assertEqual(self.rows(), [])
+        old_key = ReportResultCache.key(self.params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_sale('100.00')
+
+        self.assertNotEqual(ReportResultCache.key(self.params), old_key)
+        self.assertIsNone(ReportResultCache.get(ReportResultCache.key(self.params)))
+        self.assertEqual(len(self.rows()), 1)
+
+    def test_closed_periods_survive_today_sales(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        params = {'type': 'sales', 'date_range': [yesterday, yesterday], 'format': 'screen'}
+        list(DynamicReportGenerator().stream_params(params))
+        key = ReportResultCache.key(params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_sale('100.00')
+
+        self.assertEqual(ReportResultCache.key(params), key)
+        self.assertEqual(ReportResultCache.get(key), [])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'reports-eviction-tests',
+        'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2},
+    },
+})
+class ReportResultCacheEvictionTests(TestCase):
+    """Al llenarse, el caché expulsa solo el resultado usado hace más tiempo"""
+
+    def setUp(self):
+        caches['reports'].clear()
+        today = timezone.localdate()
+        self.params = [
+            {'type': 'sales', 'date_range': [today - timedelta(days=days), today], 'format': 'screen'}
+            for days in range(3)
+        ]
+        self.keys = [ReportResultCache.key(params) for params in self.params]
+
+    def store(self, index):
+        ReportResultCache.set(self.keys[index], [{'reporte': index}], self.params[index])
+
+    def test_least_recently_used_result_is_evicted(self):
+        self.store(0)
+        self.store(1)
+        # Leer el primero lo vuelve el más reciente
+        self.assertEqual(ReportResultCache.get(self.keys[0]), [{'reporte': 0}])
+
+        self.store(2)
+
+        self.assertEqual(ReportResultCache.get(self.keys[0]), [{'reporte': 0}])
+        self.assertIsNone(ReportResultCache.get(self.keys[1]))
+        self.assertEqual(ReportResultCache.get(self.keys[2]), [{'reporte': 2}])
+
+    def test_hot_result_survives_many_one_off_reports(self):
+        self.store(0)
+        for index in (1, 2, 1, 2):
+            self.assertIsNotNone(ReportResultCache.get(self.keys[0]))
+            self.store(index)
+
+        self.assertEqual(ReportResultCache.get(self.keys[0]), [{'reporte': 0}])
+
+
+class ReportJobServiceTests(TestCase):
+    """Ciclo de vida de un Report generado por el worker"""
+
+    def setUp(self):
+        cache.clear()
+        ReportResultCache.store().clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            username='reportes', email='reportes@example.com', password='secreto'
+        )
+        client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+        Sale.objects.create(
+            client=client_record,
+            subtotal=Decimal('100.00'),
+            total=Decimal('100.00'),
+            status='completed'
+        )
+
+    def test_pending_report_is_completed(self):
+        report = ReportJobService.submit(self.user, 'ventas de hoy', 'csv')
+        self.assertEqual(report.status, 'pending')
+
+        report = ReportJobService.run(report.id)
+
+        self.assertEqual(report.status, 'completed')
+        self.assertTrue(report.file_path.startswith('reports/'))
+        self.assertGreater(report.file_size, 0)
+        self.assertIsNotNone(report.generated_at)
+
+    def test_export_failure_marks_report_failed(self):
+        report = ReportJobService.submit(self.user, 'ventas de hoy', 'csv')
+
+        with mock.patch.object(CSVExporter, 'export_report', return_value=None):
+            report = ReportJobService.run(report.id)
+
+        self.assertEqual(report.status, 'failed')
+        self.assertIn('csv', report.error_message)
+
+    def test_transient_failure_keeps_report_processing(self):
+        report = ReportJobService.submit(self.user, 'ventas de hoy', 'csv')
+
+        with mock.patch.object(CSVExporter, 'export_report', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                ReportJobService.run(report.id)
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'processing')
+        self.assertEqual(report.attempts, 1)
+
+        # El siguiente intento del outbox lo completa
+        report = ReportJobService.run(report.id)
+        self.assertEqual(report.status, 'completed')
+        self.assertEqual(report.attempts, 2)
+
+    def test_transient_failure_fails_after_last_attempt(self):
+        report = ReportJobService.submit(self.user, 'ventas de hoy', 'csv')
+
+        with mock.patch.object(CSVExporter, 'export_report', side_effect=OSError('disco lleno')):
+            for _ in range(ReportJobService.MAX_ATTEMPTS - 1):
+                with self.assertRaises(OSError):
+                    ReportJobService.run(report.id)
+            report = ReportJobService.run(report.id)
+
+        self.assertEqual(report.status, 'failed')
+        self.assertEqual(report.attempts, ReportJobService.MAX_ATTEMPTS)
+        self.assertIn('disco lleno', report.error_message)
+
+    def test_processed_report_is_not_generated_again(self):
+        report = ReportJobService.submit(self.user, 'ventas de hoy', 'csv')
+        ReportJobService.run(report.id)
+
+        with mock.patch.object(CSVExporter, 'export_report') as export_report:
+            report = ReportJobService.run(report.id)
+
+        export_report.assert_not_called()
+        self.assertEqual(report.status, 'completed')
+
+
+class ReportViewsTests(APITestCase):
+    """Parámetros inválidos del historial y la descarga responden sin error del servidor"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='reportes', email='reportes@example.com', password='secreto'
+        )
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            Report.objects.create(name='Reporte', report_type='sales', format='csv', user=self.user)
+
+    def test_history_limit_must_be_a_number(self):
+        response = self.client.get('/api/v1/reports/history/', {'limit': 'todos'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_limit_is_clamped(self):
+        self.assertEqual(len(self.client.get('/api/v1/reports/history/', {'limit': -5}).data), 1)
+        self.assertEqual(len(self.client.get('/api/v1/reports/history/', {'limit': 1000}).data), 3)
+
+    def test_download_with_invalid_id_is_not_found(self):
+        response = self.client.post('/api/v1/reports/download/', {'report_id': 'no-es-un-uuid'}, format='json')
+
+        self.assertEqual(response.status_code, 404)
+
+
+def create_sale(client_record, items=(), days_ago=0, total='100.00'):
+    """Venta completada con (producto, cantidad, precio) y fecha `days_ago` días atrás"""
+    sale = Sale.objects.create(
+        client=client_record, subtotal=Decimal(total), total=Decimal(total), status='completed'
+    )
+    for product, quantity, price in items:
+        SaleItem.objects.create(sale=sale, product=product, quantity=quantity, price=Decimal(price))
+    if days_ago:
+        Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+    return sale
+
+
+class ClientsReportTests(TestCase):
+    """Reporte de clientes en una consulta con el rango de fechas dentro de los agregados"""
+
+    def setUp(self):
+        cache.clear()
+        ReportResultCache.store().clear()
+        self.recent = Client.objects.create(name='Reciente', email='reciente@example.com')
+        self.old = Client.objects.create(name='Antiguo', email='antiguo@example.com')
+        create_sale(self.recent, total='50.00')
+        create_sale(self.recent, total='70.00')
+        create_sale(self.old, days_ago=60, total='500.00')
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            rows = list(DynamicReportGenerator()._generate_clients_report({}))
+
+        self.assertEqual([row['nombre'] for row in rows], ['Antiguo', 'Reciente'])
+        self.assertEqual(rows[1]['total_compras'], 2)
+        self.assertEqual(rows[1]['monto_total'], 120.0)
+
+    def test_date_range_keeps_clients_without_purchases(self):
+        today = timezone.localdate()
+
+        rows = {
+            row['nombre']: row
+            for row in DynamicReportGenerator()._generate_clients_report({'date_range': (today - timedelta(days=7), today)})
+        }
+
+        self.assertEqual(rows['Reciente']['monto_total'], 120.0)
+        self.assertEqual(rows['Antiguo']['total_compras'], 0)
+        self.assertEqual(rows['Antiguo']['monto_total'], 0.0)
+        # La última compra no depende del rango
+        self.assertNotEqual(rows['Antiguo']['ultima_compra'], 'Nunca')
+
+
+class ProductsReportTests(TestCase):
+    """Reporte de productos agrupado en SQL con ingresos por item"""
+
+    def setUp(self):
+        category = Category.objects.create(name='General')
+        self.sold, self.unsold = [
+            Product.objects.create(
+                name=name, description='', sku=name, price=Decimal('10.00'), cost=Decimal('6.00'),
+                stock=100, category=category
+            )
+            for name in ('Vendido', 'Sin ventas')
+        ]
+        client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+        create_sale(client_record, [(self.sold, 2, '10.00')])
+        create_sale(client_record, [(self.sold, 1, '15.00')])
+
+    def test_revenue_is_quantity_times_price_per_item(self):
+        with self.assertNumQueries(1):
+            rows = {row['nombre']: row for row in DynamicReportGenerator()._generate_products_report({})}
+
+        # 2 × 10 + 1 × 15, no (2 + 1) × (10 + 15)
+        self.assertEqual(rows['Vendido']['ingresos'], 35.0)
+        self.assertEqual(rows['Vendido']['unidades_vendidas'], 3)
+
+    def test_unsold_products_are_included(self):
+        rows = {row['nombre']: row for row in DynamicReportGenerator()._generate_products_report({})}
+
+        self.assertEqual(rows['Sin ventas']['unidades_vendidas'], 0)
+        self.assertEqual(rows['Sin ventas']['ingresos'], 0.0)
+
+
+class SalesListTests(TestCase):
+    """Lista de ventas con el LIMIT en SQL y los productos en la misma consulta"""
+
+    def setUp(self):
+        category = Category.objects.create(name='General')
+        product = Product.objects.create(
+            name='Café', description='', sku='CAFE', price=Decimal('10.00'), cost=Decimal('6.00'),
+            stock=100, category=category
+        )
+        client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+        for days_ago in range(5):
+            create_sale(client_record, [(product, days_ago + 1, '10.00')], days_ago=days_ago)
+
+    def test_limit_is_applied_in_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(DynamicReportGenerator()._get_sales_list(Sale.objects.all(), {'limit': 2}))
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 2', queries[0]['sql'].upper())
+        self.assertEqual(len(rows), 2)
+        # De la más reciente a la más antigua, con sus productos
+        self.assertEqual(rows[0]['productos'], ['Café (x1)'])
+        self.assertEqual(rows[1]['productos'], ['Café (x2)'])
+
+    def test_show_all_ignores_limit(self):
+        rows = list(DynamicReportGenerator()._get_sales_list(Sale.objects.all(), {'limit': 2, 'show_all': True}))
+
+        self.assertEqual(len(rows), 5)
+
+
+class SalesReportTests(TestCase):
+    """El reporte de ventas solo ejecuta las consultas que producen filas"""
+
+    def setUp(self):
+        client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+        create_sale(client_record)
+        create_sale(client_record, days_ago=30)
+
+    def test_single_query_without_counts(self):
+        today = timezone.localdate()
+
+        with self.assertNumQueries(1):
+            rows = list(DynamicReportGenerator()._generate_sales_report({'date_range': (today, today)}))
+
+        self.assertEqual(len(rows), 1)
+
+    def test_empty_range_runs_no_extra_queries(self):
+        empty_day = timezone.localdate() - timedelta(days=10)
+
+        with self.assertNumQueries(1):
+            rows = list(DynamicReportGenerator()._generate_sales_report({'specific_date': empty_day}))
+
+        self.assertEqual(rows, [])
+
+class ReportPromptParserTests(TestCase):
+    """Parser precompilado con resultados memorizados por prompt y día"""
+
+    def setUp(self):
+        self.parser = ReportPromptParser()
+
+    def test_repeated_prompt_is_memoized(self):
+        first = self.parser.parse_prompt('Ventas de este mes')
+        first['filters']['modificado'] = True
+
+        second = self.parser.parse_prompt('ventas de ESTE mes')
+
+        self.assertEqual(self.parser._parse_cached.cache_info().hits, 1)
+        self.assertEqual(second['filters'], {})
+        self.assertEqual(second['type'], 'sales')
+
+    def test_relative_dates_follow_midnight(self):
+        clock = mock.Mock()
+        clock.time.return_value = 0.0
+        with mock.patch('apps.reports.services.time', clock):
+            with mock.patch('apps.reports.services.timezone.localdate', return_value=date(2025, 10, 31)):
+                october = self.parser.parse_prompt('ventas de este mes')
+                # Antes de la medianoche el día no se vuelve a calcular
+                clock.time.return_value = self.parser._today_ends_at - 1
+                self.assertEqual(self.parser.parse_prompt('ventas de este mes'), october)
+
+            clock.time.return_value = self.parser._today_ends_at
+            with mock.patch('apps.reports.services.timezone.localdate', return_value=date(2025, 11, 1)):
+                november = self.parser.parse_prompt('ventas de este mes')
+
+        self.assertEqual(october['date_range'], (date(2025, 10, 1), date(2025, 10, 31)))
+        self.assertEqual(november['date_range'], (date(2025, 11, 1), date(2025, 11, 30)))
@@ -10,4 +10,5 @@ urlpatterns = [
     path('templates/', views.get_report_templates, name='report_templates'),
     path('history/', views.get_report_history, name='report_history'),
     path('download/', views.download_report, name='download_report'),
+    path('jobs/<uuid:report_id>/', views.report_job_status, name='report_job_status'),
 ]
\ No newline at end of file
@@ -1,11 +1,16 @@
 """
 Vistas para generación de reportes
 """
+import os
 import json
+import logging
 import io
 import csv
+import uuid
 from datetime import datetime
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -13,8 +18,26 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from .services import DynamicReportGenerator
-from .exporters import PDFExporter, ExcelExporter
+from .models import Report
+from .serializers import ReportSerializer
+from .services import DynamicReportGenerator, ReportJobService
+from .exporters import EXPORTERS, split_rows
+
+logger = logging.getLogger(__name__)
+
+# Filas del reporte que se devuelven en la respuesta cuando se genera un archivo
+PREVIEW_ROWS = 100
+
+# Máximo de reportes que devuelve el historial por solicitud
+MAX_HISTORY_LIMIT = 200
+
+
+def with_preview(rows, preview):
+    """Entrega las filas al exportador guardando las primeras PREVIEW_ROWS en `preview`"""
+    for row in rows:
+        if len(preview) < PREVIEW_ROWS:
+            preview.append(row)
+        yield row
 
 
 @api_view(['GET'])
@@ -42,15 +65,41 @@ def generate_report(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generar reporte real
+        # Archivos en segundo plano: se responde de inmediato con el id del reporte
+        if str(data.get('async', '')).strip().lower() in ('true', '1', 'yes', 'on') or (
+            format_type in EXPORTERS and getattr(settings, 'REPORTS_ASYNC_EXPORTS', False)
+        ):
+            if not request.user.is_authenticated:
+                return Response(
+                    {'error': 'Se requiere autenticación para generar reportes en segundo plano'},
+                    status=status.HTTP_401_UNAUTHORIZED
+                )
+            try:
+                report = ReportJobService.submit(
+                    request.user, prompt, format_type, source=data.get('source', 'text')
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            return Response({
+                'success': True,
+                'report_id': str(report.id),
+                'status': report.status,
+                'format': report.format,
+                'prompt': prompt,
+                'message': f'Reporte encolado. Consulta su estado en /api/v1/reports/jobs/{report.id}/'
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        # Generar reporte real. Las filas se leen a medida que se recorren, así
+        # que se toma la primera aquí para que los errores de la consulta caigan
+        # en el respaldo y no dentro del exportador
         try:
             generator = DynamicReportGenerator()
-            report_data = generator.generate_report(prompt, format_type)
-            print(f"Reporte generado exitosamente: {len(report_data) if isinstance(report_data, list) else 'No es lista'}")
+            _, report_rows = split_rows(generator.stream_report(prompt, format_type))
         except Exception as e:
-            print(f"Error en generador: {str(e)}")
+            logger.error(f"Error en generador: {str(e)}", exc_info=True)
             # Fallback con datos de prueba
-            report_data = [
+            report_rows = [
                 {
                     'id': '1',
                     'cliente': 'Cliente de Prueba',
@@ -65,20 +114,30 @@ def generate_report(request):
         # Preparar respuesta
         response_data = {
             'success': True,
-            'data': report_data,
             'format': format_type,
             'generated_at': datetime.now().isoformat(),
             'prompt': prompt
         }
         
-        # Si es PDF o Excel, generar archivo
-        if format_type in ['pdf', 'excel']:
-            if format_type == 'pdf':
-                file_url = PDFExporter.export_report(report_data, prompt)
-            else:
-                file_url = ExcelExporter.export_report(report_data, prompt)
-            
+        # Si es PDF, Excel o CSV, el exportador recorre las filas a medida que
+        # se leen; la respuesta solo incluye las primeras como vista previa
+        if format_type in EXPORTERS:
+            preview = []
+            file_url = EXPORTERS[format_type].export_report(
+                with_preview(report_rows, preview), prompt
+            )
+            # Un error a mitad del recorrido deja al exportador sin archivo
+            if not file_url:
+                return Response(
+                    {'error': f'Error generando el archivo {format_type}'},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            response_data['data'] = preview
             response_data['downloadUrl'] = file_url
+        else:
+            report_data = list(report_rows)
+            logger.info(f"Reporte generado exitosamente: {len(report_data)}")
+            response_data['data'] = report_data
         
         return Response(response_data, status=status.HTTP_200_OK)
         
@@ -137,31 +196,58 @@ def get_report_templates(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_report_history(request):
-    """Obtiene historial de reportes generados"""
-    # Por ahora retornamos una lista vacía
-    # En el futuro se puede implementar persistencia de reportes
-    return Response([], status=status.HTTP_200_OK)
+    """Obtiene historial de reportes generados en segundo plano por el usuario"""
+    reports = Report.objects.filter(user=request.user)
+    if request.query_params.get('status'):
+        reports = reports.filter(status=request.query_params['status'])
+    
+    try:
+        limit = int(request.query_params.get('limit', 50))
+    except ValueError:
+        return Response({'error': 'limit debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(max(limit, 1), MAX_HISTORY_LIMIT)
+    return Response(ReportSerializer(reports[:limit], many=True).data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_status(request, report_id):
+    """Estado de un reporte en segundo plano (para hacer polling)"""
+    report = Report.objects.filter(id=report_id, user=request.user).first()
+    if not report:
+        return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(ReportSerializer(report).data, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def download_report(request):
-    """Descarga un reporte generado"""
+    """Descarga el archivo de un reporte generado en segundo plano"""
     try:
-        data = request.data
-        report_id = data.get('report_id')
-        format_type = data.get('format', 'pdf')
+        try:
+            report_id = uuid.UUID(str(request.data.get('report_id')))
+        except ValueError:
+            report_id = None
+        report = Report.objects.filter(id=report_id, user=request.user).first() if report_id else None
         
-        # Aquí se implementaría la lógica para obtener el reporte
-        # y generar el archivo de descarga
+        if not report:
+            return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         
-        return Response(
-            {'error': 'Funcionalidad de descarga no implementada'}, 
-            status=status.HTTP_501_NOT_IMPLEMENTED
+        if report.status != 'completed':
+            return Response({
+                'error': 'El reporte todavía no está listo' if report.status in ('pending', 'processing') else report.error_message,
+                'status': report.status
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return FileResponse(
+            default_storage.open(report.file_path, 'rb'),
+            as_attachment=True,
+            filename=os.path.basename(report.file_path)
         )
         
     except Exception as e:
         return Response(
             {'error': f'Error descargando reporte: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Sale, SaleItem
+from .models import Sale, SaleItem, SalesDailyRollup
 
 class SaleItemInline(admin.TabularInline):
     model = SaleItem
@@ -14,3 +14,8 @@ class SaleAdmin(admin.ModelAdmin):
 @admin.register(SaleItem)
 class SaleItemAdmin(admin.ModelAdmin):
     list_display = ['sale', 'product', 'quantity', 'price', 'subtotal']
+
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'revenue', 'transaction_count', 'unique_clients', 'total_count']
+    date_hierarchy = 'date'
@@ -4,3 +4,6 @@ class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.sales'
     verbose_name = 'Ventas'
+    
+    def ready(self):
+        from . import signals
@@ -0,0 +1,35 @@
+"""
+Comando para reconstruir el resumen diario de ventas (SalesDailyRollup)
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.sales.services import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios de ventas a partir de las ventas existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            default=None,
+            help='Fecha inicial (YYYY-MM-DD). Por defecto, todo el histórico',
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            default=None,
+            help='Fecha final inclusive (YYYY-MM-DD). Por defecto, hasta hoy',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options['start']) if options['start'] else None
+            end_date = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'Fecha inválida: {e}')
+
+        self.stdout.write('Reconstruyendo resúmenes diarios de ventas...')
+        created = SalesRollupService.rebuild(start_date=start_date, end_date=end_date)
+        self.stdout.write(self.style.SUCCESS(f'✅ {created} día(s) reconstruido(s)'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_cart_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('date', models.DateField(unique=True, verbose_name='Fecha')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ingresos')),
+                ('transaction_count', models.PositiveIntegerField(default=0, verbose_name='Transacciones')),
+                ('unique_clients', models.PositiveIntegerField(default=0, verbose_name='Clientes Únicos')),
+                ('public_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ingresos Públicos')),
+                ('public_count', models.PositiveIntegerField(default=0, verbose_name='Ventas Públicas')),
+                ('admin_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Ingresos Administrativos')),
+                ('admin_count', models.PositiveIntegerField(default=0, verbose_name='Ventas Administrativas')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Ventas (todos los estados)')),
+                ('pending_count', models.PositiveIntegerField(default=0, verbose_name='Ventas Pendientes')),
+                ('cancelled_count', models.PositiveIntegerField(default=0, verbose_name='Ventas Canceladas')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Ventas',
+                'verbose_name_plural': 'Resúmenes Diarios de Ventas',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Llena SalesDailyRollup con el histórico de ventas existente
+
+    Replica SalesRollupService.rebuild con los modelos históricos de la
+    migración: sin este paso los tableros y el entrenamiento leerían un
+    resumen vacío hasta que alguien corriera rebuild_rollups a mano.
+    """
+    Sale = apps.get_model('sales', 'Sale')
+    SalesDailyRollup = apps.get_model('sales', 'SalesDailyRollup')
+
+    completed = Q(status='completed')
+    public = completed & Q(user__isnull=True)
+    admin = completed & Q(user__isnull=False)
+
+    rows = Sale.objects.filter(is_active=True).annotate(
+        day=TruncDate('created_at')
+    ).values('day').annotate(
+        revenue=Sum('total', filter=completed),
+        transaction_count=Count('id', filter=completed),
+        unique_clients=Count('client', filter=completed, distinct=True),
+        public_revenue=Sum('total', filter=public),
+        public_count=Count('id', filter=public),
+        admin_revenue=Sum('total', filter=admin),
+        admin_count=Count('id', filter=admin),
+        total_count=Count('id'),
+        pending_count=Count('id', filter=Q(status='pending')),
+        cancelled_count=Count('id', filter=Q(status='cancelled')),
+    ).order_by('day')
+
+    fields = [
+        'revenue', 'transaction_count', 'unique_clients',
+        'public_revenue', 'public_count', 'admin_revenue', 'admin_count',
+        'total_count', 'pending_count', 'cancelled_count'
+    ]
+
+    SalesDailyRollup.objects.all().delete()
+    SalesDailyRollup.objects.bulk_create([
+        SalesDailyRollup(date=row['day'], **{field: row[field] or 0 for field in fields})
+        for row in rows
+    ], batch_size=1000)
+
+
+def clear_rollups(apps, schema_editor):
+    apps.get_model('sales', 'SalesDailyRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_salesdailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, clear_rollups),
+    ]
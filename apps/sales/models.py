@@ -181,4 +181,26 @@ class SaleReceipt(BaseModel):
         with open(filepath, 'rb') as f:
             self.pdf_file.save(filename, f, save=True)
         
-        return self.pdf_file.url
\ No newline at end of file
+        return self.pdf_file.url
+
+class SalesDailyRollup(BaseModel):
+    """Resumen diario de ventas completadas, mantenido incrementalmente"""
+    date = models.DateField(unique=True, verbose_name='Fecha')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Ingresos')
+    transaction_count = models.PositiveIntegerField(default=0, verbose_name='Transacciones')
+    unique_clients = models.PositiveIntegerField(default=0, verbose_name='Clientes Únicos')
+    public_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Ingresos Públicos')
+    public_count = models.PositiveIntegerField(default=0, verbose_name='Ventas Públicas')
+    admin_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Ingresos Administrativos')
+    admin_count = models.PositiveIntegerField(default=0, verbose_name='Ventas Administrativas')
+    total_count = models.PositiveIntegerField(default=0, verbose_name='Ventas (todos los estados)')
+    pending_count = models.PositiveIntegerField(default=0, verbose_name='Ventas Pendientes')
+    cancelled_count = models.PositiveIntegerField(default=0, verbose_name='Ventas Canceladas')
+    
+    class Meta:
+        verbose_name = 'Resumen Diario de Ventas'
+        verbose_name_plural = 'Resúmenes Diarios de Ventas'
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"Resumen {self.date} - {self.revenue}"
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Cart, CartItem, Sale, SaleItem, SaleReceipt
 from apps.products.models import Product
 from apps.clients.models import Client
+from .services import CheckoutService, CheckoutError
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -125,29 +126,20 @@ class CreateSaleSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        sale = Sale.objects.create(**validated_data)
+        receipt_prefix = validated_data.pop('receipt_prefix', None)
+        client = validated_data.pop('client')
+        user = validated_data.pop('user', None)
         
-        for item_data in items_data:
-            SaleItem.objects.create(
-                sale=sale,
-                product_id=item_data['product'],
-                quantity=item_data['quantity'],
-                price=item_data['price']
+        try:
+            return CheckoutService.create_sale(
+                client=client,
+                items=items_data,
+                user=user,
+                receipt_prefix=receipt_prefix,
+                **validated_data
             )
-        
-        # Actualizar stock de productos
-        for item_data in items_data:
-            product = Product.objects.get(id=item_data['product'])
-            product.stock -= item_data['quantity']
-            product.save()
-        
-        # Actualizar total de compras del cliente
-        client = sale.client
-        client.total_purchases += sale.total
-        client.last_purchase_date = sale.created_at
-        client.save()
-        
-        return sale
+        except CheckoutError as e:
+            raise serializers.ValidationError({'items': str(e)})
 
 
 class SaleReceiptSerializer(serializers.ModelSerializer):
@@ -0,0 +1,400 @@
+"""
+Servicios de ventas para SmartSales365
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, Any, Optional
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count, Max, Case, When, PositiveIntegerField, Value, DecimalField
+from django.db.models.functions import Coalesce, Trunc, TruncDate
+from django.utils import timezone
+from apps.products.models import Product
+from apps.clients.models import Client
+from apps.core.outbox import OutboxService
+from .models import Cart, Sale, SaleItem, SaleReceipt, SalesDailyRollup
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    """Error de negocio durante el checkout (stock insuficiente, producto inválido, etc.)"""
+
+
+class CheckoutService:
+    """
+    Motor de checkout transaccional.
+
+    Toda la venta (bloqueo de productos, descuento de stock, items, cliente,
+    comprobante, desactivación del carrito y eventos del outbox) se ejecuta en
+    una sola transacción con un número fijo de consultas, independiente de la
+    cantidad de items. Notificaciones, PDF y alertas de stock los procesa el
+    worker `process_outbox` fuera del request.
+    """
+
+    @staticmethod
+    def create_sale(
+        client: Client,
+        items: List[Dict[str, Any]],
+        user=None,
+        cart: Optional[Cart] = None,
+        receipt_prefix: Optional[str] = None,
+        **sale_fields
+    ) -> Sale:
+        """
+        Crea una venta de forma atómica
+
+        Args:
+            client: Cliente de la venta
+            items: Lista de dicts con 'product' (ID), 'quantity' y 'price'
+            user: Vendedor (None para ventas públicas)
+            cart: Carrito a desactivar al confirmar la venta
+            receipt_prefix: Prefijo del comprobante; si es None no se crea comprobante
+            sale_fields: Campos adicionales de Sale (status, total, transaction_id, ...)
+
+        Returns:
+            Venta creada
+
+        Raises:
+            CheckoutError: Si el carrito está vacío, algún producto no existe
+                o no hay stock suficiente. La transacción se revierte completa.
+        """
+        if not items:
+            raise CheckoutError('El carrito está vacío')
+
+        # Consolidar cantidades por producto (un producto puede repetirse)
+        quantities = {}
+        for item in items:
+            product_id = int(item['product'])
+            quantities[product_id] = quantities.get(product_id, 0) + int(item['quantity'])
+        product_ids = sorted(quantities)
+
+        subtotal = sum(
+            (Decimal(str(item['price'])) * int(item['quantity']) for item in items),
+            Decimal('0')
+        )
+        sale_fields.setdefault('subtotal', subtotal)
+        sale_fields.setdefault(
+            'total',
+            Decimal(str(sale_fields['subtotal']))
+            + Decimal(str(sale_fields.get('tax', 0)))
+            - Decimal(str(sale_fields.get('discount', 0)))
+        )
+
+        with transaction.atomic():
+            # Bloquear filas en orden determinista (por ID) para evitar deadlocks
+            locked = {
+                row['id']: row
+                for row in Product.objects.select_for_update()
+                .filter(id__in=product_ids, is_active=True)
+                .order_by('id')
+                .values('id', 'name', 'stock', 'min_stock')
+            }
+
+            missing = [pid for pid in product_ids if pid not in locked]
+            if missing:
+                raise CheckoutError(f'Producto no encontrado o inactivo: {missing[0]}')
+
+            for product_id in product_ids:
+                row = locked[product_id]
+                if row['stock'] < quantities[product_id]:
+                    raise CheckoutError(
+                        f"Stock insuficiente para {row['name']} "
+                        f"(disponible: {row['stock']}, solicitado: {quantities[product_id]})"
+                    )
+
+            # Descuento de stock en un único UPDATE condicional que rechaza sobreventa
+            guard = Q()
+            whens = []
+            for product_id in product_ids:
+                qty = quantities[product_id]
+                guard |= Q(id=product_id, stock__gte=qty)
+                whens.append(When(id=product_id, then=F('stock') - qty))
+
+            updated = Product.objects.filter(guard).update(
+                stock=Case(*whens, default=F('stock'), output_field=PositiveIntegerField()),
+                updated_at=timezone.now()
+            )
+            if updated != len(product_ids):
+                raise CheckoutError('Stock insuficiente para completar la venta')
+
+            sale = Sale.objects.create(client=client, user=user, **sale_fields)
+
+            SaleItem.objects.bulk_create([
+                SaleItem(
+                    sale=sale,
+                    product_id=int(item['product']),
+                    quantity=int(item['quantity']),
+                    price=item['price']
+                )
+                for item in items
+            ])
+
+            # Acumular compras del cliente sin read-modify-write
+            Client.objects.filter(pk=client.pk).update(
+                total_purchases=F('total_purchases') + sale.total,
+                last_purchase_date=sale.created_at
+            )
+
+            if receipt_prefix:
+                SaleReceipt.objects.create(
+                    sale=sale,
+                    receipt_number=f"{receipt_prefix}-{sale.id}",
+                    qr_code=f"https://smartsales365.com/receipt/{sale.id}"
+                )
+
+            if cart is not None:
+                Cart.objects.filter(pk=cart.pk).update(is_active=False, updated_at=timezone.now())
+                cart.is_active = False
+
+            # Efectos secundarios al outbox: se confirman junto con la venta
+            events = []
+            if sale.status == 'completed':
+                events.append(('sale_notification', {'sale_id': str(sale.id)}))
+            if receipt_prefix:
+                events.append(('sale_receipt_pdf', {'sale_id': str(sale.id)}))
+            for product_id in product_ids:
+                row = locked[product_id]
+                if row['stock'] > row['min_stock'] >= row['stock'] - quantities[product_id]:
+                    events.append(('low_stock_alert', {'product_id': product_id}))
+            if events:
+                OutboxService.enqueue_many(events)
+
+        logger.info(f"Venta {sale.id} creada con {len(items)} item(s), total {sale.total}")
+        return sale
+
+    @staticmethod
+    def checkout_cart(
+        cart: Cart,
+        client: Client,
+        user=None,
+        receipt_prefix: Optional[str] = 'RCP',
+        **sale_fields
+    ) -> Sale:
+        """Convierte un carrito en venta leyendo sus items en una sola consulta"""
+        items = [
+            {'product': row['product_id'], 'quantity': row['quantity'], 'price': row['price']}
+            for row in cart.items.values('product_id', 'quantity', 'price')
+        ]
+        return CheckoutService.create_sale(
+            client=client,
+            items=items,
+            user=user,
+            cart=cart,
+            receipt_prefix=receipt_prefix,
+            **sale_fields
+        )
+
+
+class SalesRollupService:
+    """
+    Mantenimiento y lectura del resumen diario de ventas (SalesDailyRollup).
+
+    Cada cambio en una venta encola un evento `sales_rollup_refresh` que el
+    worker del outbox procesa recalculando solo el día afectado, con la fila
+    del resumen bloqueada para que los recálculos concurrentes no se pisen.
+    """
+
+    ROLLUP_FIELDS = [
+        'revenue', 'transaction_count', 'unique_clients',
+        'public_revenue', 'public_count', 'admin_revenue', 'admin_count',
+        'total_count', 'pending_count', 'cancelled_count'
+    ]
+
+    @staticmethod
+    def _aggregates() -> Dict[str, Any]:
+        """Agregaciones de Sale que alimentan cada columna del resumen"""
+        completed = Q(status='completed')
+        public = completed & Q(user__isnull=True)
+        admin = completed & Q(user__isnull=False)
+        return {
+            'revenue': Sum('total', filter=completed),
+            'transaction_count': Count('id', filter=completed),
+            'unique_clients': Count('client', filter=completed, distinct=True),
+            'public_revenue': Sum('total', filter=public),
+            'public_count': Count('id', filter=public),
+            'admin_revenue': Sum('total', filter=admin),
+            'admin_count': Count('id', filter=admin),
+            'total_count': Count('id'),
+            'pending_count': Count('id', filter=Q(status='pending')),
+            'cancelled_count': Count('id', filter=Q(status='cancelled')),
+        }
+
+    @staticmethod
+    def day_bounds(day: date):
+        """Inicio (inclusive) y fin (exclusivo) de un día en la zona horaria local"""
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+        return start, end
+
+    @staticmethod
+    def refresh_day(day: date) -> SalesDailyRollup:
+        """Recalcula el resumen de un día a partir de sus ventas"""
+        start, end = SalesRollupService.day_bounds(day)
+
+        with transaction.atomic():
+            rollup, _ = SalesDailyRollup.objects.get_or_create(date=day)
+            rollup = SalesDailyRollup.objects.select_for_update().get(pk=rollup.pk)
+
+            values = Sale.objects.filter(
+                is_active=True,
+                created_at__gte=start,
+                created_at__lt=end
+            ).aggregate(**SalesRollupService._aggregates())
+
+            for field in SalesRollupService.ROLLUP_FIELDS:
+                setattr(rollup, field, values[field] or 0)
+            rollup.save()
+
+        return rollup
+
+    @staticmethod
+    def rebuild(start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+        """Reconstruye los resúmenes de un rango (o de todo el histórico) en una consulta agrupada"""
+        queryset = Sale.objects.filter(is_active=True)
+        rollups = SalesDailyRollup.objects.all()
+        if start_date:
+            queryset = queryset.filter(created_at__gte=SalesRollupService.day_bounds(start_date)[0])
+            rollups = rollups.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(created_at__lt=SalesRollupService.day_bounds(end_date)[1])
+            rollups = rollups.filter(date__lte=end_date)
+
+        rows = queryset.annotate(
+            day=TruncDate('created_at')
+        ).values('day').annotate(**SalesRollupService._aggregates()).order_by('day')
+
+        with transaction.atomic():
+            rollups.delete()
+            created = SalesDailyRollup.objects.bulk_create([
+                SalesDailyRollup(
+                    date=row['day'],
+                    **{field: row[field] or 0 for field in SalesRollupService.ROLLUP_FIELDS}
+                )
+                for row in rows
+            ], batch_size=1000)
+
+        return len(created)
+
+    @staticmethod
+    def series(start_date: date, end_date: date) -> Dict[date, Dict[str, Any]]:
+        """Resúmenes de un rango indexados por fecha (los días sin ventas no aparecen)"""
+        return {
+            row['date']: row
+            for row in SalesDailyRollup.objects.filter(
+                date__gte=start_date,
+                date__lte=end_date
+            ).values('date', *SalesRollupService.ROLLUP_FIELDS)
+        }
+
+    @staticmethod
+    def watermark() -> str:
+        """Marca de agua del resumen: cambia cada vez que se recalcula algún día"""
+        last_update = SalesDailyRollup.objects.aggregate(last=Max('updated_at'))['last']
+        return last_update.isoformat() if last_update else 'empty'
+
+    @staticmethod
+    def bucket_start(day: date, group_by: str) -> date:
+        """Inicio del período (día, semana ISO o mes) al que pertenece un día"""
+        if group_by == 'week':
+            return day - timedelta(days=day.weekday())
+        if group_by == 'month':
+            return day.replace(day=1)
+        return day
+
+    @staticmethod
+    def next_bucket(bucket: date, group_by: str) -> date:
+        """Inicio del período siguiente"""
+        if group_by == 'week':
+            return bucket + timedelta(days=7)
+        if group_by == 'month':
+            if bucket.month == 12:
+                return bucket.replace(year=bucket.year + 1, month=1)
+            return bucket.replace(month=bucket.month + 1)
+        return bucket + timedelta(days=1)
+
+    @staticmethod
+    def grouped_series(start_date: date, end_date: date, group_by: str = 'day') -> List[Dict[str, Any]]:
+        """
+        Ingresos y transacciones agrupados por día, semana o mes
+
+        Una sola consulta agrupada (Trunc + Sum) sobre el resumen diario; los
+        períodos sin ventas se completan con ceros.
+        """
+        if group_by not in ('day', 'week', 'month'):
+            group_by = 'day'
+
+        rows = SalesDailyRollup.objects.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        ).annotate(
+            bucket=Trunc('date', group_by)
+        ).values('bucket').annotate(
+            total_sales=Sum('revenue'),
+            num_transactions=Sum('transaction_count')
+        ).order_by('bucket')
+        totals = {row['bucket']: row for row in rows}
+
+        series = []
+        bucket = SalesRollupService.bucket_start(start_date, group_by)
+        while bucket <= end_date:
+            row = totals.get(bucket)
+            total_sales = float(row['total_sales'] or 0) if row else 0.0
+            num_transactions = (row['num_transactions'] or 0) if row else 0
+            series.append({
+                'date': bucket.isoformat(),
+                'total_sales': total_sales,
+                'num_transactions': num_transactions,
+                'avg_transaction': total_sales / num_transactions if num_transactions > 0 else 0
+            })
+            bucket = SalesRollupService.next_bucket(bucket, group_by)
+
+        return series
+
+
+class ProductSalesService:
+    """
+    Totales de venta por producto en una sola consulta agrupada
+
+    Parte de Product con LEFT JOIN a sus items y ventas, y aplica el rango de
+    fechas dentro de los agregados, de modo que los productos sin ventas en el
+    período aparecen con ceros. Los ingresos son la suma de cantidad × precio
+    de cada item (no el producto de las sumas).
+    """
+
+    @staticmethod
+    def product_totals(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       include_unsold: bool = True):
+        """
+        Queryset de valores por producto con units_sold, revenue y num_sales
+
+        Args:
+            start: Inicio del período (inclusive), opcional
+            end: Fin del período (exclusivo), opcional
+            include_unsold: Si es False solo incluye productos con ventas en el período
+        """
+        in_range = Q(saleitem__sale__is_active=True)
+        if start:
+            in_range &= Q(saleitem__sale__created_at__gte=start)
+        if end:
+            in_range &= Q(saleitem__sale__created_at__lt=end)
+
+        queryset = Product.objects.values(
+            'id', 'name', 'sku', 'price', 'stock', 'category__name'
+        ).annotate(
+            units_sold=Coalesce(Sum('saleitem__quantity', filter=in_range), 0),
+            revenue=Coalesce(
+                Sum(F('saleitem__quantity') * F('saleitem__price'), filter=in_range),
+                Value(Decimal('0')),
+                output_field=DecimalField()
+            ),
+            num_sales=Count('saleitem__sale', filter=in_range, distinct=True)
+        )
+        if not include_unsold:
+            queryset = queryset.filter(units_sold__gt=0)
+        return queryset
+
+
+def handle_sales_rollup_refresh(payload: Dict[str, Any]):
+    """Handler del outbox: recalcula el resumen del día indicado"""
+    SalesRollupService.refresh_day(date.fromisoformat(payload['date']))
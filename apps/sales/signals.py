@@ -0,0 +1,18 @@
+"""
+Señales de ventas: mantienen el resumen diario (SalesDailyRollup) vía outbox
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.core.outbox import OutboxService
+from .models import Sale
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def enqueue_rollup_refresh(sender, instance, **kwargs):
+    """Encola el recálculo del día de la venta en la misma transacción del cambio"""
+    if not instance.created_at:
+        return
+    day = timezone.localdate(instance.created_at)
+    OutboxService.enqueue('sales_rollup_refresh', {'date': day.isoformat()})
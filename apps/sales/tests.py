@@ -0,0 +1,130 @@
+"""
+Pruebas del motor de checkout y del resumen diario de ventas
+"""
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.clients.models import Client
+from apps.core.outbox import OutboxService
+from apps.products.models import Category, Product
+from .models import Sale, SaleItem, SalesDailyRollup
+from .services import CheckoutError, CheckoutService
+
+
+def create_product(stock=5, **fields):
+    category = Category.objects.create(name='General')
+    return Product.objects.create(
+        name=fields.pop('name', 'Producto'),
+        description='',
+        sku=fields.pop('sku', 'SKU-1'),
+        price=Decimal('10.00'),
+        cost=Decimal('6.00'),
+        stock=stock,
+        category=category,
+        **fields
+    )
+
+
+class CheckoutServiceTests(TestCase):
+    """Checkout atómico: descuento de stock y rechazo de sobreventa"""
+
+    def setUp(self):
+        self.product = create_product(stock=5)
+        self.client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+
+    def test_create_sale_discounts_stock(self):
+        sale = CheckoutService.create_sale(
+            self.client_record,
+            [{'product': self.product.id, 'quantity': 3, 'price': '10.00'}],
+            status='completed'
+        )
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(sale.total, Decimal('30.00'))
+        self.assertEqual(SaleItem.objects.filter(sale=sale).count(), 1)
+
+    def test_rejects_oversell(self):
+        # El mismo producto repetido se consolida: 3 + 3 supera el stock de 5
+        items = [
+            {'product': self.product.id, 'quantity': 3, 'price': '10.00'},
+            {'product': self.product.id, 'quantity': 3, 'price': '10.00'},
+        ]
+        with self.assertRaises(CheckoutError):
+            CheckoutService.create_sale(self.client_record, items, status='completed')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(SaleItem.objects.exists())
+
+
+class SalesRollupTests(TestCase):
+    """El resumen diario se recalcula vía outbox cuando cambian las ventas"""
+
+    def setUp(self):
+        self.client_record = Client.objects.create(name='Cliente', email='cliente@example.com')
+
+    def refresh_rollups(self):
+        OutboxService.process_batch(event_types=['sales_rollup_refresh'])
+        return SalesDailyRollup.objects.get(date=timezone.localdate())
+
+    def create_sale(self, total, status='completed'):
+        return Sale.objects.create(
+            client=self.client_record,
+            subtotal=Decimal(total),
+            total=Decimal(total),
+            status=status
+        )
+
+    def test_refresh_on_save(self):
+        self.create_sale('100.00')
+        self.create_sale('40.00', status='pending')
+
+        rollup = self.refresh_rollups()
+        self.assertEqual(rollup.revenue, Decimal('100.00'))
+        self.assertEqual(rollup.transaction_count, 1)
+        self.assertEqual(rollup.total_count, 2)
+        self.assertEqual(rollup.pending_count, 1)
+
+    def test_refresh_on_delete(self):
+        sale = self.create_sale('100.00')
+        self.refresh_rollups()
+
+        sale.delete()
+
+        rollup = self.refresh_rollups()
+        self.assertEqual(rollup.revenue, 0)
+        self.assertEqual(rollup.transaction_count, 0)
+        self.assertEqual(rollup.total_count, 0)
+
+    def test_inactive_sales_are_not_counted(self):
+        sale = self.create_sale('100.00')
+        sale.is_active = False
+        sale.save()
+
+        rollup = self.refresh_rollups()
+        self.assertEqual(rollup.revenue, 0)
+        self.assertEqual(rollup.total_count, 0)
+
+    def test_sale_stats_exclude_inactive_sales(self):
+        self.create_sale('100.00')
+        inactive = self.create_sale('40.00')
+        inactive.is_active = False
+        inactive.save()
+        self.create_sale('25.00', status='cancelled')
+        self.refresh_rollups()
+        api = APIClient()
+        api.force_authenticate(get_user_model().objects.create_user(
+            username='ventas', email='ventas@example.com', password='secreto'
+        ))
+
+        stats = api.get('/api/v1/sales/stats/').data
+
+        self.assertEqual(stats['total_sales'], 2)
+        self.assertEqual(stats['completed_sales'], 1)
+        self.assertEqual(stats['cancelled_sales'], 1)
+        self.assertEqual(Decimal(stats['total_revenue']), Decimal('100.00'))
+        self.assertEqual(stats['today_sales'], 1)
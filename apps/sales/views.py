@@ -6,12 +6,13 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import Cart, CartItem, Sale, SaleItem, SaleReceipt
+from .models import Cart, CartItem, Sale, SaleItem, SaleReceipt, SalesDailyRollup
 from apps.clients.models import Client
 from .serializers import (
     CartSerializer, CartItemSerializer, AddToCartSerializer, UpdateCartItemSerializer,
     SaleSerializer, CreateSaleSerializer, SaleReceiptSerializer, SaleStatsSerializer
 )
+from .services import CheckoutService, CheckoutError
 
 def get_or_create_cart(request):
     """Helper para obtener o crear carrito"""
@@ -266,7 +267,7 @@ class SaleListCreateView(generics.ListCreateAPIView):
             
             serializer = self.get_serializer(data=data)
             serializer.is_valid(raise_exception=True)
-            sale = serializer.save(user=request.user)
+            sale = serializer.save(user=request.user, receipt_prefix='NV')
             
             # Verificar que el cliente se asoció correctamente
             logger.info(f"✅ Venta creada: ID={sale.id}")
@@ -277,31 +278,6 @@ class SaleListCreateView(generics.ListCreateAPIView):
             sale.refresh_from_db()
             logger.info(f"   Después de refresh - Cliente: ID={sale.client.id if sale.client else 'None'}, Nombre={sale.client.name if sale.client else 'None'}")
             
-            # Crear comprobante
-            SaleReceipt.objects.create(
-                sale=sale,
-                receipt_number=f"NV-{sale.id}",
-                qr_code=f"https://smartsales365.com/receipt/{sale.id}"
-            )
-            
-            # Enviar notificación push cuando la venta está completada
-            if sale.status == 'completed':
-                try:
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.info(f"Venta {sale.id} completada. Enviando notificaciones...")
-                    from apps.core.services import NotificationService
-                    result = NotificationService.send_sale_notification(str(sale.id))
-                    if result:
-                        logger.info(f"Notificaciones enviadas exitosamente para venta {sale.id}")
-                    else:
-                        logger.warning(f"Notificaciones retornaron False para venta {sale.id}")
-                except Exception as notif_error:
-                    # No fallar la creación de la venta si hay error en notificaciones
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.error(f"Error enviando notificación de venta {sale.id}: {notif_error}", exc_info=True)
-            
             # Serializar la venta con el cliente incluido
             sale_serializer = SaleSerializer(sale)
             sale_data = sale_serializer.data
@@ -455,64 +431,23 @@ def create_sale_from_cart(request, cart_id):
     except Cart.DoesNotExist:
         return Response({'error': 'Carrito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
     
-    if not cart.items.exists():
-        return Response({'error': 'El carrito está vacío'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Crear venta
-    sale_data = {
-        'client': cart.client,
-        'user': request.user,
-        'subtotal': cart.total_amount,
-        'total': cart.total_amount,
-        'status': 'completed',
-        'payment_status': 'paid',
-        'items': []
-    }
-    
-    # Agregar items de la venta
-    for cart_item in cart.items.all():
-        sale_data['items'].append({
-            'product': cart_item.product,
-            'quantity': cart_item.quantity,
-            'price': cart_item.price
-        })
+    if not cart.client:
+        return Response({'error': 'El carrito no tiene cliente asociado'}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = CreateSaleSerializer(data=sale_data)
-    if serializer.is_valid():
-        sale = serializer.save()
-        
-        # Desactivar carrito
-        cart.is_active = False
-        cart.save()
-        
-        # Crear comprobante
-        SaleReceipt.objects.create(
-            sale=sale,
-            receipt_number=f"RCP-{sale.id}",
-            qr_code=f"https://smartsales365.com/receipt/{sale.id}"
+    # Crear venta, descontar stock, comprobante y desactivar carrito en una transacción
+    try:
+        sale = CheckoutService.checkout_cart(
+            cart,
+            cart.client,
+            user=request.user,
+            receipt_prefix='RCP',
+            status='completed',
+            payment_status='paid'
         )
-        
-        # Enviar notificación push cuando la venta está completada
-        if sale.status == 'completed':
-            try:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info(f"Venta {sale.id} completada (desde carrito). Enviando notificaciones...")
-                from apps.core.services import NotificationService
-                result = NotificationService.send_sale_notification(str(sale.id))
-                if result:
-                    logger.info(f"Notificaciones enviadas exitosamente para venta {sale.id}")
-                else:
-                    logger.warning(f"Notificaciones retornaron False para venta {sale.id}")
-            except Exception as notif_error:
-                # No fallar la creación de la venta si hay error en notificaciones
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error enviando notificación de venta {sale.id}: {notif_error}", exc_info=True)
-        
-        return Response(SaleSerializer(sale).data, status=status.HTTP_201_CREATED)
+    except CheckoutError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(SaleSerializer(sale).data, status=status.HTTP_201_CREATED)
 
 
 @api_view(['POST'])
@@ -645,84 +580,47 @@ def checkout_cart(request):
             else:
                 raise e
     
-    # Crear venta
-    sale_data = {
-        'client': client.id,
-        'user': request.user.id if request.user.is_authenticated else None,
-        'subtotal': float(cart.total_amount),
-        'total': float(cart.total_amount),
-        'status': 'completed',
-        'payment_status': 'paid',
-        'transaction_id': stripe_payment_intent_id if payment_method == 'stripe' else '',
-        'items': []
-    }
-    
-    # Agregar items de la venta
-    for cart_item in cart.items.all():
-        sale_data['items'].append({
-            'product': cart_item.product.id,
-            'quantity': cart_item.quantity,
-            'price': float(cart_item.price)
-        })
-    
-    serializer = CreateSaleSerializer(data=sale_data)
-    if serializer.is_valid():
-        sale = serializer.save()
-        
-        # Actualizar stock de productos
-        for cart_item in cart.items.all():
-            cart_item.product.stock -= cart_item.quantity
-            cart_item.product.save()
-        
-        # Desactivar carrito
-        cart.is_active = False
-        cart.save()
-        
-        # Crear comprobante
-        SaleReceipt.objects.create(
-            sale=sale,
-            receipt_number=f"RCP-{sale.id}",
-            qr_code=f"https://smartsales365.com/receipt/{sale.id}"
+    # Crear venta, descontar stock, comprobante y desactivar carrito en una transacción
+    try:
+        sale = CheckoutService.checkout_cart(
+            cart,
+            client,
+            user=request.user if request.user.is_authenticated else None,
+            receipt_prefix='RCP',
+            status='completed',
+            payment_status='paid',
+            transaction_id=stripe_payment_intent_id if payment_method == 'stripe' else ''
         )
-        
-        # Enviar notificación push cuando la venta está completada
-        if sale.status == 'completed':
-            try:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info(f"Venta {sale.id} completada (checkout). Enviando notificaciones...")
-                from apps.core.services import NotificationService
-                result = NotificationService.send_sale_notification(str(sale.id))
-                if result:
-                    logger.info(f"Notificaciones enviadas exitosamente para venta {sale.id}")
-                else:
-                    logger.warning(f"Notificaciones retornaron False para venta {sale.id}")
-            except Exception as notif_error:
-                # No fallar la creación de la venta si hay error en notificaciones
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error enviando notificación de venta {sale.id}: {notif_error}", exc_info=True)
-        
-        return Response(SaleSerializer(sale).data, status=status.HTTP_201_CREATED)
+    except CheckoutError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(SaleSerializer(sale).data, status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sale_stats(request):
-    """Estadísticas de ventas"""
-    today = timezone.now().date()
-    
-    stats = Sale.objects.aggregate(
-        total_sales=Count('id'),
-        completed_sales=Count('id', filter=Q(status='completed')),
-        pending_sales=Count('id', filter=Q(status='pending')),
-        cancelled_sales=Count('id', filter=Q(status='cancelled')),
-        total_revenue=Sum('total', filter=Q(status='completed')),
-        average_sale=Avg('total', filter=Q(status='completed')),
-        today_sales=Count('id', filter=Q(created_at__date=today, status='completed')),
-        today_revenue=Sum('total', filter=Q(created_at__date=today, status='completed'))
+    """
+    Estadísticas de ventas (leídas del resumen diario)
+    
+    Como el resumen, cuentan solo ventas activas: una venta desactivada
+    (is_active=False) deja de sumar en totales e ingresos.
+    """
+    today = timezone.localdate()
+    
+    totals = SalesDailyRollup.objects.aggregate(
+        total_sales=Sum('total_count'),
+        completed_sales=Sum('transaction_count'),
+        pending_sales=Sum('pending_count'),
+        cancelled_sales=Sum('cancelled_count'),
+        total_revenue=Sum('revenue'),
+        today_sales=Sum('transaction_count', filter=Q(date=today)),
+        today_revenue=Sum('revenue', filter=Q(date=today))
+    )
+    
+    stats = {key: value or 0 for key, value in totals.items()}
+    stats['average_sale'] = (
+        stats['total_revenue'] / stats['completed_sales'] if stats['completed_sales'] else None
     )
     
     serializer = SaleStatsSerializer(stats)
@@ -744,6 +642,21 @@ def sales_by_period(request):
     else:
         start_date = timezone.now() - timedelta(days=7)
     
+    # Serie diaria desde el resumen (O(días) en lugar de O(ventas))
+    if request.GET.get('group_by') == 'day':
+        rollups = SalesDailyRollup.objects.filter(
+            date__gte=timezone.localdate(start_date)
+        ).order_by('date').values('date', 'revenue', 'transaction_count', 'unique_clients')
+        return Response([
+            {
+                'date': row['date'].isoformat(),
+                'total_revenue': float(row['revenue']),
+                'total_sales': row['transaction_count'],
+                'unique_clients': row['unique_clients']
+            }
+            for row in rollups
+        ])
+    
     sales = Sale.objects.filter(
         created_at__gte=start_date,
         status='completed'
@@ -823,59 +736,52 @@ def get_public_sales(request):
 def get_sales_summary(request):
     """Obtener resumen de ventas (públicas y administrativas)"""
     try:
-        from django.db.models import Count, Sum, Q
-        from datetime import datetime, timedelta
-        
-        # Ventas públicas (user is null)
-        public_sales = Sale.objects.filter(user__isnull=True, status='completed')
-        
-        # Ventas administrativas (user is not null)
-        admin_sales = Sale.objects.filter(user__isnull=False, status='completed')
-        
-        # Estadísticas generales
-        total_public_sales = public_sales.count()
-        total_admin_sales = admin_sales.count()
-        total_public_revenue = public_sales.aggregate(Sum('total'))['total__sum'] or 0
-        total_admin_revenue = admin_sales.aggregate(Sum('total'))['total__sum'] or 0
-        
-        # Ventas de hoy
-        today = datetime.now().date()
-        today_public = public_sales.filter(created_at__date=today).count()
-        today_admin = admin_sales.filter(created_at__date=today).count()
-        today_public_revenue = public_sales.filter(created_at__date=today).aggregate(Sum('total'))['total__sum'] or 0
-        today_admin_revenue = admin_sales.filter(created_at__date=today).aggregate(Sum('total'))['total__sum'] or 0
-        
-        # Ventas de esta semana
+        # Todas las cifras salen de una sola consulta sobre el resumen diario
+        today = timezone.localdate()
         week_start = today - timedelta(days=today.weekday())
-        week_public = public_sales.filter(created_at__date__gte=week_start).count()
-        week_admin = admin_sales.filter(created_at__date__gte=week_start).count()
-        week_public_revenue = public_sales.filter(created_at__date__gte=week_start).aggregate(Sum('total'))['total__sum'] or 0
-        week_admin_revenue = admin_sales.filter(created_at__date__gte=week_start).aggregate(Sum('total'))['total__sum'] or 0
+        
+        totals = {
+            key: value or 0
+            for key, value in SalesDailyRollup.objects.aggregate(
+                total_public_sales=Sum('public_count'),
+                total_admin_sales=Sum('admin_count'),
+                total_public_revenue=Sum('public_revenue'),
+                total_admin_revenue=Sum('admin_revenue'),
+                today_public=Sum('public_count', filter=Q(date=today)),
+                today_admin=Sum('admin_count', filter=Q(date=today)),
+                today_public_revenue=Sum('public_revenue', filter=Q(date=today)),
+                today_admin_revenue=Sum('admin_revenue', filter=Q(date=today)),
+                week_public=Sum('public_count', filter=Q(date__gte=week_start)),
+                week_admin=Sum('admin_count', filter=Q(date__gte=week_start)),
+                week_public_revenue=Sum('public_revenue', filter=Q(date__gte=week_start)),
+                week_admin_revenue=Sum('admin_revenue', filter=Q(date__gte=week_start))
+            ).items()
+        }
         
         return Response({
             'public_sales': {
-                'total_sales': total_public_sales,
-                'total_revenue': float(total_public_revenue),
-                'today_sales': today_public,
-                'today_revenue': float(today_public_revenue),
-                'week_sales': week_public,
-                'week_revenue': float(week_public_revenue)
+                'total_sales': totals['total_public_sales'],
+                'total_revenue': float(totals['total_public_revenue']),
+                'today_sales': totals['today_public'],
+                'today_revenue': float(totals['today_public_revenue']),
+                'week_sales': totals['week_public'],
+                'week_revenue': float(totals['week_public_revenue'])
             },
             'admin_sales': {
-                'total_sales': total_admin_sales,
-                'total_revenue': float(total_admin_revenue),
-                'today_sales': today_admin,
-                'today_revenue': float(today_admin_revenue),
-                'week_sales': week_admin,
-                'week_revenue': float(week_admin_revenue)
+                'total_sales': totals['total_admin_sales'],
+                'total_revenue': float(totals['total_admin_revenue']),
+                'today_sales': totals['today_admin'],
+                'today_revenue': float(totals['today_admin_revenue']),
+                'week_sales': totals['week_admin'],
+                'week_revenue': float(totals['week_admin_revenue'])
             },
             'combined': {
-                'total_sales': total_public_sales + total_admin_sales,
-                'total_revenue': float(total_public_revenue + total_admin_revenue),
-                'today_sales': today_public + today_admin,
-                'today_revenue': float(today_public_revenue + today_admin_revenue),
-                'week_sales': week_public + week_admin,
-                'week_revenue': float(week_public_revenue + week_admin_revenue)
+                'total_sales': totals['total_public_sales'] + totals['total_admin_sales'],
+                'total_revenue': float(totals['total_public_revenue'] + totals['total_admin_revenue']),
+                'today_sales': totals['today_public'] + totals['today_admin'],
+                'today_revenue': float(totals['today_public_revenue'] + totals['today_admin_revenue']),
+                'week_sales': totals['week_public'] + totals['week_admin'],
+                'week_revenue': float(totals['week_public_revenue'] + totals['week_admin_revenue'])
             }
         })
         
@@ -214,6 +214,82 @@ CORS_ALLOW_HEADERS = [
 # CELERY_RESULT_SERIALIZER = 'json'
 # CELERY_TIMEZONE = TIME_ZONE
 
+# Outbox transaccional (procesado con `python manage.py process_outbox`)
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=30, cast=int)
+OUTBOX_RETRY_MAX_SECONDS = config('OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+OUTBOX_PROCESSING_TIMEOUT_SECONDS = config('OUTBOX_PROCESSING_TIMEOUT_SECONDS', default=600, cast=int)
+
+# Caché de datos históricos del dashboard ML (se invalida con la marca de agua del resumen de ventas)
+HISTORICAL_DATA_CACHE_TIMEOUT = config('HISTORICAL_DATA_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Precargar los modelos ML activos al iniciar cada worker (ver apps/ml_predictions/registry.py)
+ML_MODEL_WARMUP = config('ML_MODEL_WARMUP', default=True, cast=bool)
+
+# Núcleos que puede usar cada entrenamiento en el worker de ML (evento `ml_model_training`)
+ML_TRAINING_N_JOBS = config('ML_TRAINING_N_JOBS', default=2, cast=int)
+
+# Búsqueda de hiperparámetros de los reentrenamientos: activada por defecto y tiempo máximo (segundos)
+ML_HYPERPARAMETER_SEARCH = config('ML_HYPERPARAMETER_SEARCH', default=True, cast=bool)
+ML_SEARCH_TIME_BUDGET_SECONDS = config('ML_SEARCH_TIME_BUDGET_SECONDS', default=300, cast=int)
+
+# Días de entrega de proveedores usados para el punto de reorden del pronóstico de demanda
+DEMAND_LEAD_TIME_DAYS = config('DEMAND_LEAD_TIME_DAYS', default=7, cast=int)
+
+# Recomendador "comprados juntos": vecinos por producto y demora de la actualización incremental
+RECOMMENDER_TOP_K = config('RECOMMENDER_TOP_K', default=20, cast=int)
+RECOMMENDER_UPDATE_DELAY_SECONDS = config('RECOMMENDER_UPDATE_DELAY_SECONDS', default=300, cast=int)
+
+# Detector de anomalías en ventas: desviaciones (z) para alertar y períodos mínimos por franja
+SALES_ANOMALY_Z_THRESHOLD = config('SALES_ANOMALY_Z_THRESHOLD', default=3.0, cast=float)
+SALES_ANOMALY_MIN_OBSERVATIONS = config('SALES_ANOMALY_MIN_OBSERVATIONS', default=5, cast=int)
+
+# Reportes dinámicos: registrar tiempos y consultas SQL por etapa (apps/reports/services.py)
+REPORTS_DEBUG = config('REPORTS_DEBUG', default=False, cast=bool)
+
+# Caché de resultados de reportes: expiración de los que incluyen hoy y de los de
+# períodos cerrados (segundos), cantidad máxima de resultados por proceso (se
+# expulsa el menos usado) y filas máximas por resultado
+REPORTS_CACHE_TIMEOUT = config('REPORTS_CACHE_TIMEOUT', default=300, cast=int)
+REPORTS_CACHE_HISTORY_TIMEOUT = config('REPORTS_CACHE_HISTORY_TIMEOUT', default=7 * 24 * 3600, cast=int)
+REPORTS_CACHE_MAX_ENTRIES = config('REPORTS_CACHE_MAX_ENTRIES', default=200, cast=int)
+REPORTS_CACHE_MAX_ROWS = config('REPORTS_CACHE_MAX_ROWS', default=5000, cast=int)
+
+# Alias de caché `reports` para esos resultados. Por defecto LocMem del proceso:
+# con CULL_FREQUENCY igual a MAX_ENTRIES, al llenarse expulsa un solo resultado,
+# el usado hace más tiempo (LRU). Con REPORTS_CACHE_URL se comparten en un Redis
+# dedicado, que debe tener `maxmemory` y `maxmemory-policy allkeys-lru` (el
+# límite pasa a ser de memoria y REPORTS_CACHE_MAX_ENTRIES no se aplica)
+REPORTS_CACHE_URL = config('REPORTS_CACHE_URL', default='')
+if REPORTS_CACHE_URL:
+    REPORTS_CACHE = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REPORTS_CACHE_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
+    }
+else:
+    REPORTS_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'reports-results',
+        'OPTIONS': {
+            'MAX_ENTRIES': REPORTS_CACHE_MAX_ENTRIES,
+            'CULL_FREQUENCY': REPORTS_CACHE_MAX_ENTRIES,
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': REPORTS_CACHE,
+}
+
+# Generar siempre los PDF/Excel/CSV en segundo plano (evento `report_generation`);
+# si está desactivado, solo cuando el request envía `async: true`
+REPORTS_ASYNC_EXPORTS = config('REPORTS_ASYNC_EXPORTS', default=False, cast=bool)
+
 # Logging
 LOGGING = {
     'version': 1,
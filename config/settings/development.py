@@ -31,7 +31,8 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'reports': REPORTS_CACHE,
 }
 
 # CORS settings para desarrollo
@@ -54,7 +54,8 @@ CACHES = {
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
-    }
+    },
+    'reports': REPORTS_CACHE,
 }
 
 # CORS settings para producción
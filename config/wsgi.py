@@ -13,3 +13,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
 
 application = get_wsgi_application()
+
+# Precargar modelos ML para que el primer pronóstico no pague la deserialización
+from apps.ml_predictions.registry import warm_up
+
+warm_up()